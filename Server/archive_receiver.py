@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Stand-in HTTP storage target for recording_archiver.py, for a NAS or a
+laptop on the robot's network (or a test on one machine).
+
+Files land in <root>/<recording>/<file>. A transfer appends to
+<file>.part at the offset it says it is at, so an interrupted upload
+resumes where the receiver's copy ends. The commit re-reads the part,
+checks its SHA-256 against the sender's, fsyncs and renames it. Only
+that reply lets the archiver delete its local copy.
+
+    GET  /files/<recording>/<file>               {"size", "complete", "sha256"}
+    PUT  /files/<recording>/<file>?offset=N      body appended at N (409 + size if N is wrong)
+    POST /files/<recording>/<file>/commit        {"size", "sha256"} -> verified copy or 409
+
+    python3 archive_receiver.py --root /mnt/backup/recordings --port 5200
+"""
+import argparse
+import hashlib
+import os
+import threading
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _valid(part):
+    return bool(part) and part not in (".", "..") and "/" not in part and "\\" not in part
+
+
+def create_receiver_app(root):
+    app = Flask("archive_receiver")
+    os.makedirs(root, exist_ok=True)
+    lock = threading.Lock()
+
+    def paths(recording, filename):
+        directory = os.path.join(root, recording)
+        final = os.path.join(directory, filename)
+        return directory, final, final + ".part", final + ".sha256"
+
+    def describe(recording, filename):
+        _, final, part, checksum = paths(recording, filename)
+        if os.path.exists(final) and os.path.exists(checksum):
+            with open(checksum, "r") as f:
+                return {"size": os.path.getsize(final), "complete": True, "sha256": f.read().strip()}
+        size = os.path.getsize(part) if os.path.exists(part) else 0
+        return {"size": size, "complete": False, "sha256": None}
+
+    @app.before_request
+    def check_names():
+        args = request.view_args or {}
+        if not all(_valid(args.get(key, "x")) for key in ("recording", "filename")):
+            return jsonify({"error": "Invalid recording or file name"}), 400
+
+    @app.route("/files/<recording>/<filename>", methods=["GET"])
+    def status(recording, filename):
+        with lock:
+            return jsonify(describe(recording, filename))
+
+    @app.route("/files/<recording>/<filename>", methods=["PUT"])
+    def append(recording, filename):
+        try:
+            offset = int(request.args.get("offset", 0))
+        except ValueError:
+            return jsonify({"error": "offset must be an integer"}), 400
+        data = request.get_data()
+        directory, final, part, checksum = paths(recording, filename)
+        with lock:
+            os.makedirs(directory, exist_ok=True)
+            size = os.path.getsize(part) if os.path.exists(part) else 0
+            if offset == 0:
+                # A fresh upload replaces any earlier copy
+                for stale in (final, checksum):
+                    if os.path.exists(stale):
+                        os.remove(stale)
+                size = 0
+            if offset != size:
+                return jsonify({"error": "Offset does not match the stored part", "size": size}), 409
+            with open(part, "r+b" if offset else "wb") as f:
+                f.seek(offset)
+                f.write(data)
+                f.truncate()
+            return jsonify({"size": offset + len(data)})
+
+    @app.route("/files/<recording>/<filename>/commit", methods=["POST"])
+    def commit(recording, filename):
+        data = request.get_json(silent=True) or {}
+        _, final, part, checksum = paths(recording, filename)
+        with lock:
+            current = describe(recording, filename)
+            if current["complete"]:
+                if current["sha256"] != data.get("sha256"):
+                    return jsonify(dict(current, error="Stored copy differs")), 409
+                return jsonify(current)
+            if not os.path.exists(part):
+                return jsonify({"error": "Nothing uploaded"}), 404
+            actual = file_sha256(part)
+            size = os.path.getsize(part)
+            if actual != data.get("sha256") or size != data.get("size"):
+                os.remove(part)
+                return jsonify({"error": "Checksum mismatch; upload discarded",
+                                "sha256": actual, "size": size}), 409
+            with open(part, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(part, final)
+            tmp_checksum = checksum + ".tmp"
+            with open(tmp_checksum, "w") as f:
+                f.write(actual)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_checksum, checksum)
+            return jsonify({"size": size, "complete": True, "sha256": actual})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage target for recording_archiver.py")
+    parser.add_argument("--root", required=True, help="directory the recordings are stored in")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5200)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, create_receiver_app(args.root), threaded=True)
+    print(f"Archive receiver on http://{args.host}:{args.port}/ -> {args.root}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# audio_service.py
+"""
+Non-blocking audio for the robot.
+
+All playback goes through one worker thread fed by a priority queue, so
+HTTP handlers and the obstacle safety loop only enqueue and return.
+Clips are decoded into memory once at startup (pygame Sound objects via
+robot_hat's mixer), and a higher-priority request (the death sound)
+stops whatever is playing. Text-to-speech phrases are synthesized once
+(pico2wave, else espeak) to a WAV file named after the hash of the text
+and replayed from disk. Without either synthesizer, phrases go to one
+long-lived robot_hat TTS helper process. A more important item (the
+death sound) preempts a running synthesis or helper phrase too: the
+process is killed, and the helper is restarted for the next phrase.
+"""
+import hashlib
+import itertools
+import os
+import queue
+import random
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+MUSIC_DIR = "/home/spyrobot/Music"
+DISTRACTION_CLIPS = [os.path.join(MUSIC_DIR, f"distraction_{i}.mp3") for i in range(1, 5)]
+DEATH_CLIP = os.path.join(MUSIC_DIR, "death.mp3")
+TTS_CACHE_DIR = os.path.expanduser("~/.cache/spyrobot/tts")
+TTS_LANG = "en-US"
+
+# Lower number = more important
+PRIORITY_DEATH = 0
+PRIORITY_SPEECH = 1
+PRIORITY_DISTRACTION = 2
+
+MAX_QUEUED = 8
+MAX_CACHED_SOUNDS = 32  # preloaded clips + recently spoken phrases
+
+# robot_hat TTS helper: speaks one phrase per stdin line, answers each with a line
+SPEAKER_SCRIPT = """
+import sys
+from robot_hat import TTS
+tts = TTS()
+for line in sys.stdin:
+    tts.say(line.rstrip("\\n"))
+    print("done", flush=True)
+"""
+
+
+def _kill_group(process):
+    """SIGTERM a process started with start_new_session=True, children included."""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+class AudioService:
+    def __init__(self, music, volume=100):
+        """music is the robot_hat Music() instance."""
+        self.music = music
+        self.volume = volume
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._sounds = {}        # path -> decoded pygame Sound
+        self._channel = None
+        self._thread = None
+        self._speaker = None     # robot_hat TTS helper process, reused across phrases
+        self.dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Public API (never blocks)
+    # ------------------------------------------------------------------
+    def play_death(self):
+        self._enqueue(PRIORITY_DEATH, "clip", DEATH_CLIP)
+
+    def play_distraction(self):
+        chosen = random.choice(DISTRACTION_CLIPS)
+        self._enqueue(PRIORITY_DISTRACTION, "clip", chosen)
+        return chosen
+
+    def say(self, text):
+        self._enqueue(PRIORITY_SPEECH, "tts", text)
+
+    def _enqueue(self, priority, kind, payload):
+        if self._queue.qsize() >= MAX_QUEUED and priority != PRIORITY_DEATH:
+            self.dropped += 1
+            print(f"Audio queue full, dropping {kind}: {payload}")
+            return
+        self._queue.put((priority, next(self._order), kind, payload))
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _preload(self):
+        try:
+            self.music.music_set_volume(self.volume)
+        except Exception as e:
+            print("Audio: could not set volume:", e)
+        if pygame is None or not pygame.mixer.get_init():
+            print("Audio: pygame mixer unavailable, falling back to Music.music_play")
+            return
+        self._channel = pygame.mixer.Channel(0)
+        for path in DISTRACTION_CLIPS + [DEATH_CLIP]:
+            self._load(path)
+        print(f"Audio: preloaded {len(self._sounds)} clips")
+
+    def _load(self, path):
+        sound = self._sounds.get(path)
+        if sound is None and self._channel is not None:
+            try:
+                sound = pygame.mixer.Sound(path)
+                sound.set_volume(self.volume / 100.0)
+                if len(self._sounds) < MAX_CACHED_SOUNDS:
+                    self._sounds[path] = sound
+            except Exception as e:
+                print(f"Audio: could not decode {path}: {e}")
+        return sound
+
+    def _worker(self):
+        self._preload()
+        pending = None
+        while True:
+            item = pending or self._queue.get()
+            pending = None
+            priority, _, kind, payload = item
+            try:
+                if kind == "tts":
+                    path, pending = self._tts_file(payload, priority)
+                    if pending is not None:
+                        continue   # synthesis preempted; the phrase is dropped
+                    if path is None:
+                        # No synthesizer we can cache from; let robot_hat speak it
+                        pending = self._speak(payload, priority)
+                        continue
+                else:
+                    path = payload
+                pending = self._play(path, priority)
+            except Exception as e:
+                print(f"Audio: failed to play {payload}: {e}")
+
+    def _play(self, path, priority):
+        """
+        Play `path` and wait for it to finish. Returns a queued item that
+        preempted it, if any.
+        """
+        sound = self._load(path)
+        if sound is None:
+            self.music.music_play(path)
+            return None
+
+        self._channel.play(sound)
+        print(f"Audio: playing {path}")
+        return self._wait(self._channel.get_busy, self._channel.stop, priority)
+
+    def _speak(self, text, priority):
+        """
+        Say `text` through the robot_hat helper (started on first use, in its
+        own process group since it pipes through aplay). A more important item
+        kills it. Returns the preempting item, if any.
+        """
+        if self._speaker is None or self._speaker.poll() is not None:
+            self._speaker = subprocess.Popen(
+                [sys.executable, "-c", SPEAKER_SCRIPT], stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, text=True, start_new_session=True)
+        speaker = self._speaker
+        speaker.stdin.write(" ".join(text.split()) + "\n")
+        speaker.stdin.flush()
+
+        def busy():
+            if speaker.poll() is not None:
+                return False
+            ready, _, _ = select.select([speaker.stdout], [], [], 0)
+            if ready:
+                speaker.stdout.readline()
+                return False
+            return True
+
+        def stop():
+            self._speaker = None
+            _kill_group(speaker)
+
+        return self._wait(busy, stop, priority)
+
+    def _wait(self, busy, stop, priority):
+        """Wait while busy(); a more important queued item calls stop() and is returned."""
+        while busy():
+            try:
+                item = self._queue.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if item[0] < priority:
+                stop()
+                return item
+            # Not more important: put it back for later
+            self._queue.put(item)
+            time.sleep(0.05)
+        return None
+
+    def _tts_file(self, text, priority):
+        """
+        (path to a cached WAV for `text` or None, preempting item or None),
+        synthesizing the WAV on first use. A more important item stops the
+        synthesis.
+        """
+        key = hashlib.sha1(f"{TTS_LANG}:{text}".encode("utf-8")).hexdigest()
+        path = os.path.join(TTS_CACHE_DIR, f"{key}.wav")
+        if os.path.exists(path):
+            return path, None
+        if shutil.which("pico2wave"):
+            cmd = ["pico2wave", "-l", TTS_LANG, "-w"]
+        elif shutil.which("espeak"):
+            cmd = ["espeak", "-v", TTS_LANG.lower(), "-w"]
+        else:
+            return None, None
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        tmp_path = os.path.join(TTS_CACHE_DIR, f"{key}.tmp.wav")
+        process = subprocess.Popen(cmd + [tmp_path, text], start_new_session=True)
+        item = self._wait(lambda: process.poll() is None, lambda: _kill_group(process), priority)
+        if item is not None or process.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if item is None:
+                raise subprocess.CalledProcessError(process.returncode, cmd)
+            return None, item
+        os.replace(tmp_path, path)
+        return path, None
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Compare face detector backends on the training images.
+
+For every backend that can be loaded, reports per-frame detection latency
+(mean / p50 / p95) and the detection rate: the fraction of images in
+which at least one face was found. Images are resized to the camera's
+frame width first so the timings match live inference.
+
+    python3 benchmark_detectors.py
+    python3 benchmark_detectors.py --backends haar lbp --width 320 --repeat 5
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from face_detectors import DETECTORS
+
+DEFAULT_IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "target_images")
+
+
+def load_images(folder, width):
+    images = []
+    for file in sorted(os.listdir(folder)):
+        if not file.lower().endswith(('.jpg', '.png', '.jpeg')):
+            continue
+        img = cv2.imread(os.path.join(folder, file))
+        if img is None:
+            print(f"[WARNING] Could not read {file}, skipping...")
+            continue
+        if width and img.shape[1] != width:
+            scale = width / img.shape[1]
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        images.append(img)
+    return images
+
+
+def benchmark(detector, images, repeat):
+    # Warm-up: first calls pay for lazy allocations (and DNN graph setup)
+    for img in images[:2]:
+        detector.detect(img)
+
+    latencies = []
+    detected = 0
+    for img in images:
+        found = False
+        for _ in range(repeat):
+            start = time.perf_counter()
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            faces = detector.detect(img, gray)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            found = found or len(faces) > 0
+        detected += found
+
+    latencies = np.array(latencies)
+    return {
+        "mean_ms": latencies.mean(),
+        "p50_ms": np.percentile(latencies, 50),
+        "p95_ms": np.percentile(latencies, 95),
+        "rate": detected / len(images),
+        "fps": 1000.0 / latencies.mean(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detector backends")
+    parser.add_argument("--backends", nargs="+", choices=sorted(DETECTORS), default=list(DETECTORS))
+    parser.add_argument("--images", default=DEFAULT_IMAGES, help="folder of test images")
+    parser.add_argument("--width", type=int, default=640, help="resize images to this width (0 = keep)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per image")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.width)
+    if not images:
+        print(f"[ERROR] No images found in {args.images}")
+        return
+    print(f"[INFO] {len(images)} images at width {args.width or 'original'}, "
+          f"{args.repeat} runs each, {cv2.getNumThreads()} OpenCV threads\n")
+
+    print(f"{'backend':<8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'fps':>7} {'detected':>9}")
+    for name in args.backends:
+        try:
+            detector = DETECTORS[name]()
+        except (FileNotFoundError, ValueError, cv2.error) as e:
+            print(f"{name:<8} unavailable: {e}")
+            continue
+        r = benchmark(detector, images, args.repeat)
+        print(f"{name:<8} {r['mean_ms']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} "
+              f"{r['fps']:7.1f} {r['rate']:8.0%}")
+
+
+if __name__ == "__main__":
+    main()
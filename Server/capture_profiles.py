@@ -0,0 +1,117 @@
+# capture_profiles.py
+"""
+Capture profiles: one camera, two frame streams.
+
+The camera runs at the profile's full resolution. For every camera frame,
+video_stream.py makes one downscaled copy and publishes both frames:
+
+    full     (FULL_BUS_NAME)      recording and photos
+    analysis (ANALYSIS_BUS_NAME)  face detection, the MJPEG stream, /camera/detections
+
+Detection runs on the analysis frame only. Its boxes are scaled up with
+scale_detections(), so both buses carry detections in their own frame's
+coordinates and the two frames share a frame id.
+
+server.py switches profiles at runtime by writing the requested name to
+PROFILE_CONTROL_PATH. The video process polls that file and restarts the
+camera at the new size. Both buses are re-created: the old handles raise
+FrameBusClosed, server.py re-attaches by name (get_frame_bus) and the
+recorder in video_stream.py picks the new bus up from frame_buses.
+"""
+import json
+import os
+import time
+from collections import namedtuple
+
+from frame_bus import FRAME_BUS_NAME
+
+FULL_BUS_NAME = FRAME_BUS_NAME
+ANALYSIS_BUS_NAME = FRAME_BUS_NAME + "_analysis"
+
+PROFILE_CONTROL_PATH = "/tmp/spyrobot_capture_profile.json"
+
+# full: camera size (w, h); analysis: detection/stream size (w, h)
+Profile = namedtuple("Profile", ["name", "full", "analysis", "description"])
+
+PROFILES = {
+    "low": Profile("low", (640, 480), (320, 240),
+                   "640x480 recording, lowest CPU use"),
+    "balanced": Profile("balanced", (1280, 720), (640, 360),
+                        "720p recording, detection on 640x360"),
+    "high": Profile("high", (1920, 1080), (640, 360),
+                    "1080p recording, detection on 640x360"),
+}
+DEFAULT_PROFILE = "balanced"
+
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile '{name}', choose from {sorted(PROFILES)}")
+    return PROFILES[name]
+
+
+def profile_info(profile):
+    return {
+        "name": profile.name,
+        "full": list(profile.full),
+        "analysis": list(profile.analysis),
+        "description": profile.description,
+    }
+
+
+def analysis_size(full_shape, profile):
+    """
+    (w, h) of the analysis frame for a full frame of `full_shape`. The
+    camera may not honour the requested size exactly, so the profile's
+    analysis width is kept and the height follows the actual aspect ratio.
+    """
+    h, w = full_shape[:2]
+    aw = min(w, profile.analysis[0])
+    return aw, max(1, round(h * aw / w))
+
+
+def scale_detections(detections, src_shape, dst_shape):
+    """Map (x, y, w, h, known, confidence) boxes from src frame coordinates to dst."""
+    sx = dst_shape[1] / src_shape[1]
+    sy = dst_shape[0] / src_shape[0]
+    return [
+        (round(x * sx), round(y * sy), round(w * sx), round(h * sy), known, confidence)
+        for (x, y, w, h, known, confidence) in detections
+    ]
+
+
+def write_requested_profile(name, path=PROFILE_CONTROL_PATH):
+    get_profile(name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"profile": name, "requested": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def read_requested_profile(path=PROFILE_CONTROL_PATH):
+    """Requested profile name, or None if nothing (valid) has been requested."""
+    try:
+        with open(path, "r") as f:
+            name = json.load(f).get("profile")
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        return None
+    return name if name in PROFILES else None
+
+
+class ProfileWatcher:
+    """Polls the control file; changed() returns a newly requested profile once."""
+
+    def __init__(self, path=PROFILE_CONTROL_PATH):
+        self.path = path
+        self._mtime = None
+
+    def changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        name = read_requested_profile(self.path)
+        return PROFILES[name] if name else None
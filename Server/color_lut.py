@@ -0,0 +1,148 @@
+# color_lut.py
+"""
+All six Vilib colours classified in one pass with a BGR lookup table.
+
+Vilib.color_detect() tracks one colour at a time. Here every pixel of a
+downscaled frame gets a colour class from a precomputed 32x32x32 table
+indexed by the top 5 bits of B, G and R. The HSV conversion and the six
+range checks are paid once, when the table is built, so classifying for
+six colours costs the same as for one. Connected components then only
+run for colours with enough pixels to form a blob.
+
+    python3 color_lut.py    # timing of the table vs per-colour inRange
+"""
+import cv2
+import numpy as np
+
+# (name, [(h low, h high), ...], s min, v min) in OpenCV HSV (H 0-180)
+COLORS = [
+    ("red", [(0, 4), (167, 180)], 90, 70),
+    ("orange", [(5, 18)], 90, 70),
+    ("yellow", [(22, 37)], 90, 70),
+    ("green", [(42, 85)], 70, 50),
+    ("blue", [(92, 125)], 70, 50),
+    ("purple", [(126, 166)], 60, 50),
+]
+COLOR_NAMES = [name for name, _, _, _ in COLORS]
+
+BITS = 5                  # bits per channel kept for the table index
+WIDTH = 160               # frames are classified at this width
+MIN_AREA = 12             # pixels (at WIDTH) for a blob to be reported
+MAX_BLOBS = 5             # largest blobs reported per colour
+
+
+def build_lut(bits=BITS):
+    """uint8 table, class = lut[b >> s, g >> s, r >> s]; 0 = none, i + 1 = COLORS[i]."""
+    n = 1 << bits
+    step = 256 // n
+    centres = np.arange(n, dtype=np.uint8) * step + step // 2
+    b, g, r = np.meshgrid(centres, centres, centres, indexing="ij")
+    bgr = np.stack([b, g, r], axis=-1).reshape(-1, 1, 3)
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV).reshape(-1, 3).astype(np.int16)
+    h, s, v = hsv[:, 0], hsv[:, 1], hsv[:, 2]
+
+    lut = np.zeros(n ** 3, dtype=np.uint8)
+    for index, (_, hue_ranges, s_min, v_min) in enumerate(COLORS, start=1):
+        hit = np.zeros(len(lut), dtype=bool)
+        for low, high in hue_ranges:
+            hit |= (h >= low) & (h <= high)
+        lut[hit & (s >= s_min) & (v >= v_min) & (lut == 0)] = index
+    return lut.reshape(n, n, n)
+
+
+class ColorDetector:
+    def __init__(self, width=WIDTH, bits=BITS):
+        self.width = width
+        self.bits = bits
+        self.shift = 8 - bits
+        self.lut = build_lut(bits)
+        self._flat = self.lut.ravel()   # take() on a flat table beats 3-D fancy indexing
+
+    def classify(self, frame):
+        """Class map of `frame` downscaled to self.width. Returns (classes, scale)."""
+        scale = 1.0
+        if frame.shape[1] > self.width:
+            scale = self.width / frame.shape[1]
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        q = (frame >> self.shift).astype(np.uint16)
+        index = (q[..., 0] << (2 * self.bits)) | (q[..., 1] << self.bits) | q[..., 2]
+        return self._flat.take(index), scale
+
+    def detect(self, frame, colors=None):
+        """
+        Blobs per colour in `frame` coordinates:
+        {name: [{"x", "y", "w", "h", "area", "cx", "cy"}, ...]}, largest first.
+        `colors` limits the result to those names; classification costs the same.
+        """
+        classes, scale = self.classify(frame)
+        counts = np.bincount(classes.ravel(), minlength=len(COLORS) + 1)
+        wanted = COLOR_NAMES if colors is None else [c for c in COLOR_NAMES if c in colors]
+
+        blobs = {}
+        for name in wanted:
+            index = COLOR_NAMES.index(name) + 1
+            blobs[name] = []
+            if counts[index] < MIN_AREA:
+                continue
+            mask = (classes == index).astype(np.uint8)
+            n, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+            order = np.argsort(stats[1:, cv2.CC_STAT_AREA])[::-1] + 1
+            for label in order[:MAX_BLOBS]:
+                x, y, w, h, area = stats[label]
+                if area < MIN_AREA:
+                    break
+                cx, cy = centroids[label]
+                blobs[name].append({
+                    "x": int(x / scale), "y": int(y / scale),
+                    "w": int(round(w / scale)), "h": int(round(h / scale)),
+                    "area": int(round(area / (scale * scale))),
+                    "cx": round(float(cx / scale), 1), "cy": round(float(cy / scale), 1),
+                })
+        return blobs
+
+
+def _inrange_detect(frame, names, width=WIDTH):
+    """Reference: one cvtColor + inRange + components per colour, as Vilib does it."""
+    scale = width / frame.shape[1]
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    for name, hue_ranges, s_min, v_min in COLORS:
+        if name not in names:
+            continue
+        mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+        for low, high in hue_ranges:
+            mask |= cv2.inRange(hsv, (low, s_min, v_min), (high, 255, 255))
+        cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+
+def main():
+    import time
+
+    def test_frame(colors):
+        rng = np.random.default_rng(0)
+        frame = cv2.GaussianBlur(rng.integers(0, 256, (360, 640, 3), dtype=np.uint8), (31, 31), 0)
+        frame = cv2.addWeighted(frame, 0.3, np.full_like(frame, 128), 0.7, 0)   # greyish clutter
+        for i, (_, hue_ranges, _, _) in enumerate(COLORS[:colors]):
+            hue = np.uint8(hue_ranges[0][0] + 1)
+            patch = cv2.cvtColor(np.array([[[hue, 220, 200]]], dtype=np.uint8), cv2.COLOR_HSV2BGR)
+            frame[40:120, 20 + i * 100:90 + i * 100] = patch
+        return frame
+
+    def timed(run, frame, names, repeat=300):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            run(frame, names)
+        return (time.perf_counter() - start) / repeat * 1000.0
+
+    detector = ColorDetector()
+    one, six = test_frame(1), test_frame(6)
+    cases = [("1 asked", one, COLOR_NAMES[:1]), ("6 asked/1 seen", one, COLOR_NAMES),
+             ("6 asked/6 seen", six, COLOR_NAMES)]
+    print(f"{'ms per frame':<20}" + "".join(f"{name:>16}" for name, _, _ in cases))
+    for label, run in (("lookup table", detector.detect), ("inRange per colour", _inrange_detect)):
+        print(f"{label:<20}" + "".join(f"{timed(run, frame, names):16.3f}" for _, frame, names in cases))
+    print({name: len(found) for name, found in detector.detect(six).items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# dataset_curation.py
+"""
+Curation of LBPH training crops, used by train_lbph.py.
+
+LBPH keeps one spatial histogram per training image and predict() compares
+the query against every one of them, so each redundant crop costs model
+size and live latency. Three passes shrink the set:
+
+    quality  - drop blurry crops (variance of the Laplacian) and badly
+               exposed ones (mean brightness out of range, or too many
+               clipped pixels)
+    dedup    - 64-bit difference hash (dHash); crops within
+               DEDUP_DISTANCE bits of a sharper crop already kept are
+               burst-shot near-duplicates and are dropped
+    cluster  - optional k-means over the crops' LBP histograms, keeping
+               the crop nearest each centre as its representative
+
+No pass reduces the set below MIN_SAMPLES; the best-scoring crops are
+kept instead.
+"""
+import cv2
+import numpy as np
+
+DEDUP_DISTANCE = 6       # dHash bits (of 64) below which two crops are duplicates
+MIN_SHARPNESS = 40.0     # variance of the Laplacian on the 200x200 crop
+EXPOSURE_RANGE = (40, 215)
+MAX_CLIPPED = 0.25       # fraction of pixels at <= 5 or >= 250
+MIN_SAMPLES = 5
+
+
+def dhash(gray, size=8):
+    """64-bit difference hash: brighter-than-right-neighbour bits of a 9x8 thumbnail."""
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def join_groups(n, groups):
+    """
+    Partition range(n) so that the members of every input group end up
+    together (connected components). Returns sorted groups ordered by
+    their first index.
+    """
+    parent = list(range(n))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for group in groups:
+        for i in group[1:]:
+            parent[root(i)] = root(group[0])
+    joined = {}
+    for i in range(n):
+        joined.setdefault(root(i), []).append(i)
+    return sorted(joined.values())
+
+
+def duplicate_clusters(crops, dedup_distance=DEDUP_DISTANCE):
+    """
+    Crop indices grouped so that crops within dedup_distance dHash bits
+    of each other share a group (chains of burst shots form one group).
+    """
+    hashes = [dhash(crop) for crop in crops]
+    pairs = [(j, i) for i in range(len(crops)) for j in range(i)
+             if hamming(hashes[i], hashes[j]) <= dedup_distance]
+    return join_groups(len(crops), pairs)
+
+
+def sharpness(gray):
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def exposure(gray):
+    """(mean brightness, fraction of clipped pixels)."""
+    clipped = np.count_nonzero((gray <= 5) | (gray >= 250)) / gray.size
+    return float(gray.mean()), float(clipped)
+
+
+def score_crop(gray):
+    mean, clipped = exposure(gray)
+    return {"sharpness": sharpness(gray), "brightness": mean, "clipped": clipped,
+            "hash": dhash(gray)}
+
+
+def _quality_ok(score, min_sharpness):
+    low, high = EXPOSURE_RANGE
+    return (score["sharpness"] >= min_sharpness and low <= score["brightness"] <= high
+            and score["clipped"] <= MAX_CLIPPED)
+
+
+def lbp_histograms(crops, labels):
+    """Per-crop spatial LBP histograms, exactly as LBPH stores them."""
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(crops, np.array(labels))
+    return np.array([h.flatten() for h in recognizer.getHistograms()], dtype=np.float32)
+
+
+def cluster_representatives(crops, labels, indices, k):
+    """Index (into crops) of the crop nearest each of k k-means centres, per label."""
+    keep = []
+    for label in sorted(set(labels[i] for i in indices)):
+        members = [i for i in indices if labels[i] == label]
+        if len(members) <= k:
+            keep.extend(members)
+            continue
+        hists = lbp_histograms([crops[i] for i in members], [label] * len(members))
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 50, 1e-4)
+        _, assignment, centres = cv2.kmeans(hists, k, None, criteria, 3, cv2.KMEANS_PP_CENTERS)
+        for c in range(k):
+            in_cluster = np.flatnonzero(assignment.ravel() == c)
+            if len(in_cluster) == 0:
+                continue
+            distances = np.linalg.norm(hists[in_cluster] - centres[c], axis=1)
+            keep.append(members[in_cluster[int(np.argmin(distances))]])
+    return sorted(keep)
+
+
+def curate(crops, labels, min_sharpness=MIN_SHARPNESS, dedup_distance=DEDUP_DISTANCE,
+           clusters=0):
+    """
+    crops: 200x200 grayscale face crops, labels: their LBPH labels.
+    Returns (indices kept, report) where report counts what each pass removed.
+    """
+    scores = [score_crop(crop) for crop in crops]
+    # Best first: dedup keeps the sharpest of a burst, fallbacks keep the best
+    order = sorted(range(len(crops)), key=lambda i: scores[i]["sharpness"], reverse=True)
+    report = {"input": len(crops)}
+
+    kept = [i for i in order if _quality_ok(scores[i], min_sharpness)]
+    if len(kept) < MIN_SAMPLES:
+        kept = order[:MIN_SAMPLES]
+    report["low_quality"] = len(crops) - len(kept)
+
+    unique = []
+    for i in kept:
+        if all(labels[i] != labels[j] or hamming(scores[i]["hash"], scores[j]["hash"]) > dedup_distance
+               for j in unique):
+            unique.append(i)
+    if len(unique) < MIN_SAMPLES:
+        unique = kept[:MIN_SAMPLES]
+    report["duplicates"] = len(kept) - len(unique)
+
+    result = sorted(unique)
+    if clusters and len(result) > max(clusters, MIN_SAMPLES):
+        result = cluster_representatives(crops, labels, result, max(clusters, MIN_SAMPLES))
+    report["clustered_out"] = len(unique) - len(result)
+    report["kept"] = len(result)
+    return result, report
@@ -0,0 +1,376 @@
+# detection_pool.py
+"""
+Face detection spread over several cores.
+
+The capture thread passes each new camera frame to DetectionPool.submit().
+The analysis frame is copied into a shared-memory ring (frame_bus.FrameBus,
+one slot per in-flight frame), and worker processes pick it up by sequence
+number. Each worker loads its own detector and limits OpenCV to one
+thread. Recognition stays in the caller: face_tracker.FaceTracker runs
+LBPH once per track rather than once per face, which is too little work
+to be worth shipping crops to the workers. Results return on a queue and pass
+through a reorder buffer, so on_result sees frames strictly in capture
+order. The face timers, frame buses and recorder therefore never see time
+go backwards.
+
+At most `window` frames are in flight. When they are all busy a new frame
+waits in a single pending slot, and a newer frame replaces it
+(drop-oldest). Under overload, frames are skipped rather than queued, so
+the overlay lags by at most `window` frames. A result that does not
+arrive within RESULT_TIMEOUT (a crashed worker) is released without
+detections. A worker that dies is replaced unless it failed right at
+startup. The replacement is not forked then: by that time the video
+process runs several threads, and a fork could inherit a lock some other
+thread holds and deadlock. Instead, SPARE_WORKERS idle workers are forked
+in start() together with the others. They wait on an event and are
+activated one per crash.
+
+A worker killed inside tasks.get() or results.put() can die holding
+that queue's lock, after which no worker gets (or returns) anything
+while every process still looks alive. If frames keep being dispatched
+for STALL_TIMEOUT without a single result, the pool marks itself
+stalled and healthy() returns False, so the caller detects inline.
+"""
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from frame_bus import FrameBus
+from face_detectors import create_detector
+from capture_profiles import scale_detections
+
+MODEL_PATH = "trained_model.yml"
+FACE_SIZE = (200, 200)   # LBPH input size used in training
+KNOWN_LABEL = 1
+KNOWN_THRESHOLD = 65     # LBPH distance below which the target is "known"
+RESULT_TIMEOUT = 2.0     # seconds before a missing result is given up
+MIN_WORKER_LIFETIME = 5.0  # a worker dying sooner than this is broken, not unlucky
+STALL_TIMEOUT = 10.0     # seconds of dispatching without any result: the queues are wedged
+SPARE_WORKERS = 2        # idle workers forked up front to replace crashed ones
+RING_PREFIX = "spyrobot_pool"
+SKIPPED = "skipped"      # on_result's faces for a frame submitted with detect=False
+STATS_PATH = "/tmp/spyrobot_detection_stats.json"   # written by video_stream.py
+
+
+def default_workers():
+    """One process per core, leaving one core for capture, recording and the servers."""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def load_recognizer(path=MODEL_PATH):
+    try:
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(path)
+        return recognizer
+    except Exception as e:
+        print("Error loading LBPH model:", e)
+        return None
+
+
+def detect_faces(analysis, detector, scale=1.0):
+    """
+    Face boxes (x, y, w, h, score) on the analysis frame. scale < 1 runs the
+    detector on a smaller copy (governor.py) and maps the boxes back.
+    """
+    if scale != 1.0:
+        small = cv2.resize(analysis, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return [(int(x / scale), int(y / scale), int(w / scale), int(h / scale), score)
+                for x, y, w, h, score in detector.detect(small, gray)]
+    gray = cv2.cvtColor(analysis, cv2.COLOR_BGR2GRAY)
+    return [tuple(face) for face in detector.detect(analysis, gray)]
+
+
+def recognize_face(full, analysis_shape, box, recognizer):
+    """
+    Run LBPH on the full-resolution crop of an analysis-frame box.
+    Returns (known, confidence).
+    """
+    (fx, fy, fw, fh, _, _), = scale_detections([tuple(box[:4]) + (0, 0.0)], analysis_shape, full.shape)
+    face_roi = cv2.cvtColor(full[fy:fy+fh, fx:fx+fw], cv2.COLOR_BGR2GRAY)
+    face_roi = cv2.resize(face_roi, FACE_SIZE)
+    label, confidence = recognizer.predict(face_roi)
+    return label == KNOWN_LABEL and confidence < KNOWN_THRESHOLD, float(confidence)
+
+
+def _attach_ring(rings, name):
+    """Attach (and cache) a ring by name, dropping attachments of older generations."""
+    ring = rings.get(name)
+    if ring is None:
+        ring = rings[name] = FrameBus.attach(name)
+        while len(rings) > 4:
+            rings.pop(next(iter(rings))).close()
+    return ring
+
+
+def _worker_main(tasks, results, detector_name, activate=None):
+    # Ctrl+C reaches the whole process group; the parent shuts workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if activate is not None:
+        # A spare: stay idle until it replaces a crashed worker
+        activate.wait()
+    # Parallelism comes from the processes; more OpenCV threads would just contend
+    cv2.setNumThreads(1)
+    detector = create_detector(detector_name)
+    rings = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, ring_name, scale = task
+        start = time.perf_counter()
+        faces = None
+        try:
+            analysis = _attach_ring(rings, ring_name).read(seq, copy=False)
+            if analysis is not None:
+                faces = detect_faces(analysis.image, detector, scale)
+        except Exception as e:
+            print(f"Detection worker {os.getpid()} error:", e)
+        results.put((seq, faces, time.perf_counter() - start))
+    for ring in rings.values():
+        ring.close()
+
+
+class DetectionPool:
+    def __init__(self, on_result, workers=None, window=None, detector_name=None):
+        """
+        on_result(full, analysis, faces, timestamp) runs on the pool's
+        collector thread, in submission order. faces are the detect_faces()
+        boxes, None if the frame could not be analysed, or SKIPPED.
+        """
+        self.on_result = on_result
+        self.workers = workers or default_workers()
+        self.window = window or self.workers + 1
+        self.detector_name = detector_name
+
+        # Forked, so workers do not re-import the caller's script. Start the pool
+        # before the camera and other threads (see video_stream.main); only
+        # start() forks, later replacements come from the spares.
+        self._ctx = mp.get_context("fork")
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._procs = []
+        self._spares = []         # (process, activate event)
+
+        self._lock = threading.Lock()
+        self._next_seq = 0        # sequence number of the next dispatched frame
+        self._next_release = 0    # next sequence number handed to on_result
+        self._inflight = {}       # seq -> (full, analysis, timestamp, dispatched at)
+        self._done = {}           # seq -> faces, waiting for earlier frames
+        self._pending = None      # (full, analysis, timestamp, detect, scale) waiting for a slot
+        self._ring = None         # analysis ring for the current frame shape
+        self._old_rings = []      # (last seq, ring) closed once those frames are released
+        self._generations = itertools.count()
+        self._running = False
+        self._last_result = 0.0   # monotonic time of the last worker result (or of start())
+        self._last_dispatch = 0.0
+        self._stalled = False
+
+        self.stats = {"submitted": 0, "dispatched": 0, "dropped": 0, "completed": 0,
+                      "failed": 0, "timeouts": 0, "restarts": 0, "skipped": 0, "stalled": False}
+        self._latencies = deque(maxlen=500)   # capture -> release (ms)
+        self._busy = deque(maxlen=500)        # worker time per frame (ms)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def _spawn(self, activate=None):
+        proc = self._ctx.Process(target=_worker_main, daemon=True,
+                                 args=(self._tasks, self._results, self.detector_name, activate))
+        proc.start()
+        proc.started_at = time.monotonic()
+        return proc
+
+    def start(self):
+        self._running = True
+        self._last_result = time.monotonic()
+        self._procs = [self._spawn() for _ in range(self.workers)]
+        for _ in range(SPARE_WORKERS):
+            activate = self._ctx.Event()
+            self._spares.append((self._spawn(activate), activate))
+        threading.Thread(target=self._collect_loop, daemon=True, name="detection-collector").start()
+        print(f"Detection pool: {self.workers} workers, window {self.window}")
+        return self
+
+    def stop(self):
+        self._running = False
+        for proc, _ in self._spares:
+            proc.terminate()
+        self._spares = []
+        procs = [proc for proc in self._procs if proc is not None]
+        for _ in procs:
+            self._tasks.put(None)
+        for proc in procs:
+            proc.join(timeout=2)
+            if proc.is_alive():
+                proc.terminate()
+        with self._lock:
+            for _, ring in self._old_rings:
+                ring.close()
+            self._old_rings = []
+            if self._ring is not None:
+                self._ring.close()
+                self._ring = None
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def submit(self, full, analysis, timestamp=None, detect=True, scale=1.0):
+        """
+        Queue a frame pair without blocking; replaces a frame still waiting for a slot.
+        With detect=False the frame only keeps its place in the ordered output
+        (on_result gets SKIPPED); scale is passed to detect_faces().
+        """
+        with self._lock:
+            self.stats["submitted"] += 1
+            if self._pending is not None:
+                self.stats["dropped"] += 1
+            self._pending = (full, analysis, time.time() if timestamp is None else timestamp,
+                             detect, scale)
+            self._dispatch_locked()
+
+    def _ring_for(self, analysis):
+        ring = self._ring
+        if ring is None or ring.shape[:2] != analysis.shape[:2]:
+            if ring is not None:
+                self._old_rings.append((self._next_seq - 1, ring))
+            name = f"{RING_PREFIX}_{os.getpid()}_{next(self._generations)}"
+            ring = self._ring = FrameBus.create(analysis.shape, name=name, slots=self.window, max_dets=1)
+        return ring
+
+    def _dispatch_locked(self):
+        # A slot is free once the frame `window` sequence numbers back was released
+        if self._pending is None or self._next_seq - self._next_release >= self.window:
+            return
+        full, analysis, timestamp, detect, scale = self._pending
+        self._pending = None
+        seq = self._next_seq
+        self._next_seq += 1
+        if not detect:
+            self._inflight[seq] = (full, analysis, timestamp, time.monotonic())
+            self._done[seq] = SKIPPED
+            self.stats["skipped"] += 1
+            self._results.put((-1, None, 0.0))   # wake the collector to release it
+            return
+        ring = self._ring_for(analysis)
+        ring.publish(analysis, timestamp=timestamp, frame_id=seq)
+        self._inflight[seq] = (full, analysis, timestamp, time.monotonic())
+        self.stats["dispatched"] += 1
+        self._last_dispatch = time.monotonic()
+        self._tasks.put((seq, ring.name, scale))
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+    def _collect_loop(self):
+        last_check = time.monotonic()
+        while self._running:
+            try:
+                seq, faces, busy = self._results.get(timeout=0.1)
+                with self._lock:
+                    if seq >= 0:
+                        self._last_result = time.monotonic()
+                    if seq in self._inflight:
+                        self._done[seq] = faces
+                        self._busy.append(busy * 1000.0)
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                break
+            self._release()
+
+            if time.monotonic() - last_check >= 1.0:
+                last_check = time.monotonic()
+                self._check_workers()
+
+    def _check_workers(self):
+        with self._lock:
+            stalled = self._last_dispatch - self._last_result > STALL_TIMEOUT
+        if stalled and not self._stalled:
+            print(f"Detection pool: no result for {STALL_TIMEOUT:.0f}s while dispatching; "
+                  f"giving up on the workers")
+            self._stalled = self.stats["stalled"] = True
+        for i, proc in enumerate(self._procs):
+            if not self._running or proc is None or proc.is_alive():
+                continue
+            if time.monotonic() - proc.started_at < MIN_WORKER_LIFETIME:
+                # e.g. detector files missing: restarting would only loop
+                print(f"Detection worker {proc.pid} failed at startup ({proc.exitcode}); not restarting")
+                self._procs[i] = None
+                continue
+            self._procs[i] = self._activate_spare()
+            if self._procs[i] is None:
+                print(f"Detection worker {proc.pid} exited ({proc.exitcode}); no spare left")
+                continue
+            print(f"Detection worker {proc.pid} exited ({proc.exitcode}); "
+                  f"replaced by spare {self._procs[i].pid}")
+            self.stats["restarts"] += 1
+
+    def _activate_spare(self):
+        while self._spares:
+            proc, activate = self._spares.pop(0)
+            if proc.is_alive():
+                activate.set()
+                proc.started_at = time.monotonic()
+                return proc
+        return None
+
+    def healthy(self):
+        """False once every worker has failed or the pool stalled; the caller should detect inline then."""
+        return not self._stalled and any(proc is not None for proc in self._procs)
+
+    def _release(self):
+        ready = []
+        with self._lock:
+            now = time.monotonic()
+            while self._next_release < self._next_seq:
+                seq = self._next_release
+                if seq in self._done:
+                    faces = self._done.pop(seq)
+                elif now - self._inflight[seq][3] >= RESULT_TIMEOUT:
+                    faces = None
+                    self.stats["timeouts"] += 1
+                else:
+                    break
+                full, analysis, timestamp, _ = self._inflight.pop(seq)
+                ready.append((full, analysis, faces, timestamp))
+                self._next_release += 1
+
+            while self._old_rings and self._old_rings[0][0] < self._next_release:
+                self._old_rings.pop(0)[1].close()
+            self._dispatch_locked()
+
+        for full, analysis, faces, timestamp in ready:
+            if faces is None:
+                self.stats["failed"] += 1
+            elif faces is not SKIPPED:
+                self.stats["completed"] += 1
+                self._latencies.append((time.time() - timestamp) * 1000.0)
+            try:
+                self.on_result(full, analysis, faces, timestamp)
+            except Exception as e:
+                print("Detection result handler error:", e)
+
+    def get_stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies) if self._latencies else None
+            busy = np.array(self._busy) if self._busy else None
+            stats = dict(self.stats, workers=self.workers, window=self.window,
+                         workers_alive=sum(proc is not None for proc in self._procs),
+                         spares=len(self._spares),
+                         in_flight=len(self._inflight), pending=self._pending is not None)
+        if latencies is not None:
+            stats["latency_p50_ms"] = round(float(np.percentile(latencies, 50)), 1)
+            stats["latency_p95_ms"] = round(float(np.percentile(latencies, 95)), 1)
+        if busy is not None:
+            stats["worker_ms"] = round(float(busy.mean()), 1)
+        return stats
@@ -0,0 +1,166 @@
+# detection_timeline.py
+"""
+Per-recording face sighting index.
+
+While recording, every frame is classified as "known" (the TARGET is in
+view), "unknown" (only other faces) or "none", and consecutive frames in
+the same state are run-length encoded into intervals. When the
+recording stops the intervals are written to <name>_detections.json:
+
+    {"name": ..., "duration": 93.4,
+     "fields": ["start", "end", "state", "best_conf", "mean_conf", "frames"],
+     "intervals": [[0.0, 4.1, "none", null, null, 82], [4.1, 9.7, "known", 41.2, 52.8, 112], ...],
+     "summary": {"known": 5.6, "unknown": 0.0, "none": 87.8}}
+
+Times are seconds from the start of the recording. Confidences are LBPH
+distances (lower = better match), matching custom_face_detect_func.
+SightingIndex answers archive-wide questions ("recordings where the
+target was visible for more than 5 s") from these small files only.
+"""
+import glob
+import json
+import os
+import threading
+
+STATES = ("known", "unknown", "none")
+FIELDS = ["start", "end", "state", "best_conf", "mean_conf", "frames"]
+SIDECAR_SUFFIX = "_detections.json"
+
+
+def sidecar_path(video_dir, name):
+    return os.path.join(video_dir, name + SIDECAR_SUFFIX)
+
+
+def classify(detections):
+    """
+    detections: iterable of (x, y, w, h, known, confidence).
+    Returns (state, best confidence of the faces that decided the state).
+    """
+    best_known = None
+    best_any = None
+    for det in detections:
+        confidence = float(det[5])
+        if best_any is None or confidence < best_any:
+            best_any = confidence
+        if det[4] and (best_known is None or confidence < best_known):
+            best_known = confidence
+    if best_known is not None:
+        return "known", best_known
+    if best_any is not None:
+        return "unknown", best_any
+    return "none", None
+
+
+class DetectionTimeline:
+    def __init__(self, video_dir, name):
+        self.path = sidecar_path(video_dir, name)
+        self.name = name
+        self.intervals = []
+        self._run = None   # [start, end, state, best, conf_sum, frames]
+
+    def add(self, t, detections):
+        """Record the detections of the frame shown at `t` seconds."""
+        state, confidence = classify(detections)
+        run = self._run
+        if run is not None and run[2] == state:
+            run[1] = t
+            run[5] += 1
+            if confidence is not None:
+                run[3] = confidence if run[3] is None else min(run[3], confidence)
+                run[4] += confidence
+            return
+        if run is not None:
+            run[1] = t   # a run lasts until the next state starts
+            self._close(run)
+        self._run = [t, t, state, confidence, confidence or 0.0, 1]
+
+    def _close(self, run):
+        start, end, state, best, conf_sum, frames = run
+        mean = round(conf_sum / frames, 1) if best is not None else None
+        self.intervals.append([round(start, 2), round(end, 2), state,
+                               None if best is None else round(best, 1), mean, frames])
+
+    def finish(self, duration):
+        if self._run is not None:
+            self._run[1] = max(self._run[1], duration)
+            self._close(self._run)
+            self._run = None
+        summary = dict.fromkeys(STATES, 0.0)
+        for start, end, state, *_ in self.intervals:
+            summary[state] = round(summary[state] + end - start, 2)
+        data = {
+            "name": self.name,
+            "duration": round(duration, 2),
+            "fields": FIELDS,
+            "intervals": self.intervals,
+            "summary": summary,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        return data
+
+
+def merge_intervals(intervals, state, gap):
+    """Same-state intervals joined across gaps shorter than `gap` seconds."""
+    merged = []
+    for start, end, s, *_ in intervals:
+        if s != state:
+            continue
+        if merged and start - merged[-1][1] <= gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class SightingIndex:
+    """Caches every sidecar in a folder, reloading only files whose mtime changed."""
+
+    def __init__(self, video_dir):
+        self.video_dir = video_dir
+        self._lock = threading.Lock()
+        self._cache = {}   # path -> (mtime_ns, data)
+
+    def _refresh(self):
+        paths = set(glob.glob(os.path.join(self.video_dir, "*" + SIDECAR_SUFFIX)))
+        for path in list(self._cache):
+            if path not in paths:
+                del self._cache[path]
+        for path in paths:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                cached = self._cache.get(path)
+                if cached is not None and cached[0] == mtime:
+                    continue
+                with open(path, "r") as f:
+                    self._cache[path] = (mtime, json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Skipping detection sidecar {path}: {e}")
+
+    def find(self, state="known", min_duration=5.0, gap=0.5):
+        """
+        Recordings with at least one continuous `state` sighting longer than
+        `min_duration` seconds (brief dropouts up to `gap` seconds are bridged).
+        """
+        with self._lock:
+            self._refresh()
+            entries = [data for _, data in self._cache.values()]
+
+        results = []
+        for data in entries:
+            sightings = [
+                [start, end] for start, end in merge_intervals(data["intervals"], state, gap)
+                if end - start >= min_duration
+            ]
+            if sightings:
+                results.append({
+                    "recording": data["name"],
+                    "duration": data["duration"],
+                    "sightings": sightings,
+                    "longest": round(max(end - start for start, end in sightings), 2),
+                    "total": data["summary"].get(state, 0.0),
+                })
+        results.sort(key=lambda r: r["recording"], reverse=True)
+        return results
@@ -0,0 +1,158 @@
+# face_detectors.py
+"""
+Interchangeable face detector backends, shared by train_lbph.py and
+video_stream.py so training crops and live crops come from the same
+detector.
+
+    haar - haarcascade_frontalface_default.xml (the original detector)
+    lbp  - lbpcascade_frontalface_improved.xml, several times faster on the Pi
+    dnn  - OpenCV DNN res10 SSD (Caffe, 300x300), slower than LBP but far
+           more robust to pose and lighting; runs on the CPU
+
+Pick one with --detector on the command line or the SPYROBOT_DETECTOR
+environment variable (default: haar). The LBP cascade and the SSD files
+are looked up in cascades/ and models/ next to this file:
+
+    cascades/lbpcascade_frontalface_improved.xml
+    models/deploy.prototxt
+    models/res10_300x300_ssd_iter_140000_fp16.caffemodel
+
+(all three come from the OpenCV sources: data/lbpcascades,
+samples/dnn/face_detector and opencv_3rdparty). fetch_models.py
+downloads them and checks that they load.
+"""
+import os
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CASCADE_DIR = os.path.join(BASE_DIR, "cascades")
+MODEL_DIR = os.path.join(BASE_DIR, "models")
+
+DEFAULT_DETECTOR = "haar"
+DETECTOR_ENV = "SPYROBOT_DETECTOR"
+
+# Same parameters the Haar pipeline has always used
+SCALE_FACTOR = 1.1
+MIN_NEIGHBORS = 5
+MIN_SIZE = (50, 50)
+
+
+def _find_file(filename, *dirs):
+    for d in dirs:
+        candidate = os.path.join(d, filename)
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"{filename} not found in: {', '.join(dirs)} "
+                            f"(python3 fetch_models.py downloads it)")
+
+
+def _to_gray(frame):
+    if frame.ndim == 2:
+        return frame
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+class FaceDetector:
+    """Base class. detect() returns a list of (x, y, w, h, score)."""
+    name = None
+
+    def detect(self, frame, gray=None):
+        raise NotImplementedError
+
+
+class CascadeDetector(FaceDetector):
+    def __init__(self, cascade_path):
+        try:
+            self.cascade = cv2.CascadeClassifier(cascade_path)
+        except (cv2.error, SystemError) as e:
+            raise ValueError(f"Could not load cascade {cascade_path}: {e}")
+        if self.cascade.empty():
+            raise ValueError(f"Could not load cascade {cascade_path}")
+        self.cascade_path = cascade_path
+
+    def detect(self, frame, gray=None):
+        if gray is None:
+            gray = _to_gray(frame)
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=SCALE_FACTOR, minNeighbors=MIN_NEIGHBORS, minSize=MIN_SIZE
+        )
+        return [(int(x), int(y), int(w), int(h), 1.0) for (x, y, w, h) in faces]
+
+
+class HaarDetector(CascadeDetector):
+    name = "haar"
+
+    def __init__(self, cascade_path=None):
+        if cascade_path is None:
+            cascade_path = _find_file("haarcascade_frontalface_default.xml",
+                                      cv2.data.haarcascades, CASCADE_DIR)
+        super().__init__(cascade_path)
+
+
+class LBPDetector(CascadeDetector):
+    name = "lbp"
+
+    def __init__(self, cascade_path=None):
+        if cascade_path is None:
+            lbp_dir = os.path.join(os.path.dirname(cv2.data.haarcascades.rstrip("/")), "lbpcascades")
+            cascade_path = _find_file("lbpcascade_frontalface_improved.xml", CASCADE_DIR, lbp_dir)
+        super().__init__(cascade_path)
+
+
+class DnnDetector(FaceDetector):
+    name = "dnn"
+    INPUT_SIZE = (300, 300)
+    MEAN = (104.0, 177.0, 123.0)
+
+    def __init__(self, prototxt=None, weights=None, confidence=0.5):
+        if prototxt is None:
+            prototxt = _find_file("deploy.prototxt", MODEL_DIR)
+        if weights is None:
+            try:
+                weights = _find_file("res10_300x300_ssd_iter_140000_fp16.caffemodel", MODEL_DIR)
+            except FileNotFoundError:
+                weights = _find_file("res10_300x300_ssd_iter_140000.caffemodel", MODEL_DIR)
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confidence = confidence
+
+    def detect(self, frame, gray=None):
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        h, w = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, self.INPUT_SIZE), 1.0,
+                                     self.INPUT_SIZE, self.MEAN)
+        self.net.setInput(blob)
+        out = self.net.forward()[0, 0]   # N x [image_id, label, conf, x1, y1, x2, y2]
+
+        faces = []
+        for det in out[out[:, 2] >= self.confidence]:
+            x1, y1, x2, y2 = (det[3:7] * np.array([w, h, w, h])).astype(int)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(w, x2), min(h, y2)
+            if x2 - x1 < MIN_SIZE[0] // 2 or y2 - y1 < MIN_SIZE[1] // 2:
+                continue
+            faces.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1), float(det[2])))
+        return faces
+
+
+DETECTORS = {
+    "haar": HaarDetector,
+    "lbp": LBPDetector,
+    "dnn": DnnDetector,
+}
+
+
+def selected_detector_name(name=None):
+    """Explicit name, else $SPYROBOT_DETECTOR, else haar."""
+    name = (name or os.environ.get(DETECTOR_ENV) or DEFAULT_DETECTOR).lower()
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector '{name}', choose from {sorted(DETECTORS)}")
+    return name
+
+
+def create_detector(name=None):
+    return DETECTORS[selected_detector_name(name)]()
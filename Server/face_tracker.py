@@ -0,0 +1,147 @@
+# face_tracker.py
+"""
+Faces followed across frames, so LBPH runs per track instead of per frame.
+
+Each frame's detector boxes are matched to existing tracks greedily by
+IoU, with a centroid-distance fallback for fast motion. A new track is
+recognised straight away, then again every REFRESH_INTERVAL seconds (every
+FAST_REFRESH_INTERVAL until it has MIN_VOTES). The track's label is the
+majority of its last VOTE_WINDOW recognitions. A face therefore keeps its
+TARGET/UNKNOWN label from frame to frame, and the 1-second timers in
+mission_logic.FacePresenceLogic stop resetting on a single bad frame.
+Tracks survive up to MAX_MISSES frames without a detection.
+"""
+import itertools
+from collections import deque
+
+IOU_THRESHOLD = 0.3
+CENTROID_FRACTION = 0.5      # centroid match if closer than this x the track width
+MAX_MISSES = 5               # frames a track is kept without a detection
+VOTE_WINDOW = 7              # recognitions kept per track
+MIN_VOTES = 3                # recognitions before the slower refresh applies
+FAST_REFRESH_INTERVAL = 0.2  # seconds between recognitions of a new track
+REFRESH_INTERVAL = 1.0       # seconds between recognitions of a settled track
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a[:4]
+    bx, by, bw, bh = b[:4]
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def centroid_distance(a, b):
+    return (((a[0] + a[2] / 2) - (b[0] + b[2] / 2)) ** 2 +
+            ((a[1] + a[3] / 2) - (b[1] + b[3] / 2)) ** 2) ** 0.5
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.misses = 0
+        self.frames = 1
+        self.votes = deque(maxlen=VOTE_WINDOW)   # (known, confidence)
+        self.last_recognized = None
+
+    def needs_recognition(self, now):
+        if self.last_recognized is None:
+            return True
+        interval = FAST_REFRESH_INTERVAL if len(self.votes) < MIN_VOTES else REFRESH_INTERVAL
+        return now - self.last_recognized >= interval
+
+    def add_vote(self, known, confidence, now):
+        self.votes.append((bool(known), float(confidence)))
+        self.last_recognized = now
+
+    @property
+    def known(self):
+        known_votes = sum(1 for known, _ in self.votes if known)
+        return known_votes * 2 > len(self.votes)
+
+    @property
+    def confidence(self):
+        """Mean LBPH distance of the votes that agree with the label."""
+        label = self.known
+        agreeing = [conf for known, conf in self.votes if known == label]
+        return sum(agreeing) / len(agreeing) if agreeing else 0.0
+
+    def detection(self):
+        x, y, w, h = self.box[:4]
+        return (x, y, w, h, int(self.known), self.confidence)
+
+
+class FaceTracker:
+    def __init__(self):
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self.stats = {"frames": 0, "faces": 0, "predicts": 0, "tracks": 0}
+
+    def _match(self, faces):
+        """Greedy matching: returns {face index: track}, best IoU first, then nearest centroid."""
+        pairs = []
+        for fi, face in enumerate(faces):
+            for track in self.tracks:
+                overlap = iou(face, track.box)
+                if overlap >= IOU_THRESHOLD:
+                    pairs.append((0, -overlap, fi, track))
+                else:
+                    distance = centroid_distance(face, track.box)
+                    if distance < CENTROID_FRACTION * track.box[2]:
+                        pairs.append((1, distance, fi, track))
+        pairs.sort(key=lambda p: (p[0], p[1]))
+
+        matches = {}
+        used = set()
+        for _, _, fi, track in pairs:
+            if fi in matches or track.id in used:
+                continue
+            matches[fi] = track
+            used.add(track.id)
+        return matches
+
+    def update(self, faces, now, recognize):
+        """
+        faces: detector boxes (x, y, w, h[, score]) of one frame seen at `now`.
+        recognize(box) -> (known, confidence) is only called for tracks due a refresh.
+        Returns (x, y, w, h, known, confidence) per face, labels by track vote.
+        """
+        self.stats["frames"] += 1
+        self.stats["faces"] += len(faces)
+        matches = self._match(faces)
+        matched_ids = set()
+
+        detections = []
+        for fi, face in enumerate(faces):
+            box = tuple(face[:4])
+            track = matches.get(fi)
+            if track is None:
+                track = Track(next(self._ids), box)
+                self.tracks.append(track)
+                self.stats["tracks"] += 1
+            else:
+                track.box = box
+                track.misses = 0
+                track.frames += 1
+            matched_ids.add(track.id)
+
+            if track.needs_recognition(now):
+                known, confidence = recognize(box)
+                track.add_vote(known, confidence, now)
+                self.stats["predicts"] += 1
+            detections.append(track.detection())
+
+        for track in self.tracks:
+            if track.id not in matched_ids:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= MAX_MISSES]
+        return detections
+
+    def get_stats(self):
+        stats = dict(self.stats, active_tracks=len(self.tracks))
+        if self.stats["faces"]:
+            stats["predicts_per_face"] = round(self.stats["predicts"] / self.stats["faces"], 3)
+        return stats
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Download the detector files face_detectors.py looks for and check that
+OpenCV can load them:
+
+    lbp  cascades/lbpcascade_frontalface_improved.xml   (OpenCV data/lbpcascades)
+    dnn  models/deploy.prototxt                         (OpenCV samples/dnn/face_detector)
+         models/res10_300x300_ssd_iter_140000_fp16.caffemodel  (opencv_3rdparty, ~5 MB)
+
+Run once on a machine with network access (the Pi, or a laptop followed
+by copying cascades/ and models/ over). Existing files are kept unless
+--force is given.
+
+    python3 fetch_models.py
+    python3 fetch_models.py --backends lbp
+    python3 fetch_models.py --force
+"""
+import argparse
+import os
+
+import cv2
+import numpy as np
+import requests
+
+from face_detectors import CASCADE_DIR, MODEL_DIR, DETECTORS
+
+OPENCV_RAW = "https://raw.githubusercontent.com/opencv/opencv/4.x"
+WEIGHTS_RAW = "https://raw.githubusercontent.com/opencv/opencv_3rdparty"
+
+# backend -> [(url, destination)]
+FILES = {
+    "lbp": [
+        (f"{OPENCV_RAW}/data/lbpcascades/lbpcascade_frontalface_improved.xml",
+         os.path.join(CASCADE_DIR, "lbpcascade_frontalface_improved.xml")),
+    ],
+    "dnn": [
+        (f"{OPENCV_RAW}/samples/dnn/face_detector/deploy.prototxt",
+         os.path.join(MODEL_DIR, "deploy.prototxt")),
+        (f"{WEIGHTS_RAW}/dnn_samples_face_detector_20180205_fp16/res10_300x300_ssd_iter_140000_fp16.caffemodel",
+         os.path.join(MODEL_DIR, "res10_300x300_ssd_iter_140000_fp16.caffemodel")),
+    ],
+}
+
+
+def download(url, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with requests.get(url, stream=True, timeout=(10, 60)) as response:
+        response.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(64 * 1024):
+                f.write(chunk)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def verify(backend):
+    """Load the backend and run it on a blank frame; raises if OpenCV cannot use the files."""
+    detector = DETECTORS[backend]()
+    detector.detect(np.zeros((360, 640, 3), np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the LBP cascade and the SSD face model")
+    parser.add_argument("--backends", nargs="+", choices=sorted(FILES), default=sorted(FILES))
+    parser.add_argument("--force", action="store_true", help="download even if the file exists")
+    args = parser.parse_args()
+
+    failed = False
+    for backend in args.backends:
+        for url, path in FILES[backend]:
+            if os.path.exists(path) and not args.force:
+                print(f"[INFO] {os.path.relpath(path)} already present")
+                continue
+            print(f"[INFO] {url}")
+            try:
+                size = download(url, path)
+            except requests.RequestException as e:
+                print(f"[ERROR] Download failed: {e}")
+                failed = True
+                continue
+            print(f"[INFO] -> {os.path.relpath(path)} ({size / 1024:.0f} KB)")
+        try:
+            verify(backend)
+            print(f"[INFO] {backend}: loads and runs")
+        except (FileNotFoundError, ValueError, cv2.error) as e:
+            print(f"[ERROR] {backend}: {e}")
+            failed = True
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# follow_controller.py
+"""
+Autonomous target following, run inside server.py.
+
+A control loop ticks at a fixed RATE. Each tick reads the newest
+analysis frame's detections from the frame bus, which costs microseconds
+and involves no HTTP. It picks the largest TARGET (known) face and
+decides one gait cycle:
+
+    off-centre horizontally    -> turn_left / turn_right
+    off-centre vertically      -> look_up / look_down
+    face small (far away)      -> forward
+    face very large (too near) -> backward
+
+Commands go to an actuator thread through a one-slot mailbox. A gait
+cycle takes longer than a tick, so a decision made while the legs are
+busy replaces the one still waiting, and the legs always get the newest
+decision. A decision based on a frame captured before the previous gait
+cycle finished describes where the target was, not where it is, so it
+is dropped. Commands are rate-limited by MIN_COMMAND_INTERVAL.
+
+Safety: forward is only allowed while the latest ultrasonic reading is
+fresh and farther than FORWARD_CLEARANCE. Below STOP_DISTANCE only
+backward is allowed. Frames older than STALE_FRAME produce no command.
+
+Every command records capture -> decision -> command-start latencies,
+reported by stats(). sim_hardware.py runs the loop against a simulated
+camera and crawler.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from mission_logic import DEAD_DISTANCE
+
+RATE = 10.0                  # control loop ticks per second
+MIN_COMMAND_INTERVAL = 0.3   # seconds between commands handed to the legs
+STALE_FRAME = 0.5            # seconds; older detections are not acted on
+LOST_AFTER = 2.0             # seconds without a target before the state says "searching"
+TURN_DEADBAND = 0.2          # |x error| (fraction of half width) tolerated before turning
+LOOK_DEADBAND = 0.35         # |y error| tolerated before looking up/down
+TARGET_SIZE = (0.18, 0.40)   # face height / frame height band that needs no advance/retreat
+FORWARD_CLEARANCE = 70.0     # cm; the "warning" category and closer blocks forward
+STOP_DISTANCE = DEAD_DISTANCE
+DISTANCE_MAX_AGE = 1.0       # seconds; older ultrasonic readings count as unknown
+
+
+def pick_target(detections):
+    """Largest known face (x, y, w, h, known, confidence), or None."""
+    known = [det for det in detections if det[4]]
+    if not known:
+        return None
+    return max(known, key=lambda det: det[2] * det[3])
+
+
+def decide(box, width, height):
+    """The gait cycle that brings `box` (frame coordinates) to the centre at follow size, or None."""
+    x, y, w, h = box[:4]
+    ex = (x + w / 2 - width / 2) / (width / 2)
+    ey = (y + h / 2 - height / 2) / (height / 2)
+    if ex > TURN_DEADBAND:
+        return "turn_right"
+    if ex < -TURN_DEADBAND:
+        return "turn_left"
+    if ey < -LOOK_DEADBAND:
+        return "look_up"
+    if ey > LOOK_DEADBAND:
+        return "look_down"
+    size = h / height
+    if size < TARGET_SIZE[0]:
+        return "forward"
+    if size > TARGET_SIZE[1]:
+        return "backward"
+    return None
+
+
+def gate(action, distance, distance_age):
+    """Apply the ultrasonic limits. Returns (action or None, reason it was blocked)."""
+    if action is None or action == "backward":
+        return action, None
+    known = distance is not None and distance_age is not None and distance_age <= DISTANCE_MAX_AGE
+    if known and distance <= STOP_DISTANCE:
+        return None, "obstacle"
+    if action == "forward" and (not known or distance <= FORWARD_CLEARANCE):
+        return None, "clearance" if known else "no_distance"
+    return action, None
+
+
+class FollowController:
+    def __init__(self, read_frame, execute, get_distance, rate=RATE):
+        """
+        read_frame():   newest frame_bus.Frame of the analysis bus, or None
+        execute(action, speed): one gait cycle (server.execute_action)
+        get_distance(): (distance cm or None, time.time() of the reading)
+        """
+        self.read_frame = read_frame
+        self.execute = execute
+        self.get_distance = get_distance
+        self.period = 1.0 / rate
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._mailbox = None          # (action, speed, frame timestamp, decided at)
+        self._running = False
+        self._generation = 0          # loops of an earlier start() exit once this moves on
+        self.speed = 80
+        self.state = "off"
+        self._last_target = 0.0
+
+        self._latencies = {"decision": deque(maxlen=500), "command": deque(maxlen=500)}
+        self._stats = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {"ticks": 0, "late_ticks": 0, "stale_frames": 0, "decisions": 0,
+                       "replaced": 0, "outdated": 0, "commands": 0, "blocked": {}, "actions": {}}
+        for values in self._latencies.values():
+            values.clear()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    @property
+    def active(self):
+        return self._running
+
+    def start(self, speed=None):
+        with self._lock:
+            if speed is not None:
+                self.speed = int(speed)
+            if self._running:
+                return False
+            self._running = True
+            self._generation += 1
+            self._mailbox = None
+            self._reset_stats()
+            self.state = "searching"
+            self._last_target = time.monotonic()
+            generation = self._generation
+        threading.Thread(target=self._control_loop, args=(generation,),
+                         daemon=True, name="follow-control").start()
+        threading.Thread(target=self._actuator_loop, args=(generation,),
+                         daemon=True, name="follow-actuator").start()
+        return True
+
+    def stop(self):
+        """Stop after the gait cycle in progress. Returns True if following was active."""
+        with self._lock:
+            was_running = self._running
+            self._running = False
+            self._mailbox = None
+            self.state = "off"
+            self._wake.notify_all()
+        return was_running
+
+    # ------------------------------------------------------------------
+    # Loops
+    # ------------------------------------------------------------------
+    def _current(self, generation):
+        return self._running and self._generation == generation
+
+    def _control_loop(self, generation):
+        next_tick = time.monotonic()
+        while self._current(generation):
+            self.tick()
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Overran a whole period: skip ahead instead of bursting to catch up
+                self._stats["late_ticks"] += 1
+                next_tick = time.monotonic()
+
+    def tick(self):
+        """One control step: read detections, decide, gate, post to the actuator."""
+        self._stats["ticks"] += 1
+        frame = self.read_frame()
+        now = time.time()
+        if frame is None or now - frame.timestamp > STALE_FRAME:
+            self._stats["stale_frames"] += 1
+            return None
+
+        target = pick_target(frame.detections)
+        if target is None:
+            if time.monotonic() - self._last_target > LOST_AFTER:
+                self.state = "searching"
+            return None
+        self._last_target = time.monotonic()
+
+        height, width = frame.image.shape[:2]
+        action = decide(target, width, height)
+        distance, distance_time = self.get_distance()
+        age = None if distance is None else now - distance_time
+        action, blocked = gate(action, distance, age)
+        if blocked is not None:
+            self._stats["blocked"][blocked] = self._stats["blocked"].get(blocked, 0) + 1
+            self.state = "blocked"
+            return None
+        if action is None:
+            self.state = "locked"   # centred at follow distance
+            return None
+
+        self.state = "following"
+        self._stats["decisions"] += 1
+        with self._lock:
+            if self._mailbox is not None:
+                self._stats["replaced"] += 1
+            self._mailbox = (action, self.speed, frame.timestamp, time.time())
+            self._wake.notify()
+        return action
+
+    def _actuator_loop(self, generation):
+        last_command = 0.0
+        settled = 0.0   # time.time() the last gait cycle finished
+        while True:
+            with self._lock:
+                while self._current(generation) and self._mailbox is None:
+                    self._wake.wait(timeout=0.5)
+                if not self._current(generation):
+                    return
+                wait = MIN_COMMAND_INTERVAL - (time.monotonic() - last_command)
+                if wait > 0:
+                    # Rate limit; a newer decision may replace this one meanwhile
+                    self._wake.wait(timeout=wait)
+                    continue
+                action, speed, captured, decided = self._mailbox
+                self._mailbox = None
+                if captured < settled:
+                    self._stats["outdated"] += 1
+                    continue
+
+            started = time.time()
+            last_command = time.monotonic()
+            self._latencies["decision"].append((decided - captured) * 1000.0)
+            self._latencies["command"].append((started - captured) * 1000.0)
+            self._stats["commands"] += 1
+            self._stats["actions"][action] = self._stats["actions"].get(action, 0) + 1
+            try:
+                self.execute(action, speed)
+            except Exception as e:
+                print("Follow command error:", e)
+            settled = time.time()
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+    def stats(self):
+        stats = dict(self._stats, state=self.state, active=self._running, speed=self.speed,
+                     rate=round(1.0 / self.period, 1))
+        stats["blocked"] = dict(stats["blocked"])
+        stats["actions"] = dict(stats["actions"])
+        for name, values in self._latencies.items():
+            if values:
+                ms = np.array(values)
+                stats[f"capture_to_{name}_ms"] = {
+                    "p50": round(float(np.percentile(ms, 50)), 1),
+                    "p95": round(float(np.percentile(ms, 95)), 1),
+                    "max": round(float(ms.max()), 1),
+                }
+        return stats
@@ -0,0 +1,306 @@
+# frame_bus.py
+"""
+Shared-memory ring of the latest camera frames.
+
+video_stream.py owns the camera and publishes every processed frame here,
+together with its frame id, capture timestamp and face detections.
+server.py (or any other local process) attaches to the same segment and
+reads frames straight out of shared memory - no sockets, no pickling.
+
+Layout of the segment:
+    [header][slot metadata x N][frame pixels x N]
+
+Each slot is guarded by a sequence counter (odd while the writer is
+copying into it), so readers can detect a torn read and simply retry.
+
+Closing a handle never unmaps memory that a view still points into.
+Every array of a handle is a view of one root array, and the
+SharedMemory is closed by a weakref.finalize on that root. The mapping
+therefore goes away only once the last array over it has been garbage
+collected, including frames read with copy=False in other threads.
+Every method of a closed handle raises FrameBusClosed.
+"""
+import time
+import weakref
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+FRAME_BUS_NAME = "spyrobot_frames"
+DEFAULT_SLOTS = 4
+MAX_DETECTIONS = 8
+
+# Per-detection columns stored in the slot metadata
+DET_FIELDS = ("x", "y", "w", "h", "known", "confidence")
+
+_MAGIC = 0x53505946  # "SPYF"
+_VERSION = 1
+
+HEADER_DTYPE = np.dtype([
+    ("magic", np.uint32),
+    ("version", np.uint32),
+    ("slots", np.uint32),
+    ("height", np.uint32),
+    ("width", np.uint32),
+    ("channels", np.uint32),
+    ("max_dets", np.uint32),
+    ("closed", np.uint32),
+    ("latest_id", np.int64),    # frame id of the newest complete frame, -1 if none
+])
+
+def _slot_dtype(max_dets):
+    return np.dtype([
+        ("seq", np.uint64),         # odd while the slot is being written
+        ("frame_id", np.int64),
+        ("timestamp", np.float64),  # time.time() at capture
+        ("n_dets", np.uint32),
+        ("_pad", np.uint32),
+        ("dets", np.float32, (max_dets, len(DET_FIELDS))),
+    ])
+
+Frame = namedtuple("Frame", ["frame_id", "timestamp", "image", "detections"])
+
+
+class FrameBusClosed(Exception):
+    """Raised by readers when the publisher has closed (or re-created) the bus."""
+
+
+def _untrack(shm):
+    # Readers must not unlink the segment when they exit. Python < 3.13
+    # registers every attached segment with the resource tracker, which
+    # would do exactly that, so undo the registration.
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class FrameBus:
+    """
+    Publisher/reader handle to the shared frame ring.
+
+    Use FrameBus.create(...) in the process that owns the camera and
+    FrameBus.attach() everywhere else.
+    """
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self._owner = owner
+        self._name = shm.name
+        # All arrays below (and every frame view read from them) keep `buf`
+        # alive; shm is closed only when the last of them is gone
+        buf = np.ndarray((shm.size,), dtype=np.uint8, buffer=shm.buf)
+        weakref.finalize(buf, shm.close)
+
+        self._header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=buf)
+        hdr = self._header[0]
+        if hdr["magic"] != _MAGIC or hdr["version"] != _VERSION:
+            raise ValueError("Shared memory segment is not a frame bus")
+
+        self.slots = int(hdr["slots"])
+        self.shape = (int(hdr["height"]), int(hdr["width"]), int(hdr["channels"]))
+        self.max_dets = int(hdr["max_dets"])
+
+        slot_dtype = _slot_dtype(self.max_dets)
+        offset = HEADER_DTYPE.itemsize
+        self._meta = np.ndarray((self.slots,), dtype=slot_dtype, buffer=buf, offset=offset)
+        offset += slot_dtype.itemsize * self.slots
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8,
+                                  buffer=buf, offset=offset)
+        self._next_id = int(hdr["latest_id"]) + 1
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @staticmethod
+    def segment_size(shape, slots=DEFAULT_SLOTS, max_dets=MAX_DETECTIONS):
+        frame_bytes = int(np.prod(shape))
+        return (HEADER_DTYPE.itemsize
+                + _slot_dtype(max_dets).itemsize * slots
+                + frame_bytes * slots)
+
+    @classmethod
+    def create(cls, shape, name=FRAME_BUS_NAME, slots=DEFAULT_SLOTS, max_dets=MAX_DETECTIONS):
+        """Create (or replace) the segment. Called by the frame producer."""
+        if len(shape) == 2:
+            shape = (shape[0], shape[1], 1)
+        size = cls.segment_size(shape, slots, max_dets)
+
+        # A stale segment from a crashed run would keep the old geometry
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf)
+        header[0] = (_MAGIC, _VERSION, slots, shape[0], shape[1], shape[2],
+                     max_dets, 0, -1)
+        meta = np.ndarray((slots,), dtype=_slot_dtype(max_dets), buffer=shm.buf,
+                          offset=HEADER_DTYPE.itemsize)
+        meta["seq"] = 0
+        meta["frame_id"] = -1
+        meta["n_dets"] = 0
+        del header, meta
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=FRAME_BUS_NAME):
+        """Attach to an existing segment. Raises FileNotFoundError if none yet."""
+        shm = shared_memory.SharedMemory(name=name)
+        _untrack(shm)
+        return cls(shm, owner=False)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def closed(self):
+        """True once this handle is closed or the publisher closed the bus."""
+        header = self._header
+        return header is None or bool(header["closed"][0])
+
+    def _arrays(self):
+        """(header, meta, frames) of an open bus. Local references stay valid
+        even if another thread closes the handle meanwhile."""
+        header, meta, frames = self._header, self._meta, self._frames
+        if header is None or meta is None or frames is None or header["closed"][0]:
+            raise FrameBusClosed(self._name)
+        return header, meta, frames
+
+    def close(self):
+        """
+        Detach. The owner also marks the bus closed and unlinks it. Safe while
+        other threads still hold frames read with copy=False (see module doc).
+        """
+        if self._shm is None:
+            return
+        if self._owner:
+            self._header["closed"] = 1
+        self._header = self._meta = self._frames = None
+        shm, self._shm = self._shm, None
+        if self._owner:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+    def publish(self, image, detections=(), timestamp=None, frame_id=None):
+        """
+        Copy `image` into the next slot and make it the latest frame.
+        `detections` is a sequence of (x, y, w, h, known, confidence).
+        Returns the frame id that was assigned.
+        """
+        header, all_meta, frames = self._arrays()
+        if frame_id is None:
+            frame_id = self._next_id
+        self._next_id = frame_id + 1
+        if timestamp is None:
+            timestamp = time.time()
+
+        index = frame_id % self.slots
+        meta = all_meta[index:index + 1]
+        seq = int(meta["seq"][0])
+        meta["seq"] = seq + 1  # odd: write in progress
+
+        target = frames[index]
+        if image.ndim == 2:
+            target[..., 0] = image
+        else:
+            np.copyto(target, image)
+
+        n = min(len(detections), self.max_dets)
+        meta["frame_id"] = frame_id
+        meta["timestamp"] = timestamp
+        meta["n_dets"] = n
+        if n:
+            meta["dets"][0, :n] = np.asarray(detections[:n], dtype=np.float32)
+
+        meta["seq"] = seq + 2  # even: slot is consistent again
+        header["latest_id"] = frame_id
+        return frame_id
+
+    # ------------------------------------------------------------------
+    # Reader side
+    # ------------------------------------------------------------------
+    def latest_id(self):
+        header, _, _ = self._arrays()
+        return int(header["latest_id"][0])
+
+    def read(self, frame_id=None, copy=True, retries=5):
+        """
+        Return the Frame with `frame_id` (default: the newest one), or None
+        if it is not available (nothing published yet or already overwritten).
+
+        With copy=False the image is a view into shared memory: zero-copy, but
+        only valid until the writer wraps around to this slot again. Use
+        is_current(frame) to check it was not overwritten while you used it.
+        """
+        for _ in range(retries):
+            header, all_meta, frames = self._arrays()
+            wanted = int(header["latest_id"][0]) if frame_id is None else frame_id
+            if wanted < 0:
+                return None
+
+            index = wanted % self.slots
+            meta = all_meta[index]
+            seq = int(meta["seq"])
+            if seq & 1:
+                continue
+            if int(meta["frame_id"]) != wanted:
+                if frame_id is not None:
+                    return None
+                continue
+
+            image = frames[index]
+            if copy:
+                image = image.copy()
+            n = int(meta["n_dets"])
+            detections = meta["dets"][:n].copy()
+            timestamp = float(meta["timestamp"])
+
+            if int(all_meta[index]["seq"]) == seq:
+                if self.shape[2] == 1:
+                    image = image[..., 0]
+                return Frame(wanted, timestamp, image, detections)
+        return None
+
+    def is_current(self, frame):
+        """True if the slot holding `frame` has not been overwritten since."""
+        _, all_meta, _ = self._arrays()
+        meta = all_meta[frame.frame_id % self.slots]
+        return int(meta["frame_id"]) == frame.frame_id and not int(meta["seq"]) & 1
+
+    def wait_for_frame(self, after_id, timeout=1.0, poll=0.002):
+        """
+        Block until a frame newer than `after_id` is published. Returns the
+        newest frame id, or None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            latest = self.latest_id()
+            if latest > after_id:
+                return latest
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+
+
+def attach_when_ready(name=FRAME_BUS_NAME, timeout=None, poll=0.5):
+    """Wait for the publisher to create the bus, then attach to it."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            return FrameBus.attach(name)
+        except (FileNotFoundError, ValueError):
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
@@ -0,0 +1,87 @@
+# frame_pacing.py
+"""
+Timestamp-driven frame pacing for the recorder.
+
+cv2.VideoWriter can only write a constant frame rate, while the camera
+delivers frames whenever it can. FramePacer maps each captured frame's
+timestamp onto the output timeline: a frame is written as many times as
+needed to reach its slot (duplicates when capture is slow) or not at all
+if its slot is already filled (skips when capture is faster than the
+file rate). Either way the video's duration tracks wall time, and every
+duplicate, skip and lost frame is counted.
+
+The recorder publishes these counters to RECORD_STATS_PATH so server.py
+can report whether the Pi is keeping up.
+"""
+import json
+import os
+import time
+
+RECORD_STATS_PATH = "/tmp/spyrobot_record_stats.json"
+
+
+class FramePacer:
+    def __init__(self, fps):
+        self.fps = float(fps)
+        self.t0 = None
+        self.last_ts = None
+        self.frames_in = 0       # camera frames consumed
+        self.written = 0         # frames written to the file (incl. duplicates)
+        self.duplicates = 0      # extra copies written to cover capture stalls
+        self.skipped = 0         # frames not written because capture ran ahead
+        self.lost = 0            # frames overwritten on the bus before we read them
+        self.max_gap = 0.0       # longest interval between captured frames (s)
+
+    def offer(self, timestamp):
+        """How many times to write the frame captured at `timestamp` (0 = skip it)."""
+        self.frames_in += 1
+        if self.t0 is None:
+            self.t0 = timestamp
+        if self.last_ts is not None:
+            self.max_gap = max(self.max_gap, timestamp - self.last_ts)
+        self.last_ts = timestamp
+
+        # Output frame slot this capture belongs in
+        slot = int(round((timestamp - self.t0) * self.fps))
+        if slot < self.written:
+            self.skipped += 1
+            return 0
+        repeats = slot - self.written + 1
+        self.duplicates += repeats - 1
+        self.written += repeats
+        return repeats
+
+    def note_lost(self, count=1):
+        self.lost += count
+
+    def stats(self):
+        wall = (self.last_ts - self.t0) if self.t0 is not None else 0.0
+        video = self.written / self.fps
+        return {
+            "fps": self.fps,
+            "frames_in": self.frames_in,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "skipped": self.skipped,
+            "lost": self.lost,
+            "capture_fps": round((self.frames_in - 1) / wall, 2) if wall > 0 else None,
+            "max_gap_ms": round(self.max_gap * 1000.0, 1),
+            "wall_seconds": round(wall, 2),
+            "video_seconds": round(video, 2),
+        }
+
+
+def write_stats(stats, path=RECORD_STATS_PATH):
+    stats = dict(stats, updated=time.time())
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, path)
+
+
+def read_stats(path=RECORD_STATS_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
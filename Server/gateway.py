@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Gateway in front of several robots running server.py.
+
+    python3 gateway.py --robot alpha=http://192.168.1.20:5000 --robot bravo=http://192.168.1.21:5000
+    python3 gateway.py --config robots.json     # {"alpha": "http://192.168.1.20:5000", ...}
+
+Browsers talk to the gateway instead of to every robot:
+
+    GET  /robots                          registry, health and latest telemetry
+    GET  /telemetry/stream[?robots=a,b]   server-sent events, one message per robot update
+    GET  /robots/<id>/logs | /events      served from a short-lived per-robot cache
+    *    /robots/<id>/<path>              forwarded to that robot (commands, photos, streams)
+    GET  /gateway/stats                   upstream latency, cache and fan-out counters
+
+Each robot has one keep-alive connection pool (requests.Session) and
+exactly one telemetry poller, however many clients are connected. The
+UI points at /robots/<id> as its API_URL (VITE_GATEWAY_URL + VITE_ROBOT_ID).
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask_cors import CORS
+
+TELEMETRY_INTERVAL = 0.5     # seconds between /telemetry polls per robot
+TELEMETRY_MAX_BACKOFF = 5.0  # poll interval while a robot is unreachable
+CACHE_TTL = 2.0              # seconds /logs and /events responses are reused
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 30.0
+POOL_SIZE = 8                # keep-alive connections per robot
+SUBSCRIBER_QUEUE = 100       # telemetry messages buffered per SSE client
+KEEPALIVE_INTERVAL = 15.0
+CACHED_PATHS = ("logs", "events")
+
+# Headers that describe a single hop and must not be forwarded
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "content-encoding",
+    "content-length", "host",
+}
+
+
+class Robot:
+    def __init__(self, robot_id, base_url, pool_size=POOL_SIZE):
+        self.id = robot_id
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self.telemetry = None
+        self.online = False
+        self.last_seen = None
+        self.last_error = None
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=500)   # upstream ms, most recent requests
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.requests += 1
+                self.errors += 1
+            raise
+        # With stream=True this is time to headers, not to the last byte
+        elapsed = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self.requests += 1
+            self.errors += response.status_code >= 500
+            self.latencies.append(elapsed)
+        return response
+
+    def update(self, telemetry=None, error=None):
+        with self._lock:
+            if error is None:
+                self.telemetry = telemetry
+                self.online = True
+                self.last_seen = time.time()
+                self.last_error = None
+            else:
+                self.online = False
+                self.last_error = error
+
+    def info(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "url": self.base_url,
+                "online": self.online,
+                "last_seen": self.last_seen,
+                "last_error": self.last_error,
+                "telemetry": self.telemetry,
+            }
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests_, errors = self.requests, self.errors
+        result = {"requests": requests_, "errors": errors, "mean_ms": None, "p95_ms": None}
+        if latencies:
+            result["mean_ms"] = round(sum(latencies) / len(latencies), 1)
+            result["p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1)
+        return result
+
+
+class ResponseCache:
+    """
+    Per-(robot, path) cache of upstream GET responses. Concurrent misses for
+    the same key wait for a single upstream request; a stale entry is served
+    if the robot cannot be reached.
+    """
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}    # key -> (fetched monotonic, status, body, content type)
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry
+        return None
+
+    def get(self, key, fetch):
+        """Returns (entry, state) with state "hit", "miss" or "stale"."""
+        entry = self._fresh(key)
+        if entry is not None:
+            self.hits += 1
+            return entry, "hit"
+        with self._key_lock(key):
+            entry = self._fresh(key)
+            if entry is not None:
+                self.hits += 1
+                return entry, "hit"
+            try:
+                status, body, content_type = fetch()
+            except requests.RequestException:
+                entry = self._entries.get(key)
+                if entry is None:
+                    raise
+                self.stale += 1
+                return entry, "stale"
+            entry = (time.monotonic(), status, body, content_type)
+            if status < 400:
+                self._entries[key] = entry
+            self.misses += 1
+            return entry, "miss"
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "stale": self.stale,
+                "entries": len(self._entries), "ttl": self.ttl}
+
+
+class TelemetryHub:
+    """One poller thread per robot; every update is fanned out to all subscribers."""
+
+    def __init__(self, robots, interval=TELEMETRY_INTERVAL):
+        self.robots = robots
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = {}   # queue -> set of robot ids (None = all)
+        self.published = 0
+        self.dropped = 0
+        self._running = False
+
+    def start(self):
+        self._running = True
+        for robot in self.robots.values():
+            threading.Thread(target=self._poll, args=(robot,), daemon=True,
+                             name=f"telemetry-{robot.id}").start()
+
+    def stop(self):
+        self._running = False
+
+    def _poll(self, robot):
+        delay = self.interval
+        was_online = None
+        while self._running:
+            start = time.monotonic()
+            try:
+                response = robot.request("GET", "/telemetry", timeout=(CONNECT_TIMEOUT, 5.0))
+                response.raise_for_status()
+                robot.update(response.json())
+                delay = self.interval
+            except (requests.RequestException, ValueError) as e:
+                robot.update(error=str(e))
+                delay = min(TELEMETRY_MAX_BACKOFF, delay * 2)
+            # An offline robot is announced once, not on every failed poll
+            if robot.online or was_online is not False:
+                self.publish(robot.id, dict(robot.info(), latency_ms=round((time.monotonic() - start) * 1000.0, 1)))
+            was_online = robot.online
+            time.sleep(max(0.0, delay - (time.monotonic() - start)))
+
+    def subscribe(self, robot_ids=None):
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE)
+        with self._lock:
+            self._subscribers[q] = set(robot_ids) if robot_ids else None
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(q, None)
+
+    def publish(self, robot_id, message):
+        data = json.dumps(message, separators=(",", ":"))
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        self.published += 1
+        for q, wanted in subscribers:
+            if wanted is not None and robot_id not in wanted:
+                continue
+            try:
+                q.put_nowait(data)
+            except queue.Full:
+                # Slow client: drop its oldest update rather than block the poller
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                self.dropped += 1
+                try:
+                    q.put_nowait(data)
+                except queue.Full:
+                    pass
+
+    def stream(self, robot_ids=None):
+        q = self.subscribe(robot_ids)
+        try:
+            # Start every client with the current state of its robots
+            for robot in self.robots.values():
+                if not robot_ids or robot.id in robot_ids:
+                    yield f"data: {json.dumps(robot.info(), separators=(',', ':'))}\n\n"
+            while True:
+                try:
+                    data = q.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {data}\n\n"
+        finally:
+            self.unsubscribe(q)
+
+    def stats(self):
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {"subscribers": subscribers, "published": self.published, "dropped": self.dropped,
+                "interval": self.interval}
+
+
+def create_app(robot_urls, telemetry_interval=TELEMETRY_INTERVAL, cache_ttl=CACHE_TTL):
+    """robot_urls: {robot id: base URL of its server.py}"""
+    robots = {robot_id: Robot(robot_id, url) for robot_id, url in robot_urls.items()}
+    hub = TelemetryHub(robots, telemetry_interval)
+    cache = ResponseCache(cache_ttl)
+
+    app = Flask(__name__)
+    CORS(app)
+    app.config["robots"] = robots
+    app.config["telemetry_hub"] = hub
+    app.config["response_cache"] = cache
+
+    def get_robot(robot_id):
+        robot = robots.get(robot_id)
+        if robot is None:
+            return None, (jsonify({"error": f"Unknown robot '{robot_id}'"}), 404)
+        return robot, None
+
+    @app.route("/robots", methods=["GET"])
+    def list_robots():
+        return jsonify({"robots": [robot.info() for robot in robots.values()]})
+
+    @app.route("/telemetry/stream", methods=["GET"])
+    def telemetry_stream():
+        wanted = [r for r in request.args.get("robots", "").split(",") if r]
+        unknown = [r for r in wanted if r not in robots]
+        if unknown:
+            return jsonify({"error": f"Unknown robots: {unknown}"}), 404
+        return Response(
+            stream_with_context(hub.stream(wanted or None)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.route("/robots/<robot_id>/<any(logs, events):name>", methods=["GET"])
+    def cached_get(robot_id, name):
+        robot, error = get_robot(robot_id)
+        if error:
+            return error
+
+        def fetch():
+            response = robot.request("GET", "/" + name, timeout=(CONNECT_TIMEOUT, 10.0))
+            return response.status_code, response.content, response.headers.get("Content-Type")
+
+        try:
+            (_, status, body, content_type), state = cache.get((robot_id, name), fetch)
+        except requests.RequestException as e:
+            return jsonify({"error": f"Robot '{robot_id}' unreachable", "details": str(e)}), 502
+        return Response(body, status=status, content_type=content_type,
+                        headers={"X-Gateway-Cache": state})
+
+    @app.route("/robots/<robot_id>/", defaults={"path": ""},
+               methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+    @app.route("/robots/<robot_id>/<path:path>", methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+    def proxy(robot_id, path):
+        """Forward the request to the robot, streaming the response (works for /stream.mjpg)."""
+        robot, error = get_robot(robot_id)
+        if error:
+            return error
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP}
+        try:
+            upstream = robot.request(
+                request.method, "/" + path,
+                params=request.args.to_dict(flat=False),
+                data=request.get_data(),
+                headers=headers,
+                stream=True,
+                allow_redirects=False,
+            )
+        except requests.RequestException as e:
+            return jsonify({"error": f"Robot '{robot_id}' unreachable", "details": str(e)}), 502
+
+        if request.method != "GET" and path in CACHED_PATHS:
+            cache.invalidate((robot_id, path))
+
+        def body():
+            try:
+                for chunk in upstream.iter_content(chunk_size=64 * 1024):
+                    yield chunk
+            finally:
+                upstream.close()   # returns the connection to the pool
+
+        response_headers = [(k, v) for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP]
+        return Response(stream_with_context(body()), status=upstream.status_code, headers=response_headers)
+
+    @app.route("/gateway/stats", methods=["GET"])
+    def gateway_stats():
+        return jsonify({
+            "robots": {robot.id: robot.stats() for robot in robots.values()},
+            "cache": cache.stats(),
+            "telemetry": hub.stats(),
+        })
+
+    return app
+
+
+def load_robot_urls(config=None, robot_args=()):
+    urls = {}
+    if config:
+        with open(config, "r") as f:
+            urls.update(json.load(f))
+    for arg in robot_args:
+        robot_id, sep, url = arg.partition("=")
+        if not sep or not robot_id or not url:
+            raise ValueError(f"--robot must look like id=http://host:5000, got '{arg}'")
+        urls[robot_id] = url
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-robot gateway")
+    parser.add_argument("--robot", action="append", default=[], metavar="ID=URL",
+                        help="robot id and server.py base URL (repeatable)")
+    parser.add_argument("--config", help="JSON file mapping robot ids to base URLs")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--interval", type=float, default=TELEMETRY_INTERVAL,
+                        help="telemetry poll interval per robot (s)")
+    parser.add_argument("--cache-ttl", type=float, default=CACHE_TTL)
+    args = parser.parse_args()
+
+    robot_urls = load_robot_urls(args.config, args.robot)
+    if not robot_urls:
+        parser.error("no robots configured (use --robot or --config)")
+
+    app = create_app(robot_urls, args.interval, args.cache_ttl)
+    app.config["telemetry_hub"].start()
+    print(f"Gateway for {len(robot_urls)} robots on port {args.port}: {', '.join(robot_urls)}")
+    app.run(host="0.0.0.0", port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+How gateway.py latency scales with the number of robots.
+
+Starts simulated robots (sim_robot.py) and a gateway in this process. For
+each robot count, it measures:
+  - command round trips (POST /robots/<id>/movement) through the gateway;
+  - /logs through the gateway's cache against fetching it from the robot directly;
+  - telemetry delivery delay to SSE clients, and the /telemetry requests each
+    robot actually received, which stay at one poller's rate however many clients listen.
+
+    python3 gateway_bench.py
+    python3 gateway_bench.py --robots 1 4 16 --clients 8 --delay 0.02
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+from gateway import create_app
+from sim_robot import start_sim_robots
+
+
+def timed(session, method, url, **kwargs):
+    start = time.perf_counter()
+    response = session.request(method, url, timeout=10, **kwargs)
+    response.raise_for_status()
+    _ = response.content
+    return (time.perf_counter() - start) * 1000.0
+
+
+def run_clients(clients, requests_per_client, job):
+    """Run job(session, i) from `clients` threads; returns all latencies (ms)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        local = [job(session, i) for i in range(requests_per_client)]
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.array(latencies)
+
+
+def listen_telemetry(url, duration, delays):
+    """Collect (receive time - robot telemetry time) for every SSE message."""
+    deadline = time.time() + duration
+    with requests.get(url, stream=True, timeout=(3, duration + 5)) as response:
+        for line in response.iter_lines():
+            if time.time() > deadline:
+                break
+            if not line.startswith(b"data: "):
+                continue
+            message = json.loads(line[6:])
+            telemetry = message.get("telemetry")
+            if telemetry and "latency_ms" in message:
+                delays.append((time.time() - telemetry["time"]) * 1000.0)
+
+
+def telemetry_polls(sim):
+    return requests.get(sim.url + "/sim/stats").json()["paths"].get("/telemetry", 0)
+
+
+def bench(n_robots, clients, per_client, listeners, duration, delay, interval):
+    sims = start_sim_robots(n_robots, delay=delay)
+    app = create_app({r.id: r.url for r in sims.values()}, telemetry_interval=interval)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    gateway = f"http://127.0.0.1:{server.server_port}"
+    ids = list(sims)
+
+    hub = app.config["telemetry_hub"]
+    hub.start()
+
+    # Telemetry: `listeners` SSE clients for `duration` seconds
+    delays = []
+    before = {r.id: telemetry_polls(r) for r in sims.values()}
+    threads = [threading.Thread(target=listen_telemetry, args=(gateway + "/telemetry/stream", duration, delays))
+               for _ in range(listeners)]
+    for t in threads:
+        t.start()
+
+    commands = run_clients(clients, per_client, lambda s, i: timed(
+        s, "POST", f"{gateway}/robots/{ids[i % n_robots]}/movement", json={"action": "stand"}))
+    cached_logs = run_clients(clients, per_client, lambda s, i: timed(
+        s, "GET", f"{gateway}/robots/{ids[i % n_robots]}/logs"))
+    direct_logs = run_clients(clients, per_client, lambda s, i: timed(
+        s, "GET", f"{sims[ids[i % n_robots]].url}/logs"))
+
+    for t in threads:
+        t.join()
+    after = {r.id: telemetry_polls(r) for r in sims.values()}
+    hub.stop()
+    server.shutdown()
+    for sim in sims.values():
+        sim.stop()
+
+    # Upstream telemetry polls per robot per second while the listeners were connected
+    upstream = np.mean([after[r] - before[r] for r in ids]) / duration
+    delays = np.array(delays) if delays else np.array([np.nan])
+    return {
+        "robots": n_robots,
+        "cmd_p50": np.percentile(commands, 50),
+        "cmd_p95": np.percentile(commands, 95),
+        "logs_gw_p50": np.percentile(cached_logs, 50),
+        "logs_direct_p50": np.percentile(direct_logs, 50),
+        "telemetry_p50": np.nanpercentile(delays, 50),
+        "telemetry_p95": np.nanpercentile(delays, 95),
+        "upstream_rps": upstream,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gateway.py against simulated robots")
+    parser.add_argument("--robots", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=4, help="concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client per test")
+    parser.add_argument("--listeners", type=int, default=10, help="SSE telemetry clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="telemetry window (s)")
+    parser.add_argument("--delay", type=float, default=0.01, help="simulated robot latency (s)")
+    parser.add_argument("--interval", type=float, default=0.5, help="telemetry poll interval (s)")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    print(f"[INFO] {args.clients} clients x {args.requests} requests, {args.listeners} telemetry "
+          f"listeners, robot delay {args.delay * 1000:.0f} ms, poll every {args.interval}s\n")
+    print(f"{'robots':>6} {'cmd p50':>8} {'cmd p95':>8} {'logs gw':>8} {'logs dir':>9} "
+          f"{'telem p50':>10} {'telem p95':>10} {'polls/s':>8}")
+    for n in args.robots:
+        r = bench(n, args.clients, args.requests, args.listeners, args.duration, args.delay, args.interval)
+        print(f"{r['robots']:>6} {r['cmd_p50']:8.1f} {r['cmd_p95']:8.1f} {r['logs_gw_p50']:8.1f} "
+              f"{r['logs_direct_p50']:9.1f} {r['telemetry_p50']:10.1f} {r['telemetry_p95']:10.1f} "
+              f"{r['upstream_rps']:8.1f}")
+    print(f"\nLatencies in ms. polls/s: /telemetry requests per robot per second with "
+          f"{args.listeners} listeners (direct polling would be {args.listeners / args.interval:.0f}).")
+
+
+if __name__ == "__main__":
+    main()
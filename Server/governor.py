@@ -0,0 +1,269 @@
+# governor.py
+"""
+Thermal- and load-aware quality governor.
+
+server.py samples the CPU temperature (/sys/class/thermal), the load
+average (/proc/loadavg), the age of the newest analysis frame, the
+detection pool's latency and the period of its own obstacle_monitor
+loop. From these it steps through LEVELS:
+
+    level     detect every  detect scale  stream cap  ffmpeg crf / preset
+    full      1 frame       1.0           high        23 / fast
+    reduced   2 frames      1.0           medium      25 / faster
+    low       3 frames      0.75          low         28 / veryfast
+    minimal   6 frames      0.5           low         30 / ultrafast
+
+Any signal over its "high" mark for DOWNGRADE_HOLD seconds steps one
+level down. Every signal under its "low" mark for UPGRADE_HOLD seconds
+steps one level up. A late safety loop (obstacle_monitor's period over
+SAFETY_PERIOD_LIMIT) steps down at once. The level is shared with
+video_stream.py through QUALITY_CONTROL_PATH, like capture profiles.
+
+Set SPYROBOT_SYSFS_ROOT to a directory holding sys/class/thermal/
+thermal_zone0/temp and proc/loadavg files to drive the governor from
+test files instead of the real machine.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+QUALITY_CONTROL_PATH = "/tmp/spyrobot_quality.json"
+SYSFS_ROOT_ENV = "SPYROBOT_SYSFS_ROOT"
+THERMAL_PATH = "sys/class/thermal/thermal_zone0/temp"
+LOADAVG_PATH = "proc/loadavg"
+
+Level = namedtuple("Level", ["name", "detect_every", "detect_scale", "stream_tier",
+                             "record_crf", "record_preset"])
+
+LEVELS = [
+    Level("full", 1, 1.0, "high", 23, "fast"),
+    Level("reduced", 2, 1.0, "medium", 25, "faster"),
+    Level("low", 3, 0.75, "low", 28, "veryfast"),
+    Level("minimal", 6, 0.5, "low", 30, "ultrafast"),
+]
+LEVEL_NAMES = [level.name for level in LEVELS]
+
+# signal: (low, high); below low everywhere = headroom, above high anywhere = pressure
+THRESHOLDS = {
+    "temperature": (65.0, 75.0),     # degrees C; the Pi throttles from 80-85
+    "load": (0.7, 1.0),              # 1-minute load average per core
+    "frame_age": (0.15, 0.4),        # seconds since the newest analysis frame
+    "detection_p95": (150.0, 400.0), # ms capture -> detection result
+}
+SAFETY_PERIOD_LIMIT = 0.2    # seconds; obstacle_monitor runs every 0.1 s
+SAMPLE_INTERVAL = 1.0
+DOWNGRADE_HOLD = 3.0         # seconds of pressure before stepping down
+UPGRADE_HOLD = 20.0          # seconds of headroom before stepping up
+TEMPERATURE_SMOOTHING = 0.3  # EMA weight of a new temperature sample
+
+
+def get_level(name):
+    for level in LEVELS:
+        if level.name == name:
+            return level
+    raise ValueError(f"Unknown quality level '{name}'. Choose from: {', '.join(LEVEL_NAMES)}")
+
+
+def sysfs_root():
+    return os.environ.get(SYSFS_ROOT_ENV, "/")
+
+
+def read_temperature(root=None):
+    """CPU temperature in degrees C, or None."""
+    try:
+        with open(os.path.join(root or sysfs_root(), THERMAL_PATH), "r") as f:
+            return int(f.read().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+def read_load(root=None):
+    """1-minute load average divided by the number of cores, or None."""
+    try:
+        with open(os.path.join(root or sysfs_root(), LOADAVG_PATH), "r") as f:
+            return float(f.read().split()[0]) / (os.cpu_count() or 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def write_quality_level(name, path=QUALITY_CONTROL_PATH):
+    get_level(name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"level": name, "updated": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def read_quality_level(path=QUALITY_CONTROL_PATH):
+    """Current level name, or None if nothing (valid) has been written."""
+    try:
+        with open(path, "r") as f:
+            name = json.load(f).get("level")
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        return None
+    return name if name in LEVEL_NAMES else None
+
+
+class QualityWatcher:
+    """Polls the control file; changed() returns a newly set Level once."""
+
+    def __init__(self, path=QUALITY_CONTROL_PATH):
+        self.path = path
+        self._mtime = None
+
+    def changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        name = read_quality_level(self.path)
+        return get_level(name) if name else None
+
+
+class SafetyLoopTimer:
+    """Period statistics of a fixed-rate loop; obstacle_monitor calls tick() once per pass."""
+
+    def __init__(self, window=100):
+        self._periods = deque(maxlen=window)
+        self._last = None
+
+    def tick(self):
+        now = time.monotonic()
+        if self._last is not None:
+            self._periods.append(now - self._last)
+        self._last = now
+
+    def worst(self):
+        """Longest period since the previous call in seconds, or None if there was none."""
+        if not self._periods:
+            return None
+        worst = max(self._periods)
+        self._periods.clear()
+        return worst
+
+
+class Governor:
+    def __init__(self, sample_inputs, on_level, safety_timer=None, root=None):
+        """
+        sample_inputs(): dict of the pipeline signals (frame_age, detection_p95),
+                         values may be None when unknown
+        on_level(level): applies a new Level (writes the control file, caps the stream)
+        """
+        self.sample_inputs = sample_inputs
+        self.on_level = on_level
+        self.safety_timer = safety_timer
+        self.root = root
+        self.index = 0
+        self.pinned = None
+        self.signals = {}
+        self._temperature = None
+        self._pressure_since = None
+        self._headroom_since = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self.history = deque(maxlen=50)   # level changes: {time, level, reason}
+
+    @property
+    def level(self):
+        return LEVELS[self.index]
+
+    def start(self):
+        self._apply(0, "start")
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="governor")
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                print("Governor error:", e)
+            time.sleep(SAMPLE_INTERVAL)
+
+    def sample(self):
+        temperature = read_temperature(self.root)
+        if temperature is not None:
+            if self._temperature is None:
+                self._temperature = temperature
+            else:
+                self._temperature += TEMPERATURE_SMOOTHING * (temperature - self._temperature)
+        signals = {"temperature": self._temperature, "load": read_load(self.root)}
+        signals.update(self.sample_inputs())
+        signals["safety_period"] = self.safety_timer.worst() if self.safety_timer else None
+        return signals
+
+    def step(self, now=None):
+        """Take one sample and move at most one level. Returns the current Level."""
+        now = time.monotonic() if now is None else now
+        signals = self.sample()
+        pressure = [name for name, (_, high) in THRESHOLDS.items()
+                    if signals.get(name) is not None and signals[name] > high]
+        headroom = all(signals.get(name) is None or signals[name] < low
+                       for name, (low, _) in THRESHOLDS.items())
+        safety_late = (signals["safety_period"] is not None
+                       and signals["safety_period"] > SAFETY_PERIOD_LIMIT)
+
+        with self._lock:
+            self.signals = {name: None if value is None else round(value, 3)
+                            for name, value in signals.items()}
+            if self.pinned is not None:
+                return self.level
+            if pressure or safety_late:
+                self._headroom_since = None
+                if self._pressure_since is None:
+                    self._pressure_since = now
+                if safety_late or now - self._pressure_since >= DOWNGRADE_HOLD:
+                    if self.index < len(LEVELS) - 1:
+                        reason = "safety loop late" if safety_late else ", ".join(pressure)
+                        self._apply(self.index + 1, reason)
+                    self._pressure_since = now
+            else:
+                self._pressure_since = None
+                if headroom:
+                    if self._headroom_since is None:
+                        self._headroom_since = now
+                    if now - self._headroom_since >= UPGRADE_HOLD and self.index > 0:
+                        self._apply(self.index - 1, "headroom")
+                        self._headroom_since = now
+                else:
+                    self._headroom_since = None
+            return self.level
+
+    def _apply(self, index, reason):
+        self.index = index
+        self.history.append({"time": time.time(), "level": self.level.name, "reason": reason})
+        print(f"Quality level: {self.level.name} ({reason})")
+        try:
+            self.on_level(self.level)
+        except Exception as e:
+            print("Quality level apply error:", e)
+
+    def pin(self, name):
+        """Hold a level (name) or return to automatic control (None)."""
+        with self._lock:
+            if name is None:
+                self.pinned = None
+                self._pressure_since = self._headroom_since = None
+                return self.level
+            index = LEVEL_NAMES.index(get_level(name).name)
+            self.pinned = name
+            if index != self.index:
+                self._apply(index, "pinned")
+            return self.level
+
+    def status(self):
+        with self._lock:
+            return {
+                "level": self.level._asdict(),
+                "mode": "pinned" if self.pinned else "auto",
+                "signals": dict(self.signals),
+                "thresholds": THRESHOLDS,
+                "safety_period_limit": SAFETY_PERIOD_LIMIT,
+                "history": list(self.history),
+            }
@@ -0,0 +1,279 @@
+# log_sink.py
+"""
+Single owner of spy_logs.json.
+
+server.py runs one LogSink. Records reach it either in-process
+(logger.append_log in the server) or as newline-delimited JSON on a unix
+socket (logger.append_log in video_stream.py or any other local process).
+The sink assigns ids, keeps the log list in memory and writes once per
+batch (every FLUSH_INTERVAL seconds or MAX_BATCH records). The file stays
+one JSON array. A batch overwrites its closing bracket with the new
+records (one per line) and a new bracket, then fsyncs, so a flush costs
+the batch size, not the log size. A missing file or a damaged tail is
+rewritten in full, atomically. Producers never touch the disk: if the
+sink falls behind, records are dropped and counted instead of blocking
+the caller.
+"""
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+LOG_SOCKET_PATH = "/tmp/spyrobot_log.sock"
+FLUSH_INTERVAL = 0.5     # seconds
+TAIL_BYTES = 64          # read from the end of the file to find the closing bracket
+MAX_BATCH = 64           # records; flush early when this many are pending
+MAX_PENDING = 10000      # records held in memory before new ones are dropped
+CLIENT_QUEUE_SIZE = 1000 # records a producer buffers while the sink is busy/away
+
+
+class LogSink:
+    def __init__(self, log_path, socket_path=LOG_SOCKET_PATH, listeners=()):
+        """listeners: callbacks run with each record after it has been assigned an id."""
+        self.log_path = log_path
+        self.socket_path = socket_path
+        self.listeners = listeners
+        self._cond = threading.Condition()
+        self._pending = []
+        self._logs = self._read_file()
+        self._unwritten = []      # committed records a failed write still owes the file
+        self._sock = None
+        self._running = False
+        self._flush_thread = None
+        self.stats = {"received": 0, "written": 0, "dropped": 0, "batches": 0,
+                      "bad_records": 0, "write_errors": 0}
+
+    def _read_file(self):
+        try:
+            with open(self.log_path, "r") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return []
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        # Cut short mid-append: keep every complete record (one per line)
+        end = text.rfind("}")
+        try:
+            logs = json.loads(text[:end + 1].rstrip().rstrip(",") + "\n]")
+        except json.JSONDecodeError:
+            print(f"[LOG] {self.log_path} is unreadable, starting a new log")
+            logs = []
+        self._logs = logs
+        try:
+            self._rewrite()
+        except OSError as e:
+            print(f"[LOG] could not repair {self.log_path}: {e}")
+        return logs
+
+    def start(self):
+        self._running = True
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        self._sock.listen()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        print(f"[LOG] sink listening on {self.socket_path}, {len(self._logs)} existing entries")
+
+    def stop(self):
+        """Flush whatever is pending and close the socket."""
+        self._running = False
+        with self._cond:
+            self._cond.notify()
+        # The final flush must not run alongside the flusher's last one
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+        self._flush()
+        if self._sock is not None:
+            self._sock.close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Intake
+    # ------------------------------------------------------------------
+    def submit(self, record):
+        """Queue one record without blocking. Returns False if it was dropped."""
+        with self._cond:
+            self.stats["received"] += 1
+            if len(self._pending) >= MAX_PENDING:
+                self.stats["dropped"] += 1
+                return False
+            self._pending.append(record)
+            if len(self._pending) >= MAX_BATCH:
+                self._cond.notify()
+        return True
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._receive_loop, args=(conn,), daemon=True).start()
+
+    def _receive_loop(self, conn):
+        """One thread per producer process, reading newline-delimited JSON."""
+        with conn, conn.makefile("rb") as stream:
+            for line in stream:
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    self.stats["bad_records"] += 1
+                    continue
+                if isinstance(record, dict):
+                    self.submit(record)
+
+    # ------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------
+    def _flush_loop(self):
+        while self._running:
+            with self._cond:
+                if len(self._pending) < MAX_BATCH:
+                    self._cond.wait(FLUSH_INTERVAL)
+            self._flush()
+
+    def _flush(self):
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if not batch and not self._unwritten:
+            return
+
+        for record in batch:
+            record["id"] = len(self._logs) + 1
+            self._logs.append(record)
+
+        records = self._unwritten + batch
+        try:
+            try:
+                self._append(records)
+            except (FileNotFoundError, ValueError):
+                self._rewrite()
+            self._unwritten = []
+            self.stats["written"] += len(records)
+            self.stats["batches"] += 1
+        except OSError as e:
+            # Entries stay in memory and go out with the next successful batch
+            self._unwritten = records
+            self.stats["write_errors"] += 1
+            print(f"[LOG] write failed: {e}")
+
+        for record in batch:
+            for callback in self.listeners:
+                try:
+                    callback(record)
+                except Exception as e:
+                    print(f"[LOG] listener error: {e}")
+
+    def _append(self, records):
+        """
+        Write `records` over the array's closing bracket. Raises ValueError
+        if the file does not end in one (e.g. an earlier write was cut short).
+        """
+        with open(self.log_path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - TAIL_BYTES))
+            tail = f.read()
+            stripped = tail.rstrip()
+            if not stripped.endswith(b"]"):
+                raise ValueError(f"{self.log_path} does not end with ']'")
+            empty = stripped[:-1].rstrip().endswith(b"[")
+            f.seek(size - len(tail) + len(stripped) - 1)
+            lines = ",\n".join("  " + json.dumps(record) for record in records)
+            f.write((("\n" if empty else ",\n") + lines + "\n]\n").encode("utf-8"))
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite(self):
+        """Write the whole log atomically (new file or damaged tail)."""
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._logs, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+
+    def snapshot(self):
+        """All committed entries (what /logs returns)."""
+        return list(self._logs)
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["pending"] = len(self._pending)
+        stats["entries"] = len(self._logs)
+        return stats
+
+
+class LogClient:
+    """
+    Used by processes other than the server. send() only puts the record on
+    a bounded in-memory queue; a background thread ships queued records to
+    the sink in batches. When the queue is full the record is dropped and
+    counted, so the caller never waits on the socket or the disk.
+    """
+
+    def __init__(self, socket_path=LOG_SOCKET_PATH):
+        self.socket_path = socket_path
+        self.sent = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._thread = None
+
+    def available(self):
+        """Is a sink listening on the socket path?"""
+        return os.path.exists(self.socket_path)
+
+    def send(self, record):
+        """Queue one record. Returns False if it had to be dropped."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._send_loop, daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped in (1, 10, 100) or self.dropped % 1000 == 0:
+                print(f"[LOG] sink busy, {self.dropped} records dropped so far")
+            return False
+
+    def _send_loop(self):
+        sock = None
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            payload = b"".join(json.dumps(r).encode("utf-8") + b"\n" for r in batch)
+
+            # Retry until the sink takes the batch (e.g. while the server restarts);
+            # meanwhile new records pile up in the bounded queue and overflow is dropped
+            while True:
+                try:
+                    if sock is None:
+                        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        sock.connect(self.socket_path)
+                    sock.sendall(payload)
+                    self.sent += len(batch)
+                    break
+                except OSError:
+                    if sock is not None:
+                        sock.close()
+                        sock = None
+                    time.sleep(1.0)
@@ -2,36 +2,95 @@
 import json
 import time
 import os
+import threading
+
+from log_sink import LogSink, LogClient, LOG_SOCKET_PATH
 
 LOG_FILE_PATH = os.path.expanduser('/home/spyrobot/CPSC584_spyrobot/logs/spy_logs.json')
 
-def append_log(description, log_type='auto', severity='info'):
+# Callbacks run with each new log entry (e.g. the server's search index)
+_log_listeners = []
+
+# The sink owning spy_logs.json if it runs in this process (server.py),
+# otherwise records are sent to it over LOG_SOCKET_PATH.
+_sink = None
+_client = None
+_direct_lock = threading.Lock()
+
+def add_log_listener(callback):
+    """Register callback(entry) to be called for every new log entry."""
+    _log_listeners.append(callback)
+
+def start_log_sink():
     """
-    Appends a log entry to spy_logs.json with a timestamp, description, 
-    type (e.g., 'auto' or 'manual'), and severity ('info', 'warning', 'critical').
+    Make this process the single writer of spy_logs.json. Other processes'
+    append_log calls are received over a unix socket. Called by server.py.
     """
-    timestamp_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
+    global _sink
+    if _sink is None:
+        _sink = LogSink(LOG_FILE_PATH, LOG_SOCKET_PATH, listeners=_log_listeners)
+        _sink.start()
+    return _sink
 
-    # Try to read existing logs
+def load_logs():
+    """Return the list of all log entries (empty if there is no log file yet)."""
+    if _sink is not None:
+        return _sink.snapshot()
     try:
         with open(LOG_FILE_PATH, 'r') as f:
-            logs = json.load(f)
+            return json.load(f)
     except (FileNotFoundError, json.JSONDecodeError):
-        logs = []
+        return []
+
+def append_log(description, log_type='auto', severity='info'):
+    """
+    Appends a log entry to spy_logs.json with a timestamp, description,
+    type (e.g., 'auto' or 'manual'), and severity ('info', 'warning', 'critical').
+
+    Never blocks on disk: the entry is handed to the log sink, which assigns
+    the id and writes entries in batches.
+    """
+    global _client
+    timestamp_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
 
     new_event = {
-        "id": len(logs) + 1,               # Simple numeric ID
         "timestamp": timestamp_str,
         "description": description,
         "type": log_type,                  # 'auto' for system logs, 'manual' for user logs
         "severity": severity               # e.g., 'info', 'warning', 'critical'
     }
 
-    logs.append(new_event)
+    # For debugging:
+    print(f"[LOG] {timestamp_str} {severity.upper()} - {description}")
+
+    if _sink is not None:
+        _sink.submit(new_event)
+        return
 
-    # Write updated logs
-    with open(LOG_FILE_PATH, 'w') as f:
-        json.dump(logs, f, indent=2)
+    if _client is None:
+        _client = LogClient(LOG_SOCKET_PATH)
+    if _client.available():
+        _client.send(new_event)
+    else:
+        # No sink running anywhere (e.g. a standalone script): write it ourselves
+        _append_direct(new_event)
 
-    # For debugging:
-    print(f"[LOG] {timestamp_str} {severity.upper()} - {description}")
\ No newline at end of file
+def _append_direct(new_event):
+    with _direct_lock:
+        try:
+            with open(LOG_FILE_PATH, 'r') as f:
+                logs = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            logs = []
+
+        new_event["id"] = len(logs) + 1    # Simple numeric ID
+        logs.append(new_event)
+
+        with open(LOG_FILE_PATH, 'w') as f:
+            json.dump(logs, f, indent=2)
+
+    for callback in _log_listeners:
+        try:
+            callback(new_event)
+        except Exception as e:
+            print(f"[LOG] listener error: {e}")
@@ -0,0 +1,141 @@
+# mission_logic.py
+"""
+Decision logic of the mission, free of hardware and wall-clock calls.
+
+server.py's obstacle_monitor and video_stream.py's detection callback
+feed these classes readings plus the current time and act on what they
+return (log lines, the dead-stop). replay_mission.py feeds them a
+recorded trace instead, so a mission's decisions can be reproduced and
+timed without the robot.
+"""
+
+# ----------------------------------------------------------------------------
+# DISTANCE LOGIC:
+# We'll define 4 "categories" for the measured distance:
+# 1) <= 30 cm => "critical"
+# 2) <= 70 cm => "warning"
+# 3) <= 100 cm => "info"
+# 4) > 100 cm => "safe"
+# We only LOG after the robot remains in that category for >1s to avoid spamming.
+# ----------------------------------------------------------------------------
+DEAD_DISTANCE = 30     # cm
+DEAD_HOLD = 2.0        # seconds at <= DEAD_DISTANCE before the dead-stop
+CATEGORY_HOLD = 1.0    # seconds in a category before it is logged
+FACE_HOLD = 1.0        # seconds a face state must last before it is logged
+
+
+def get_distance_category(dist):
+    if dist <= 30:
+        return "critical"
+    elif dist <= 70:
+        return "warning"
+    elif dist <= 100:
+        return "info"
+    else:
+        return "safe"
+
+
+CATEGORY_LOGS = {
+    "critical": ("Ultrasonic: CRITICAL, distance <= 30cm for 1s!", "critical"),
+    "warning": ("Ultrasonic: WARNING, distance <= 70cm for 1s.", "warning"),
+    "info": ("Ultrasonic: distance <= 100cm (moderate range) for 1s.", "info"),
+    "safe": ("Ultrasonic: SAFE distance > 100cm.", "info"),
+}
+
+
+class ObstacleLogic:
+    """State of obstacle_monitor between ultrasonic samples."""
+
+    def __init__(self):
+        # We'll track the last category/time we entered that category, and log once we pass 1s
+        self.last_category = None
+        self.last_category_time = 0
+        self.category_logged = False
+        self.start_time_for_dead = None
+
+    def update(self, distance, now):
+        """
+        Process one sample taken at `now`. Returns (logs, dead): the
+        (message, severity) lines to log and whether to trigger the dead-stop.
+        """
+        logs = []
+        current_category = get_distance_category(distance)
+
+        # If we've changed category, reset timing/log flags
+        if current_category != self.last_category:
+            self.last_category = current_category
+            self.last_category_time = now
+            self.category_logged = False
+
+        # If we've been in the same category for >1s and haven't logged yet, log now
+        if (now - self.last_category_time) >= CATEGORY_HOLD and not self.category_logged:
+            logs.append(CATEGORY_LOGS[current_category])
+            self.category_logged = True
+
+        # If distance <= 30 for 2+ seconds => do dead action
+        dead = False
+        if distance <= DEAD_DISTANCE:
+            if self.start_time_for_dead is None:
+                self.start_time_for_dead = now
+            elif now - self.start_time_for_dead >= DEAD_HOLD:
+                dead = True
+        else:
+            self.start_time_for_dead = None
+        return logs, dead
+
+
+class FacePresenceLogic:
+    """Known / unknown / no-face timers of the detection callback."""
+
+    def __init__(self):
+        self.last_known_face_time = 0
+        self.known_face_logged = False
+        self.last_unknown_face_time = 0
+        self.unknown_face_logged = False
+        self.last_no_face_time = 0
+        self.no_face_logged = False
+
+    def update(self, detections, now):
+        """
+        detections: (x, y, w, h, known, confidence) of one frame seen at `now`.
+        Returns the (message, severity) lines to log.
+        """
+        logs = []
+        found_known = any(det[4] for det in detections)
+        found_unknown = any(not det[4] for det in detections)
+        any_face_found = (found_known or found_unknown)
+
+        # Known face logic
+        if found_known:
+            if self.last_known_face_time == 0:
+                self.last_known_face_time = now
+            if (now - self.last_known_face_time) >= FACE_HOLD and not self.known_face_logged:
+                logs.append(("Mission success: target face confirmed > 1s!", "success"))
+                self.known_face_logged = True
+        else:
+            self.last_known_face_time = 0
+            self.known_face_logged = False
+
+        # Unknown face logic
+        if found_unknown:
+            if self.last_unknown_face_time == 0:
+                self.last_unknown_face_time = now
+            if (now - self.last_unknown_face_time) >= FACE_HOLD and not self.unknown_face_logged:
+                logs.append(("Warning: unknown face detected > 1s.", "warning"))
+                self.unknown_face_logged = True
+        else:
+            self.last_unknown_face_time = 0
+            self.unknown_face_logged = False
+
+        # No face logic
+        if not any_face_found:
+            if self.last_no_face_time == 0:
+                self.last_no_face_time = now
+            if (now - self.last_no_face_time) >= FACE_HOLD and not self.no_face_logged:
+                logs.append(("No face detected > 1s. Scene is clear.", "info"))
+                self.no_face_logged = True
+        else:
+            self.last_no_face_time = 0
+            self.no_face_logged = False
+
+        return logs
@@ -0,0 +1,142 @@
+# mission_trace.py
+"""
+Compact binary trace of a mission, for replay_mission.py.
+
+server.py can record every ultrasonic sample, movement command and
+camera frame (id + detections) while it runs. The trace is
+little-endian and append-only:
+
+    header   "SPYT" u16 version, f64 start time
+    record   u8 kind, f64 timestamp (time.time()), then a payload:
+      DISTANCE  f32 distance (cm)
+      MOVEMENT  u16 speed, u8 n, n bytes action (utf-8)
+      FRAME     i64 frame id, u8 n, n x 6 f32 (x, y, w, h, known, confidence)
+
+A distance sample is 13 bytes, so an hour of 10 Hz sensor data plus
+20 fps detections is a few MB. A trace cut short by a crash reads up to
+its last complete record.
+"""
+import struct
+import threading
+import time
+from collections import namedtuple
+
+MAGIC = b"SPYT"
+VERSION = 1
+
+DISTANCE = 1
+MOVEMENT = 2
+FRAME = 3
+KIND_NAMES = {DISTANCE: "distance", MOVEMENT: "movement", FRAME: "frame"}
+
+_HEADER = struct.Struct("<4sHd")
+_RECORD = struct.Struct("<Bd")
+_DISTANCE = struct.Struct("<f")
+_MOVEMENT = struct.Struct("<HB")
+_FRAME = struct.Struct("<qB")
+_DETECTION = struct.Struct("<6f")
+
+FLUSH_INTERVAL = 1.0   # seconds; bounds what a crash can lose
+
+# data: distance -> float, movement -> (action, speed), frame -> (frame_id, detections)
+TraceRecord = namedtuple("TraceRecord", ["kind", "timestamp", "data"])
+
+
+class TraceWriter:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "wb", buffering=64 * 1024)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._last_flush = time.monotonic()
+        self.records = 0
+        self.bytes = _HEADER.size
+
+    def _write(self, kind, timestamp, payload):
+        data = _RECORD.pack(kind, time.time() if timestamp is None else timestamp) + payload
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(data)
+            self.records += 1
+            self.bytes += len(data)
+            if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+
+    def distance(self, distance, timestamp=None):
+        self._write(DISTANCE, timestamp, _DISTANCE.pack(distance))
+
+    def movement(self, action, speed, timestamp=None):
+        action = action.encode("utf-8")[:255]
+        self._write(MOVEMENT, timestamp, _MOVEMENT.pack(int(speed), len(action)) + action)
+
+    def frame(self, frame_id, detections, timestamp=None):
+        detections = list(detections)[:255]
+        payload = _FRAME.pack(frame_id, len(detections))
+        payload += b"".join(_DETECTION.pack(*map(float, det[:6])) for det in detections)
+        self._write(FRAME, timestamp, payload)
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        return {"path": self.path, "records": self.records, "bytes": self.bytes,
+                "closed": self.closed}
+
+
+def read_trace(path):
+    """Yields TraceRecords in file order."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is not a mission trace")
+    magic, version, _ = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} mission trace")
+
+    offset = _HEADER.size
+    end = len(data)
+    while offset + _RECORD.size <= end:
+        kind, timestamp = _RECORD.unpack_from(data, offset)
+        pos = offset + _RECORD.size
+        try:
+            if kind == DISTANCE:
+                (value,) = _DISTANCE.unpack_from(data, pos)
+                pos += _DISTANCE.size
+            elif kind == MOVEMENT:
+                speed, n = _MOVEMENT.unpack_from(data, pos)
+                pos += _MOVEMENT.size
+                if pos + n > end:
+                    break
+                value = (data[pos:pos + n].decode("utf-8"), speed)
+                pos += n
+            elif kind == FRAME:
+                frame_id, n = _FRAME.unpack_from(data, pos)
+                pos += _FRAME.size
+                if pos + n * _DETECTION.size > end:
+                    break
+                detections = [_DETECTION.unpack_from(data, pos + i * _DETECTION.size) for i in range(n)]
+                pos += n * _DETECTION.size
+                value = (frame_id, detections)
+            else:
+                raise ValueError(f"{path}: unknown record kind {kind} at byte {offset}")
+        except struct.error:
+            break   # truncated last record
+        yield TraceRecord(kind, timestamp, value)
+        offset = pos
+
+
+def trace_header(path):
+    with open(path, "rb") as f:
+        magic, version, started = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a mission trace")
+    return {"version": version, "started": started}
@@ -0,0 +1,207 @@
+# mjpeg_stream.py
+"""
+Encode-once MJPEG fan-out for the live video feed.
+
+One encoder thread reads each new frame from the shared frame bus and
+JPEG-encodes it once per quality tier that currently has viewers. Every
+viewer holds only the newest encoded frame for its tier: if it has not
+sent the previous one yet, that frame is replaced (drop-to-latest), so
+a slow client only ever hurts itself. In "auto" mode a client moves down
+a tier when it keeps dropping frames and back up when it keeps up.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from frame_bus import FrameBusClosed
+
+# name -> (JPEG quality, scale factor); ordered best to worst
+QUALITY_TIERS = [
+    ("high", 80, 1.0),
+    ("medium", 60, 0.75),
+    ("low", 40, 0.5),
+]
+TIER_NAMES = [name for name, _, _ in QUALITY_TIERS]
+
+BOUNDARY = "frame"
+
+# Adaptive tier selection, evaluated over the last ADAPT_WINDOW offered frames
+ADAPT_WINDOW = 30
+DOWNGRADE_DROP_RATIO = 0.3
+UPGRADE_DROP_RATIO = 0.05
+UPGRADE_HOLD = 5.0  # seconds a client must stay clean before trying a better tier
+
+
+class StreamClient:
+    """One viewer: a single-frame mailbox plus its drop statistics."""
+
+    def __init__(self, tier, auto):
+        self.tier = tier
+        self.auto = auto
+        self.cond = threading.Condition()
+        self.pending = None       # (frame_id, jpeg bytes) not yet sent
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.history = deque(maxlen=ADAPT_WINDOW)  # 1 = dropped, 0 = delivered
+        self.last_change = time.monotonic()
+
+    def offer(self, frame_id, jpeg):
+        with self.cond:
+            dropped = self.pending is not None
+            if dropped:
+                self.dropped += 1
+            self.history.append(1 if dropped else 0)
+            self.pending = (frame_id, jpeg)
+            self.cond.notify()
+
+    def take(self, timeout):
+        with self.cond:
+            if self.pending is None and not self.closed:
+                self.cond.wait(timeout)
+            item, self.pending = self.pending, None
+            if item is not None:
+                self.sent += 1
+            return item
+
+    def adapt(self):
+        """Move one tier down/up based on recent drops. Returns True if changed."""
+        if not self.auto or len(self.history) < ADAPT_WINDOW:
+            return False
+        ratio = sum(self.history) / len(self.history)
+        index = TIER_NAMES.index(self.tier)
+        now = time.monotonic()
+        if ratio > DOWNGRADE_DROP_RATIO and index < len(TIER_NAMES) - 1:
+            index += 1
+        elif (ratio < UPGRADE_DROP_RATIO and index > 0
+              and now - self.last_change >= UPGRADE_HOLD):
+            index -= 1
+        else:
+            return False
+        self.tier = TIER_NAMES[index]
+        self.history.clear()
+        self.last_change = now
+        return True
+
+
+class StreamHub:
+    def __init__(self, get_bus):
+        """get_bus: callable returning an attached FrameBus or None."""
+        self.get_bus = get_bus
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._thread = None
+        self.frames_encoded = 0
+        self.encodes = {name: 0 for name in TIER_NAMES}
+        self.max_tier = TIER_NAMES[0]   # best tier any client gets (lowered by governor.py)
+
+    def set_max_tier(self, name):
+        if name not in TIER_NAMES:
+            raise ValueError(f"tier must be one of {TIER_NAMES}")
+        self.max_tier = name
+
+    def _capped(self, tier):
+        return TIER_NAMES[max(TIER_NAMES.index(tier), TIER_NAMES.index(self.max_tier))]
+
+    def subscribe(self, quality="auto"):
+        auto = quality not in TIER_NAMES
+        client = StreamClient(TIER_NAMES[0] if auto else quality, auto)
+        with self._lock:
+            self._clients.add(client)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+                self._thread.start()
+        return client
+
+    def unsubscribe(self, client):
+        with client.cond:
+            client.closed = True
+            client.cond.notify()
+        with self._lock:
+            self._clients.discard(client)
+
+    def _encode_loop(self):
+        last_id = -1
+        while True:
+            with self._lock:
+                if not self._clients:
+                    self._thread = None
+                    return
+                clients = list(self._clients)
+
+            bus = self.get_bus()
+            if bus is None:
+                time.sleep(0.5)
+                continue
+            try:
+                frame_id = bus.wait_for_frame(last_id, timeout=0.5)
+                if frame_id is None:
+                    continue
+                # A private copy: the bus may be re-created (and its handle closed
+                # by another thread) while this frame is being encoded
+                frame = bus.read(frame_id, copy=True)
+            except FrameBusClosed:
+                last_id = -1
+                continue
+            except Exception as e:
+                # Clients block in take() until this thread offers a frame; it must not die
+                print("Stream encoder error:", e)
+                time.sleep(0.1)
+                continue
+            if frame is None:
+                continue
+            last_id = frame.frame_id
+
+            by_tier = {}
+            for client in clients:
+                client.adapt()
+                by_tier.setdefault(self._capped(client.tier), []).append(client)
+
+            encoded = {}
+            for name, quality, scale in QUALITY_TIERS:
+                if name not in by_tier:
+                    continue
+                image = frame.image
+                if scale != 1.0:
+                    image = cv2.resize(image, None, fx=scale, fy=scale,
+                                       interpolation=cv2.INTER_AREA)
+                ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if ok:
+                    encoded[name] = jpeg.tobytes()
+                    self.encodes[name] += 1
+
+            self.frames_encoded += 1
+
+            for name, jpeg in encoded.items():
+                for client in by_tier[name]:
+                    client.offer(frame.frame_id, jpeg)
+
+    def stream(self, client):
+        """Generator yielding multipart/x-mixed-replace chunks for one client."""
+        try:
+            while not client.closed:
+                item = client.take(timeout=1.0)
+                if item is None:
+                    continue
+                _, jpeg = item
+                yield (b"--" + BOUNDARY.encode() + b"\r\n"
+                       b"Content-Type: image/jpeg\r\n"
+                       b"Content-Length: " + str(len(jpeg)).encode() + b"\r\n\r\n"
+                       + jpeg + b"\r\n")
+        finally:
+            self.unsubscribe(client)
+
+    def stats(self):
+        with self._lock:
+            clients = list(self._clients)
+        return {
+            "clients": [
+                {"tier": c.tier, "auto": c.auto, "sent": c.sent, "dropped": c.dropped}
+                for c in clients
+            ],
+            "max_tier": self.max_tier,
+            "frames_encoded": self.frames_encoded,
+            "encodes_per_tier": dict(self.encodes),
+        }
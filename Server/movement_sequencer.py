@@ -0,0 +1,168 @@
+# movement_sequencer.py
+"""
+Runs a scripted list of movement steps on the robot as one continuous
+schedule, so a patrol route is a single HTTP request instead of one
+POST /movement per gait cycle.
+
+A step is {"action": ..., "repeat": N, "speed": S, "pause": seconds}.
+Each repeat is one gait cycle; pauses are timed against a monotonic
+clock. A running sequence can be cancelled or preempted by a new one
+between gait cycles. Cycles that did not run (the action raised or was
+refused) count as failed_cycles, not completed_cycles.
+"""
+import threading
+import time
+
+MAX_STEPS = 200
+MAX_REPEAT = 100
+MAX_PAUSE = 60.0
+
+
+class SequenceBusy(Exception):
+    """A sequence is already running and the caller did not ask to preempt it."""
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def parse_steps(raw_steps, valid_actions, default_speed):
+    """Validate the request body's step list. Raises ValueError with a readable message."""
+    if not isinstance(raw_steps, list) or not raw_steps:
+        raise ValueError("steps must be a non-empty list")
+    if len(raw_steps) > MAX_STEPS:
+        raise ValueError(f"at most {MAX_STEPS} steps per sequence")
+
+    steps = []
+    for i, raw in enumerate(raw_steps):
+        if not isinstance(raw, dict):
+            raise ValueError(f"step {i}: must be an object")
+        action = raw.get("action", "")
+        if action not in valid_actions:
+            raise ValueError(f"step {i}: invalid action '{action}'")
+        try:
+            repeat = int(raw.get("repeat", 1))
+            speed = int(raw.get("speed", default_speed))
+            pause = float(raw.get("pause", 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"step {i}: repeat, speed and pause must be numbers")
+        if not 1 <= repeat <= MAX_REPEAT:
+            raise ValueError(f"step {i}: repeat must be between 1 and {MAX_REPEAT}")
+        if not 0 <= speed <= 100:
+            raise ValueError(f"step {i}: speed must be between 0 and 100")
+        if not 0 <= pause <= MAX_PAUSE:
+            raise ValueError(f"step {i}: pause must be between 0 and {MAX_PAUSE}s")
+        steps.append({"action": action, "repeat": repeat, "speed": speed, "pause": pause})
+    return steps
+
+
+class MovementSequencer:
+    def __init__(self, execute):
+        """
+        execute(action, speed): performs exactly one gait cycle of `action`
+        and returns True if it ran.
+        """
+        self.execute = execute
+        self._lock = threading.Lock()
+        # Held across cancel, join and spawn so two preempting starts cannot
+        # both join the old thread and then both spawn a new one
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._cancel = threading.Event()
+        self._next_id = 1
+        self._status = {"state": "idle"}
+
+    def start(self, steps, preempt=False):
+        """Start a new sequence. Returns its id."""
+        with self._start_lock:
+            return self._start(steps, preempt)
+
+    def _start(self, steps, preempt):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                if not preempt:
+                    raise SequenceBusy(self._status.get("id"))
+                self._cancel.set()
+                old_thread = self._thread
+            else:
+                old_thread = None
+
+        # The old sequence stops after its current gait cycle
+        if old_thread is not None:
+            old_thread.join()
+
+        with self._lock:
+            seq_id = self._next_id
+            self._next_id += 1
+            self._cancel = threading.Event()
+            self._status = {
+                "id": seq_id,
+                "state": "running",
+                "total_steps": len(steps),
+                "total_cycles": sum(s["repeat"] for s in steps),
+                "completed_cycles": 0,
+                "failed_cycles": 0,
+                "step": 0,
+                "repeat": 0,
+                "started_at": time.time(),
+                "elapsed": 0.0,
+                "error": None,
+            }
+            self._thread = threading.Thread(
+                target=self._run, args=(seq_id, steps, self._cancel), daemon=True)
+            self._thread.start()
+        return seq_id
+
+    def cancel(self):
+        """Stop the running sequence after its current gait cycle. Returns True if one was running."""
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive()
+            self._cancel.set()
+        return running
+
+    def is_running(self):
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        with self._lock:
+            status = dict(self._status)
+        if status.get("state") == "running":
+            status["elapsed"] = round(time.time() - status["started_at"], 3)
+        return status
+
+    def _update(self, seq_id, **fields):
+        with self._lock:
+            if self._status.get("id") == seq_id:
+                self._status.update(fields)
+
+    def _run(self, seq_id, steps, cancel):
+        start = time.monotonic()
+        completed = failed = 0
+        try:
+            for step_index, step in enumerate(steps):
+                for r in range(step["repeat"]):
+                    if cancel.is_set():
+                        raise _Cancelled()
+                    self._update(seq_id, step=step_index, repeat=r)
+                    if self.execute(step["action"], step["speed"]):
+                        completed += 1
+                        self._update(seq_id, completed_cycles=completed)
+                    else:
+                        failed += 1
+                        self._update(seq_id, failed_cycles=failed)
+
+                if step["pause"] > 0:
+                    # Event.wait doubles as an interruptible sleep
+                    if cancel.wait(step["pause"]):
+                        raise _Cancelled()
+            state = "completed"
+        except _Cancelled:
+            state = "cancelled"
+        except Exception as e:
+            print(f"Movement sequence {seq_id} failed: {e}")
+            self._update(seq_id, error=str(e))
+            state = "failed"
+
+        self._update(seq_id, state=state, elapsed=round(time.monotonic() - start, 3))
+        print(f"Movement sequence {seq_id} {state} after {completed} gait cycles ({failed} failed).")
@@ -0,0 +1,185 @@
+# occupancy_map.py
+"""
+Occupancy grid built from ultrasonic samples and dead-reckoned gait cycles.
+
+The robot's pose (x, y in cm, heading in radians) starts at the centre
+of the grid and is advanced by ODOMETRY for every gait cycle that
+execute_action completes. Each ultrasonic sample then updates the
+log-odds of the cells in the sensor cone:
+
+    range < distance - CELL_CM       free      (LOG_FREE)
+    |range - distance| <= CELL_CM/2  occupied  (LOG_OCCUPIED)
+
+The cone is a fixed set of sample points in the robot frame
+(_cone_template), so one update is a rotate + translate of that array
+and two np.add.at calls, with no Python loop over rays. Readings at or
+beyond MAX_RANGE only clear space.
+
+Every changed cell records the map version, so snapshot(since, scale)
+can return only the downsampled blocks that changed after `since`.
+Payloads are base64 of raw bytes: uint8 occupancy (0 free, 127
+unknown, 254 occupied) and, for deltas, uint32 block indices.
+"""
+import base64
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+CELL_CM = 5.0
+GRID_CELLS = 400                  # 20 m x 20 m
+MAX_RANGE = 300.0                 # cm; ultrasonic echoes get unreliable beyond this
+CONE_HALF_ANGLE = math.radians(15)
+CONE_RAYS = 9
+LOG_FREE = -0.4
+LOG_OCCUPIED = 0.85
+LOG_LIMIT = 4.0                   # clamp so a cell can change its mind
+
+# Dead reckoning per gait cycle at any speed: (cm ahead, radians counter-clockwise).
+# Same step sizes as sim_hardware.py; measure them on the floor the robot runs on.
+ODOMETRY = {
+    "forward": (8.0, 0.0),
+    "backward": (-8.0, 0.0),
+    "turn_left": (0.0, math.radians(12)),
+    "turn_right": (0.0, -math.radians(12)),
+}
+TRAIL_LENGTH = 200
+
+
+def _cone_template(cell_cm=CELL_CM, max_range=MAX_RANGE):
+    """(x, y, range) sample points of the sensor cone in the robot frame (x ahead)."""
+    angles = np.linspace(-CONE_HALF_ANGLE, CONE_HALF_ANGLE, CONE_RAYS)
+    ranges = np.arange(cell_cm / 2, max_range + cell_cm, cell_cm / 2)
+    a, r = np.meshgrid(angles, ranges, indexing="ij")
+    return np.stack([r * np.cos(a), r * np.sin(a), r], axis=-1).reshape(-1, 3)
+
+
+def _encode(array):
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+class OccupancyMap:
+    def __init__(self, cells=GRID_CELLS, cell_cm=CELL_CM):
+        self.cells = cells
+        self.cell_cm = cell_cm
+        self._template = _cone_template(cell_cm)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.log_odds = np.zeros((self.cells, self.cells), dtype=np.float32)
+            self.changed = np.zeros((self.cells, self.cells), dtype=np.uint32)  # version of last change
+            self.version = 0
+            self.x = self.y = self.cells * self.cell_cm / 2
+            self.heading = math.pi / 2          # facing "up" the map
+            self.trail = deque([(self.x, self.y)], maxlen=TRAIL_LENGTH)
+            self.stats = {"moves": 0, "observations": 0, "off_map": 0}
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def move(self, action, cycles=1):
+        """Dead-reckon one (or more) gait cycles of `action`; other actions do not move."""
+        step = ODOMETRY.get(action)
+        if step is None:
+            return
+        forward, turn = step
+        with self._lock:
+            for _ in range(cycles):
+                self.heading = (self.heading + turn) % (2 * math.pi)
+                self.x += forward * math.cos(self.heading)
+                self.y += forward * math.sin(self.heading)
+            self.trail.append((self.x, self.y))
+            self.stats["moves"] += cycles
+
+    def observe(self, distance):
+        """Integrate one ultrasonic reading (cm) taken at the current pose."""
+        if distance is None or distance <= 0:
+            return
+        template = self._template
+        rng = template[:, 2]
+        free = rng < min(distance, MAX_RANGE) - self.cell_cm
+        occupied = (np.abs(rng - distance) <= self.cell_cm / 2) if distance < MAX_RANGE else None
+
+        with self._lock:
+            c, s = math.cos(self.heading), math.sin(self.heading)
+            wx = self.x + template[:, 0] * c - template[:, 1] * s
+            wy = self.y + template[:, 0] * s + template[:, 1] * c
+            col = (wx // self.cell_cm).astype(np.int64)
+            row = (wy // self.cell_cm).astype(np.int64)
+            inside = (col >= 0) & (col < self.cells) & (row >= 0) & (row < self.cells)
+            if not inside.all():
+                self.stats["off_map"] += 1
+            flat = row * self.cells + col
+
+            self.version += 1
+            grid = self.log_odds.reshape(-1)
+            # One update per cell per reading, however many sample points fall in it
+            free_cells = np.unique(flat[free & inside])
+            if occupied is not None:
+                hit_cells = np.unique(flat[occupied & inside])
+                free_cells = np.setdiff1d(free_cells, hit_cells, assume_unique=True)
+                np.add.at(grid, hit_cells, LOG_OCCUPIED)
+            else:
+                hit_cells = np.empty(0, dtype=np.int64)
+            np.add.at(grid, free_cells, LOG_FREE)
+            touched = np.concatenate([free_cells, hit_cells])
+            grid[touched] = np.clip(grid[touched], -LOG_LIMIT, LOG_LIMIT)
+            self.changed.reshape(-1)[touched] = self.version
+            self.stats["observations"] += 1
+
+    # ------------------------------------------------------------------
+    # Views
+    # ------------------------------------------------------------------
+    def _downsample(self, scale):
+        """uint8 occupancy and last-change version per scale x scale block."""
+        n = self.cells // scale
+        blocks = self.log_odds[:n * scale, :n * scale].reshape(n, scale, n, scale)
+        # The most certain cell of a block decides it: obstacles must not average away
+        high, low = blocks.max(axis=(1, 3)), blocks.min(axis=(1, 3))
+        extreme = np.where(high > -low, high, low)
+        occupancy = np.rint(254.0 / (1.0 + np.exp(-extreme))).astype(np.uint8)
+        changed = self.changed[:n * scale, :n * scale].reshape(n, scale, n, scale).max(axis=(1, 3))
+        return occupancy, changed
+
+    def snapshot(self, since=0, scale=4):
+        """
+        Downsampled view for the UI. since=0 (or a stale version) returns the
+        whole grid; otherwise only blocks changed after version `since`.
+        """
+        with self._lock:
+            occupancy, changed = self._downsample(scale)
+            n = occupancy.shape[0]
+            block_cm = self.cell_cm * scale
+            explored = np.argwhere(changed > 0)
+            result = {
+                "version": self.version,
+                "scale": scale,
+                "cell_cm": block_cm,
+                "width": n,
+                "height": n,
+                "pose": {"x": round(self.x / block_cm, 2), "y": round(self.y / block_cm, 2),
+                         "heading": round(math.degrees(self.heading), 1)},
+                "trail": [[round(x / block_cm, 1), round(y / block_cm, 1)] for x, y in self.trail],
+                # [row min, col min, row max, col max] of blocks ever observed
+                "bounds": None if len(explored) == 0 else
+                          explored.min(axis=0).tolist() + explored.max(axis=0).tolist(),
+            }
+            if since <= 0 or since > self.version:
+                result.update(encoding="full", grid=_encode(occupancy))
+                return result
+            indices = np.flatnonzero(changed.reshape(-1) > since).astype("<u4")
+            if len(indices) * 5 >= occupancy.size:
+                result.update(encoding="full", grid=_encode(occupancy))
+                return result
+            result.update(encoding="delta", since=since, count=len(indices),
+                          indices=_encode(indices), values=_encode(occupancy.reshape(-1)[indices]))
+            return result
+
+    def get_stats(self):
+        with self._lock:
+            known = np.count_nonzero(self.changed)
+            return dict(self.stats, version=self.version,
+                        explored_m2=round(float(known) * (self.cell_cm / 100.0) ** 2, 2))
@@ -0,0 +1,171 @@
+# photo_capture.py
+"""
+Non-blocking photo capture on top of the shared frame bus.
+
+A capture only copies the newest frame out of shared memory; JPEG
+encoding and the disk write happen on a small worker pool, so neither
+the HTTP request nor the video process ever waits for the SD card.
+Every photo gets an id immediately and is recorded in an append-only
+index (photo_index.jsonl) so listing photos never touches the images.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+INDEX_FILENAME = "photo_index.jsonl"
+JPEG_QUALITY = 90
+MAX_BURST = 50
+MIN_BURST_INTERVAL = 0.05  # seconds
+
+
+class PhotoCapture:
+    def __init__(self, photo_dir, read_frame, workers=2):
+        """
+        photo_dir:  where JPEGs and the index are written
+        read_frame: callable returning the newest frame_bus.Frame (copied) or None
+        """
+        self.photo_dir = photo_dir
+        self.read_frame = read_frame
+        self.index_path = os.path.join(photo_dir, INDEX_FILENAME)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo")
+        self._lock = threading.Lock()
+        self._photos = {}   # id -> record, insertion ordered (oldest first)
+        os.makedirs(photo_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a power cut
+                    self._photos[record["id"]] = record
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Capture
+    # ------------------------------------------------------------------
+    def capture(self):
+        """Grab the newest frame and queue it for encoding. Returns its record."""
+        frame = self.read_frame()
+        if frame is None:
+            return None
+        return self._submit(frame)
+
+    def burst(self, count, interval):
+        """
+        Schedule `count` captures `interval` seconds apart on a background
+        thread. Returns the photo ids right away; they show up as 'pending'
+        until written.
+        """
+        count = max(1, min(int(count), MAX_BURST))
+        interval = max(float(interval), MIN_BURST_INTERVAL)
+        now = time.time()
+        stamp = time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+
+        with self._lock:
+            # Another burst in the same millisecond (or in the index from an earlier run)
+            burst_id, n = stamp, 1
+            while f"burst_{burst_id}_00" in self._photos:
+                n += 1
+                burst_id = f"{stamp}-{n}"
+            ids = [f"burst_{burst_id}_{i:02d}" for i in range(count)]
+            for photo_id in ids:
+                self._photos[photo_id] = {"id": photo_id, "status": "pending", "burst": burst_id}
+
+        threading.Thread(target=self._run_burst, args=(ids, interval), daemon=True).start()
+        return ids
+
+    def _run_burst(self, ids, interval):
+        start = time.monotonic()
+        last_frame_id = None
+        for i, photo_id in enumerate(ids):
+            # Sleep against the burst's start time so the schedule doesn't drift
+            delay = start + i * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            frame = self.read_frame()
+            # Don't save the same camera frame twice if capture is slower than the burst
+            deadline = time.monotonic() + interval
+            while frame is not None and frame.frame_id == last_frame_id and time.monotonic() < deadline:
+                time.sleep(0.005)
+                frame = self.read_frame()
+
+            if frame is None:
+                self._finish(photo_id, {"status": "failed", "error": "No frame available"})
+                continue
+            last_frame_id = frame.frame_id
+            self._submit(frame, photo_id)
+
+    def _submit(self, frame, photo_id=None):
+        if photo_id is None:
+            stamp = time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime(frame.timestamp))
+            photo_id = f"photo_{stamp}_{frame.frame_id}"
+        record = {
+            "id": photo_id,
+            "status": "pending",
+            "frame_id": frame.frame_id,
+            "timestamp": frame.timestamp,
+            "faces": len(frame.detections),
+        }
+        with self._lock:
+            old = self._photos.get(photo_id, {})
+            if "burst" in old:
+                record["burst"] = old["burst"]
+            self._photos[photo_id] = record
+        self._pool.submit(self._encode_and_write, photo_id, frame.image)
+        return dict(record)
+
+    def _encode_and_write(self, photo_id, image):
+        filename = f"{photo_id}.jpg"
+        try:
+            ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+            if not ok:
+                raise RuntimeError("JPEG encoding failed")
+            tmp_path = os.path.join(self.photo_dir, filename + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(jpeg.tobytes())
+            os.replace(tmp_path, os.path.join(self.photo_dir, filename))
+            self._finish(photo_id, {"status": "saved", "filename": filename, "size": len(jpeg)})
+            print(f"Photo saved as {os.path.join(self.photo_dir, filename)}")
+        except Exception as e:
+            print(f"Photo {photo_id} failed: {e}")
+            self._finish(photo_id, {"status": "failed", "error": str(e)})
+
+    def _finish(self, photo_id, fields):
+        with self._lock:
+            record = self._photos.setdefault(photo_id, {"id": photo_id})
+            record.update(fields)
+            line = json.dumps(record)
+            if record["status"] == "saved":
+                with open(self.index_path, "a") as f:
+                    f.write(line + "\n")
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def list_photos(self, limit=50, offset=0):
+        """Newest first."""
+        with self._lock:
+            records = list(self._photos.values())
+        records.reverse()
+        return records[offset:offset + limit], len(records)
+
+    def get(self, photo_id):
+        with self._lock:
+            record = self._photos.get(photo_id)
+            return dict(record) if record else None
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
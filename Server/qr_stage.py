@@ -0,0 +1,244 @@
+# qr_stage.py
+"""
+QR code decoding as a pipeline stage on the shared frame buses.
+
+The scanner thread wakes on each new analysis frame (FrameBus.wait_for_frame),
+not on a half-second poll, so a code is decoded within the frame that
+shows it. CPU cost is bounded three ways:
+
+    rate    - at most one scan per MIN_SCAN_INTERVAL
+    motion  - a frame barely different from the last scanned one (fewer
+              than MOTION_PIXELS pixels of a tiny grayscale thumbnail
+              changed by PIXEL_DELTA) is skipped, but the scene is
+              re-scanned at least every IDLE_RESCAN seconds
+    size    - scans run on the analysis frame, downscaled to SCAN_WIDTH.
+              A code found there but too small to decode is retried on
+              the full-resolution crop of the same frame; a code too
+              small to be found at all is caught by a full-frame scan,
+              at most once per FULL_RES_INTERVAL
+
+A payload seen again within DEDUP_WINDOW seconds is counted, not
+reported, so a code held in front of the camera is one event.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from frame_bus import FrameBusClosed
+
+MIN_SCAN_INTERVAL = 0.1   # seconds
+PIXEL_DELTA = 25          # grey levels for a thumbnail pixel to count as changed
+MOTION_PIXELS = 6         # changed thumbnail pixels (of 64x36) that count as motion
+IDLE_RESCAN = 2.0         # seconds; a static scene is still scanned this often
+SCAN_WIDTH = 640
+FULL_RES_INTERVAL = 1.0   # seconds between full-resolution scans of a changing scene
+THUMB_SIZE = (64, 36)
+DEDUP_WINDOW = 10.0       # seconds
+MAX_EVENTS = 200          # decoded payloads kept for GET /qr
+
+
+class QRScanner:
+    def __init__(self, get_analysis_bus, get_full_bus, on_payload=None):
+        """
+        get_analysis_bus / get_full_bus: callables returning an attached
+        FrameBus or None. on_payload(event) is called on the scanner thread
+        for every new (not deduplicated) payload.
+        """
+        self.get_analysis_bus = get_analysis_bus
+        self.get_full_bus = get_full_bus
+        self.on_payload = on_payload
+        self.detector = cv2.QRCodeDetector()
+
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._next_id = 1
+        self._last_seen = {}      # payload -> last time it was decoded
+        self._thread = None
+        self._running = False
+        self._generation = 0      # a loop from an earlier start() exits once this moves on
+
+        self._last_thumb = None
+        self._last_scan = 0.0
+        self._last_full_scan = 0.0
+        self._scan_ms = deque(maxlen=200)
+        self.stats = {"frames": 0, "scanned": 0, "skipped_rate": 0, "skipped_static": 0,
+                      "full_res_retries": 0, "full_res_scans": 0, "decoded": 0, "duplicates": 0}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        with self._lock:
+            if self.running:
+                return self
+            # A loop told to stop may still be finishing its wait; it exits on
+            # the generation check instead of keeping this start() from running
+            self._generation += 1
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, args=(self._generation,),
+                                            daemon=True, name="qr-scanner")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+
+    @property
+    def running(self):
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def _current(self, generation):
+        return self._running and self._generation == generation
+
+    def _loop(self, generation):
+        last_id = -1
+        while self._current(generation):
+            bus = self.get_analysis_bus()
+            if bus is None:
+                time.sleep(0.5)
+                continue
+            try:
+                frame_id = bus.wait_for_frame(last_id, timeout=0.5)
+                if frame_id is None:
+                    continue
+                frame = bus.read(frame_id, copy=False)
+                last_id = frame_id
+                if frame is not None:
+                    self.process(frame)
+            except FrameBusClosed:
+                last_id = -1
+            except Exception as e:
+                print("QR scanner error:", e)
+
+    # ------------------------------------------------------------------
+    # Scanning
+    # ------------------------------------------------------------------
+    def _gate(self, image, now):
+        """True if this frame should be scanned (rate limit + motion gate)."""
+        if now - self._last_scan < MIN_SCAN_INTERVAL:
+            self.stats["skipped_rate"] += 1
+            return False
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        thumb = cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        if (self._last_thumb is not None and now - self._last_scan < IDLE_RESCAN
+                and np.count_nonzero(cv2.absdiff(thumb, self._last_thumb) > PIXEL_DELTA) < MOTION_PIXELS):
+            self.stats["skipped_static"] += 1
+            return False
+        self._last_thumb = thumb
+        self._last_scan = now
+        return True
+
+    def _read_full(self, frame_id):
+        bus = self.get_full_bus()
+        if bus is None:
+            return None
+        return bus.read(frame_id)
+
+    def _scan_full(self, frame_id, analysis_shape):
+        """Scan the whole full-resolution frame. Returns (text, points in analysis coordinates)."""
+        full = self._read_full(frame_id)
+        if full is None:
+            return "", None
+        text, points, _ = self.detector.detectAndDecode(full.image)
+        if not text or points is None:
+            return "", None
+        scale = np.array([analysis_shape[1] / full.image.shape[1], analysis_shape[0] / full.image.shape[0]])
+        return text, points.reshape(-1, 2) * scale
+
+    def _decode_full(self, frame_id, points, analysis_shape):
+        """Decode the full-resolution crop around `points` (analysis coordinates)."""
+        full = self._read_full(frame_id)
+        if full is None:
+            return ""
+        sx = full.image.shape[1] / analysis_shape[1]
+        sy = full.image.shape[0] / analysis_shape[0]
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0)
+        pad = 0.2 * max(x1 - x0, y1 - y0)
+        left, top = max(0, int((x0 - pad) * sx)), max(0, int((y0 - pad) * sy))
+        right, bottom = int((x1 + pad) * sx), int((y1 + pad) * sy)
+        text, _, _ = self.detector.detectAndDecode(full.image[top:bottom, left:right])
+        return text
+
+    def process(self, frame, now=None):
+        """Scan one frame_bus.Frame (if the gates allow). Returns the new event or None."""
+        now = time.time() if now is None else now
+        self.stats["frames"] += 1
+        image = frame.image
+        if not self._gate(image, now):
+            return None
+
+        start = time.perf_counter()
+        scan = image
+        scale = 1.0
+        if image.shape[1] > SCAN_WIDTH:
+            scale = SCAN_WIDTH / image.shape[1]
+            scan = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        text, points, _ = self.detector.detectAndDecode(scan)
+        if points is not None:
+            points = points.reshape(-1, 2) / scale
+            if not text:
+                self.stats["full_res_retries"] += 1
+                text = self._decode_full(frame.frame_id, points, image.shape)
+        elif now - self._last_full_scan >= FULL_RES_INTERVAL:
+            self._last_full_scan = now
+            self.stats["full_res_scans"] += 1
+            text, points = self._scan_full(frame.frame_id, image.shape)
+        self.stats["scanned"] += 1
+        self._scan_ms.append((time.perf_counter() - start) * 1000.0)
+
+        if not text:
+            return None
+        return self._report(text, points, frame, now)
+
+    def _report(self, text, points, frame, now):
+        with self._lock:
+            last = self._last_seen.get(text)
+            self._last_seen[text] = now
+            if last is not None and now - last < DEDUP_WINDOW:
+                self.stats["duplicates"] += 1
+                return None
+            self.stats["decoded"] += 1
+            event = {
+                "id": self._next_id,
+                "payload": text,
+                "timestamp": frame.timestamp,
+                "latency_ms": round((now - frame.timestamp) * 1000.0, 1),
+                "frame_id": frame.frame_id,
+                "points": [] if points is None else
+                          [[round(float(x), 1), round(float(y), 1)] for x, y in points],
+            }
+            self._next_id += 1
+            self._events.append(event)
+            # Forget payloads outside the window so the table stays small
+            if len(self._last_seen) > MAX_EVENTS:
+                self._last_seen = {p: t for p, t in self._last_seen.items()
+                                   if now - t < DEDUP_WINDOW}
+
+        if self.on_payload is not None:
+            try:
+                self.on_payload(event)
+            except Exception as e:
+                print("QR payload handler error:", e)
+        return event
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def events(self, since=0):
+        """Decoded payloads with id > since, oldest first."""
+        with self._lock:
+            return [event for event in self._events if event["id"] > since]
+
+    def get_stats(self):
+        with self._lock:
+            scan_ms = np.array(self._scan_ms) if self._scan_ms else None
+            stats = dict(self.stats, running=self.running)
+        if scan_ms is not None:
+            stats["scan_ms_mean"] = round(float(scan_ms.mean()), 2)
+            stats["scan_ms_p95"] = round(float(np.percentile(scan_ms, 95)), 2)
+        return stats
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Background archiver: moves finished recordings and their sidecars off
+the SD card to a mounted directory or an HTTP target (archive_receiver.py).
+
+server.py runs it as its own process. At startup the process drops itself
+to idle I/O class (ionice -c 3) and low CPU priority. It also pauses
+between chunks while video_stream.py is recording, so it never competes
+with the recorder. Reads are limited by a token bucket (--rate) and are
+dropped from the page cache after sending.
+
+A recording is finished once <name>.mp4 exists, <name>_temp.mp4 is gone
+(ffmpeg is done), it is not the recording in progress, and none of its
+files changed for SETTLE seconds. For each of its files:
+
+    1. ask the target how much it already has (resume from there)
+    2. send the rest in CHUNK-sized appends, hashing the whole file
+    3. commit: the target hashes what it stored and must report the
+       same SHA-256 and size
+
+Local files are deleted only after every file of the recording has been
+confirmed. The target's state is the only state, so a crash at any
+point resumes or re-verifies on the next pass. With --keep, a
+<name>.archived marker records the size and mtime of each confirmed
+file. Later scans skip the recording without reading it, as long as
+the marker still matches and the target still has every file complete
+at that size.
+
+    python3 recording_archiver.py --target /mnt/backup/recordings --rate 2000
+    python3 recording_archiver.py --target http://nas.local:5200 --keep --once
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import requests
+
+from frame_pacing import read_stats as read_record_stats, write_stats
+
+ARCHIVE_STATS_PATH = "/tmp/spyrobot_archive_stats.json"
+
+CHUNK = 256 * 1024
+DEFAULT_RATE = 2000          # KB/s while the recorder is idle
+SETTLE = 30.0                # seconds a recording must be unchanged before it is archived
+SCAN_INTERVAL = 30.0
+RETRY_DELAY = (10.0, 300.0)  # first and longest wait after a failed pass
+RECORDING_STALE = 10.0       # seconds; older "active" recorder stats mean it died
+ARCHIVER_NICE = 15
+HTTP_TIMEOUT = (5, 60)
+MARKER_SUFFIX = ".archived"  # <name>.archived next to a recording kept after archiving
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class TokenBucket:
+    """Byte-rate limiter: consume(n) sleeps until n bytes fit under `rate`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate                       # bytes per second; 0 = unlimited
+        self.burst = burst or max(rate, CHUNK)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# ----------------------------------------------------------------------
+# Targets: status() / append() / commit() with the same meaning for both
+# ----------------------------------------------------------------------
+def file_sha256(path, chunk=CHUNK):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DirectoryTarget:
+    """A mounted directory (USB stick, NFS/SMB share): <root>/<recording>/<file>."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def describe(self):
+        return self.root
+
+    def _paths(self, recording, filename):
+        final = os.path.join(self.root, recording, filename)
+        return final, final + ".part", final + ".sha256"
+
+    def status(self, recording, filename):
+        """{"size": bytes stored, "complete": bool, "sha256": of the complete copy or None}"""
+        final, part, checksum = self._paths(recording, filename)
+        if os.path.exists(final) and os.path.exists(checksum):
+            with open(checksum, "r") as f:
+                return {"size": os.path.getsize(final), "complete": True, "sha256": f.read().strip()}
+        size = os.path.getsize(part) if os.path.exists(part) else 0
+        return {"size": size, "complete": False, "sha256": None}
+
+    def append(self, recording, filename, offset, data):
+        final, part, checksum = self._paths(recording, filename)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        if offset == 0:
+            for stale in (final, checksum):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        with open(part, "r+b" if offset else "wb") as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+        return offset + len(data)
+
+    def commit(self, recording, filename, size, sha256):
+        """Verify the stored part against (size, sha256) and make it final. Returns the status."""
+        final, part, checksum = self._paths(recording, filename)
+        current = self.status(recording, filename)
+        if current["complete"]:
+            if current["sha256"] != sha256:
+                raise ChecksumMismatch(f"{recording}/{filename}: stored copy differs")
+            return current
+        with open(part, "rb") as f:
+            os.fsync(f.fileno())
+        actual = file_sha256(part)
+        if actual != sha256 or os.path.getsize(part) != size:
+            os.remove(part)
+            raise ChecksumMismatch(f"{recording}/{filename}: stored {actual}, sent {sha256}")
+        os.replace(part, final)
+        tmp_checksum = checksum + ".tmp"
+        with open(tmp_checksum, "w") as f:
+            f.write(actual)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_checksum, checksum)
+        return {"size": size, "complete": True, "sha256": actual}
+
+
+class HttpTarget:
+    """archive_receiver.py (or anything speaking its three requests)."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+
+    def describe(self):
+        return self.url
+
+    def _file_url(self, recording, filename):
+        return f"{self.url}/files/{recording}/{filename}"
+
+    def status(self, recording, filename):
+        response = self.session.get(self._file_url(recording, filename), timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def append(self, recording, filename, offset, data):
+        response = self.session.put(self._file_url(recording, filename), params={"offset": offset},
+                                    data=data, timeout=HTTP_TIMEOUT)
+        if response.status_code == 409:
+            raise RuntimeError(f"{recording}/{filename}: receiver has {response.json().get('size')} "
+                               f"bytes, not {offset}")
+        response.raise_for_status()
+        return response.json()["size"]
+
+    def commit(self, recording, filename, size, sha256):
+        response = self.session.post(self._file_url(recording, filename) + "/commit",
+                                     json={"size": size, "sha256": sha256}, timeout=HTTP_TIMEOUT)
+        if response.status_code == 409:
+            raise ChecksumMismatch(f"{recording}/{filename}: {response.json().get('error')}")
+        response.raise_for_status()
+        return response.json()
+
+
+def make_target(spec):
+    """http(s)://... -> HttpTarget, anything else is a directory."""
+    if spec.startswith(("http://", "https://")):
+        return HttpTarget(spec)
+    return DirectoryTarget(os.path.expanduser(spec))
+
+
+# ----------------------------------------------------------------------
+# Archiver
+# ----------------------------------------------------------------------
+def recorder_active(now=None):
+    """True while video_stream.py reports a recording in progress."""
+    stats = read_record_stats()
+    now = time.time() if now is None else now
+    return bool(stats and stats.get("active") and now - stats.get("updated", 0) < RECORDING_STALE)
+
+
+def set_background_priority():
+    """Lowest I/O class (if ionice is available) and a high nice value for this process."""
+    if shutil.which("ionice"):
+        subprocess.run(["ionice", "-c", "3", "-p", str(os.getpid())], check=False)
+    try:
+        os.nice(ARCHIVER_NICE)
+    except OSError:
+        pass
+
+
+class RecordingArchiver:
+    def __init__(self, video_dir, target, rate_kbps=DEFAULT_RATE, delete=True, settle=SETTLE,
+                 is_recording=recorder_active, stats_path=ARCHIVE_STATS_PATH):
+        self.video_dir = video_dir
+        self.target = target
+        self.bucket = TokenBucket(rate_kbps * 1024)
+        self.delete = delete
+        self.settle = settle
+        self.is_recording = is_recording
+        self.stats_path = stats_path
+        self._last_stats = 0.0
+        self.stats = {"target": target.describe(), "rate_kbps": rate_kbps, "delete": delete,
+                      "state": "idle", "current": None, "archived": 0, "files": 0, "bytes_sent": 0,
+                      "bytes_resumed": 0, "bytes_freed": 0, "paused_s": 0.0, "throttled_s": 0.0,
+                      "failures": 0, "last_error": None, "pending": 0}
+
+    # -- discovery -----------------------------------------------------
+    def files_of(self, name):
+        """The recording's files: <name>.mp4 and every <name>_* sidecar."""
+        files = []
+        for entry in os.listdir(self.video_dir):
+            if entry == name + ".mp4" or (entry.startswith(name + "_")
+                                         and not entry.endswith((".tmp", "_temp.mp4"))):
+                if os.path.isfile(os.path.join(self.video_dir, entry)):
+                    files.append(entry)
+        return sorted(files, key=lambda entry: entry != name + ".mp4")   # video first
+
+    def finished_recordings(self, now=None):
+        now = time.time() if now is None else now
+        current = read_record_stats() or {}
+        current = current.get("recording") if current.get("active") else None
+        names = []
+        for entry in sorted(os.listdir(self.video_dir)):
+            if not entry.endswith(".mp4") or entry.endswith("_temp.mp4"):
+                continue
+            name = entry[:-len(".mp4")]
+            if name == current or os.path.exists(os.path.join(self.video_dir, name + "_temp.mp4")):
+                continue
+            newest = max(os.path.getmtime(os.path.join(self.video_dir, f)) for f in self.files_of(name))
+            if now - newest >= self.settle:
+                names.append(name)
+        return names
+
+    # -- kept recordings -----------------------------------------------
+    def _marker_path(self, name):
+        return os.path.join(self.video_dir, name + MARKER_SUFFIX)
+
+    def _signature(self, files):
+        """{filename: [size, mtime_ns]} of the recording's local files."""
+        signature = {}
+        for filename in files:
+            st = os.stat(os.path.join(self.video_dir, filename))
+            signature[filename] = [st.st_size, st.st_mtime_ns]
+        return signature
+
+    def already_archived(self, name):
+        """
+        True if the marker from an earlier pass still matches the local files
+        and the target reports each of them complete at that size.
+        """
+        try:
+            with open(self._marker_path(name), "r") as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if marker != self._signature(self.files_of(name)):
+            return False
+        for filename, (size, _) in marker.items():
+            status = self.target.status(name, filename)
+            if not status["complete"] or status["size"] != size:
+                return False
+        return True
+
+    def _write_marker(self, name, signature):
+        path = self._marker_path(name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(signature, f)
+        os.replace(path + ".tmp", path)
+
+    # -- transfer ------------------------------------------------------
+    def _wait_for_recorder(self):
+        if not self.is_recording():
+            return
+        started = time.monotonic()
+        self.stats["state"] = "paused (recording)"
+        self._publish(force=True)
+        while self.is_recording():
+            time.sleep(1.0)
+        self.stats["paused_s"] += round(time.monotonic() - started, 1)
+        self.stats["state"] = "transferring"
+
+    def transfer_file(self, name, filename):
+        """Send (or resume) one file and have the target confirm it. Returns its SHA-256."""
+        path = os.path.join(self.video_dir, filename)
+        before = os.stat(path)
+        size = before.st_size
+        status = self.target.status(name, filename)
+        offset = status["size"] if not status["complete"] and status["size"] <= size else 0
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            fd = f.fileno()
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            position = 0
+            while True:
+                self._wait_for_recorder()
+                block = f.read(CHUNK)
+                if not block:
+                    break
+                # Every byte read from the SD card counts, resumed prefix included
+                self.stats["throttled_s"] = round(self.stats["throttled_s"] + self.bucket.consume(len(block)), 2)
+                digest.update(block)
+                if status["complete"]:
+                    pass   # only re-hashing to check the stored copy
+                elif position + len(block) > offset:
+                    skip = max(offset - position, 0)
+                    self.target.append(name, filename, position + skip, block[skip:])
+                    self.stats["bytes_sent"] += len(block) - skip
+                position += len(block)
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(fd, 0, position, os.POSIX_FADV_DONTNEED)
+                self._publish()
+        if size == 0 and not status["complete"]:
+            self.target.append(name, filename, 0, b"")
+        self.stats["bytes_resumed"] += offset
+
+        after = os.stat(path)
+        if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+            raise RuntimeError(f"{filename} changed while it was being archived")
+        sha256 = digest.hexdigest()
+        if status["complete"] and status["sha256"] != sha256:
+            # An older copy with different contents: send it again from the start
+            self.target.append(name, filename, 0, b"")
+            return self.transfer_file(name, filename)
+        confirmed = self.target.commit(name, filename, size, sha256)
+        if confirmed.get("sha256") != sha256 or confirmed.get("size") != size:
+            raise ChecksumMismatch(f"{filename}: target confirmed {confirmed}")
+        return sha256
+
+    def archive(self, name):
+        """Archive one recording; deletes it locally once every file is confirmed."""
+        self.stats["current"] = name
+        self.stats["state"] = "transferring"
+        files = self.files_of(name)
+        for filename in files:
+            self.transfer_file(name, filename)
+            self.stats["files"] += 1
+        if self.delete:
+            for filename in files:
+                path = os.path.join(self.video_dir, filename)
+                self.stats["bytes_freed"] += os.path.getsize(path)
+                os.remove(path)
+            if os.path.exists(self._marker_path(name)):
+                os.remove(self._marker_path(name))
+        else:
+            # transfer_file made sure nothing changed while it was being sent
+            self._write_marker(name, self._signature(files))
+        self.stats["archived"] += 1
+        self.stats["current"] = None
+        print(f"Archived {name} ({len(files)} files) to {self.target.describe()}")
+
+    def run_once(self):
+        """Archive every finished recording. Returns the number archived."""
+        names = self.finished_recordings()
+        if not self.delete:
+            names = [name for name in names if not self.already_archived(name)]
+        self.stats["pending"] = len(names)
+        done = 0
+        for name in names:
+            self.archive(name)
+            done += 1
+            self.stats["pending"] = len(names) - done
+        self.stats["state"] = "idle"
+        self._publish(force=True)
+        return done
+
+    def run(self):
+        delay = RETRY_DELAY[0]
+        while True:
+            try:
+                self.run_once()
+                delay = RETRY_DELAY[0]
+                time.sleep(SCAN_INTERVAL)
+            except Exception as e:
+                self.stats["failures"] += 1
+                self.stats["last_error"] = str(e)
+                self.stats["state"] = f"retrying in {delay:.0f}s"
+                self._publish(force=True)
+                print("Archiver error:", e)
+                time.sleep(delay)
+                delay = min(delay * 2, RETRY_DELAY[1])
+
+    def _publish(self, force=False):
+        if self.stats_path and (force or time.monotonic() - self._last_stats >= 1.0):
+            self._last_stats = time.monotonic()
+            write_stats(self.stats, self.stats_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move finished recordings to archive storage")
+    parser.add_argument("--target", required=True, help="directory, or http://host:port of archive_receiver.py")
+    parser.add_argument("--source", help="recordings directory (default: ~/Videos of the login user)")
+    parser.add_argument("--rate", type=int, default=DEFAULT_RATE, help="KB/s, 0 = unlimited")
+    parser.add_argument("--settle", type=float, default=SETTLE,
+                        help="seconds a recording must be unchanged before it is archived")
+    parser.add_argument("--keep", action="store_true", help="keep local copies after confirmation")
+    parser.add_argument("--once", action="store_true", help="one pass, then exit")
+    args = parser.parse_args()
+
+    set_background_priority()
+    source = args.source or f"/home/{os.getlogin()}/Videos/"
+    archiver = RecordingArchiver(source, make_target(args.target), args.rate,
+                                 delete=not args.keep, settle=args.settle)
+    if args.once:
+        print(f"Archived {archiver.run_once()} recordings")
+    else:
+        archiver.run()
+
+
+if __name__ == "__main__":
+    main()
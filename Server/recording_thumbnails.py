@@ -0,0 +1,169 @@
+# recording_thumbnails.py
+"""
+Poster frames and scrubbing sprites for recordings.
+
+The recorder already has every frame in memory, so while it records it
+also keeps a small tile every TILE_INTERVAL seconds. Tiles are packed
+into sprite sheets (SHEET_COLUMNS x SHEET_ROWS) that are JPEG-encoded on
+a background thread as each sheet fills up. Files written next to the
+recording <name>.mp4:
+
+    <name>_poster.jpg        one full-width frame from early in the clip
+    <name>_sprite_000.jpg    sprite sheets, tiles in row-major order
+    <name>_thumbs.json       manifest (tile size, interval, sheet list)
+
+The server serves these through FileCache, so browsing and scrubbing
+recordings costs a few kilobytes instead of the whole MP4.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+TILE_INTERVAL = 2.0    # seconds between tiles
+TILE_WIDTH = 160
+SHEET_COLUMNS = 10
+SHEET_ROWS = 10
+POSTER_DELAY = 1.0     # skip the first second (exposure is still settling)
+POSTER_WIDTH = 640
+JPEG_QUALITY = 70
+
+# One shared writer thread: encoding a sheet must never stall a recorder
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbs")
+
+
+def sidecar_paths(video_dir, name):
+    base = os.path.join(video_dir, name)
+    return {
+        "poster": base + "_poster.jpg",
+        "manifest": base + "_thumbs.json",
+        "sheet": base + "_sprite_{:03d}.jpg",
+    }
+
+
+def _write_jpeg(path, image, quality=JPEG_QUALITY):
+    ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        print("Thumbnail encoding failed:", path)
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(jpeg.tobytes())
+    os.replace(tmp_path, path)
+
+
+class ThumbnailRecorder:
+    def __init__(self, video_dir, name, tile_interval=TILE_INTERVAL):
+        self.paths = sidecar_paths(video_dir, name)
+        self.name = name
+        self.tile_interval = tile_interval
+        self.tile_size = None          # (w, h), fixed by the first frame
+        self.sheet = None
+        self.sheets = []               # filenames of written sheets
+        self.count = 0                 # tiles taken so far
+        self.poster = None
+        self._next_tile = 0.0
+        self._pending = []
+
+    def add(self, frame, t):
+        """Offer a frame captured `t` seconds into the recording (cheap when not used)."""
+        if self.poster is None and t >= POSTER_DELAY:
+            scale = min(1.0, POSTER_WIDTH / frame.shape[1])
+            poster = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            self.poster = os.path.basename(self.paths["poster"])
+            self._pending.append(_writer.submit(_write_jpeg, self.paths["poster"], poster, 85))
+
+        if t < self._next_tile:
+            return
+        self._next_tile += self.tile_interval
+        # Catch up if frames stalled for longer than one interval
+        if self._next_tile <= t:
+            self._next_tile = t + self.tile_interval
+
+        if self.tile_size is None:
+            h, w = frame.shape[:2]
+            self.tile_size = (TILE_WIDTH, max(1, round(h * TILE_WIDTH / w)))
+        tw, th = self.tile_size
+        tile = cv2.resize(frame, (tw, th), interpolation=cv2.INTER_AREA)
+
+        index = self.count % (SHEET_COLUMNS * SHEET_ROWS)
+        if index == 0:
+            self.sheet = np.zeros((th * SHEET_ROWS, tw * SHEET_COLUMNS, 3), np.uint8)
+        row, col = divmod(index, SHEET_COLUMNS)
+        self.sheet[row * th:(row + 1) * th, col * tw:(col + 1) * tw] = tile
+        self.count += 1
+
+        if index == SHEET_COLUMNS * SHEET_ROWS - 1:
+            self._flush_sheet()
+
+    def _flush_sheet(self):
+        if self.sheet is None:
+            return
+        used = self.count - len(self.sheets) * SHEET_COLUMNS * SHEET_ROWS
+        rows = -(-used // SHEET_COLUMNS)
+        sheet = self.sheet[:rows * self.tile_size[1]]
+        path = self.paths["sheet"].format(len(self.sheets))
+        self.sheets.append(os.path.basename(path))
+        self.sheet = None
+        self._pending.append(_writer.submit(_write_jpeg, path, sheet))
+
+    def finish(self, duration=None):
+        """Write the last partial sheet and the manifest. Returns the manifest."""
+        self._flush_sheet()
+        for future in self._pending:
+            future.result()
+        manifest = {
+            "name": self.name,
+            "poster": self.poster,
+            "interval": self.tile_interval,
+            "tile_width": self.tile_size[0] if self.tile_size else TILE_WIDTH,
+            "tile_height": self.tile_size[1] if self.tile_size else 0,
+            "columns": SHEET_COLUMNS,
+            "rows": SHEET_ROWS,
+            "count": self.count,
+            "sheets": self.sheets,
+            "duration": duration,
+        }
+        with open(self.paths["manifest"], "w") as f:
+            json.dump(manifest, f)
+        return manifest
+
+
+class FileCache:
+    """Small in-memory LRU of file contents, invalidated by mtime/size."""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # path -> (stat key, bytes)
+        self._size = 0
+
+    def get(self, path):
+        """Returns (data, etag) or raises FileNotFoundError."""
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(path)
+                return entry[1], etag
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._size -= len(old[1])
+            if len(data) <= self.max_bytes:
+                self._entries[path] = (key, data)
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return data, etag
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Replay a mission trace (mission_trace.py) without the robot.
+
+Ultrasonic samples go through ObstacleLogic exactly as obstacle_monitor
+feeds them. Frame detections go through FacePresenceLogic as the
+detection callback in video_stream.py does. Every resulting log line is
+submitted to a LogSink writing a scratch file, which is the same batched
+path the robot uses. Only the trace's own timestamps are used, so the
+decisions are deterministic whatever the replay speed.
+
+    python3 replay_mission.py ~/Traces/2024-05-01-14.02.11.sptrace            # as fast as possible
+    python3 replay_mission.py mission.sptrace --speed 1                       # real time
+    python3 replay_mission.py mission.sptrace --output baseline.json
+    python3 replay_mission.py mission.sptrace --compare baseline.json         # exit 1 if behaviour changed
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from log_sink import LogSink
+from mission_logic import FacePresenceLogic, ObstacleLogic
+from mission_trace import DISTANCE, FRAME, KIND_NAMES, MOVEMENT, read_trace, trace_header
+
+STAGES = ("obstacle", "faces", "log")
+
+
+def replay(path, speed=0.0, log_path=None):
+    """
+    Feed the trace at `path` through the mission logic. speed: 1.0 = real
+    time, 10 = ten times faster, 0 = as fast as possible.
+    Returns a result dict (decisions, input counts, timings).
+    """
+    records = list(read_trace(path))
+    scratch = tempfile.TemporaryDirectory(prefix="spyrobot-replay-")
+    if log_path is None:
+        log_path = os.path.join(scratch.name, "spy_logs.json")
+    sink = LogSink(log_path, socket_path=os.path.join(scratch.name, "log.sock"))
+    sink.start()
+
+    obstacle = ObstacleLogic()
+    faces = FacePresenceLogic()
+    decisions = []
+    counts = {name: 0 for name in KIND_NAMES.values()}
+    timings = {stage: [] for stage in STAGES}
+    dead_at = None
+    t0 = records[0].timestamp if records else 0.0
+
+    def log(source, t, message, severity):
+        decisions.append({"t": round(t - t0, 3), "source": source,
+                          "message": message, "severity": severity})
+        start = time.perf_counter()
+        sink.submit({
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)),
+            "description": message,
+            "type": "auto",
+            "severity": severity,
+        })
+        timings["log"].append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    for record in records:
+        if speed > 0:
+            delay = wall_start + (record.timestamp - t0) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        counts[KIND_NAMES[record.kind]] += 1
+
+        if record.kind == DISTANCE:
+            if dead_at is not None:
+                continue   # obstacle_monitor stops after the dead-stop
+            start = time.perf_counter()
+            logs, dead = obstacle.update(record.data, record.timestamp)
+            timings["obstacle"].append(time.perf_counter() - start)
+            for message, severity in logs:
+                log("obstacle", record.timestamp, message, severity)
+            if dead:
+                dead_at = record.timestamp
+                decisions.append({"t": round(record.timestamp - t0, 3), "source": "obstacle",
+                                  "message": "dead-stop", "severity": "critical"})
+        elif record.kind == FRAME:
+            _, detections = record.data
+            start = time.perf_counter()
+            logs = faces.update(detections, record.timestamp)
+            timings["faces"].append(time.perf_counter() - start)
+            for message, severity in logs:
+                log("faces", record.timestamp, message, severity)
+        elif record.kind == MOVEMENT:
+            pass   # inputs only; movement has no decision logic of its own yet
+    wall = time.perf_counter() - wall_start
+
+    sink.stop()
+    sink_stats = dict(sink.stats)
+    scratch.cleanup()
+
+    mission = (records[-1].timestamp - t0) if records else 0.0
+    return {
+        "trace": os.path.basename(path),
+        "started": trace_header(path)["started"],
+        "records": counts,
+        "mission_seconds": round(mission, 3),
+        "wall_seconds": round(wall, 4),
+        "speedup": round(mission / wall, 1) if wall > 0 else None,
+        "records_per_second": round(len(records) / wall) if wall > 0 else None,
+        "dead_stop": None if dead_at is None else round(dead_at - t0, 3),
+        "timings_us": {stage: summarize(values) for stage, values in timings.items()},
+        "log_sink": sink_stats,
+        "decisions": decisions,
+    }
+
+
+def summarize(seconds):
+    if not seconds:
+        return None
+    us = np.array(seconds) * 1e6
+    return {"mean": round(float(us.mean()), 2), "p95": round(float(np.percentile(us, 95)), 2),
+            "max": round(float(us.max()), 2), "count": len(us)}
+
+
+def compare(result, baseline):
+    """Prints differences; returns True if the decisions are identical."""
+    ours, theirs = result["decisions"], baseline["decisions"]
+    key = lambda d: (d["t"], d["source"], d["message"], d["severity"])
+    same = [key(d) for d in ours] == [key(d) for d in theirs]
+    if same:
+        print(f"[OK] {len(ours)} decisions identical to the baseline")
+    else:
+        print(f"[DIFF] {len(ours)} decisions vs {len(theirs)} in the baseline")
+        for i, (a, b) in enumerate(zip(ours, theirs)):
+            if key(a) != key(b):
+                print(f"  first difference at #{i}:\n    now:      {a}\n    baseline: {b}")
+                break
+        else:
+            extra = ours[len(theirs):] or theirs[len(ours):]
+            print(f"  first extra decision: {extra[0]}")
+
+    print(f"{'stage':<10} {'mean us':>9} {'base us':>9} {'change':>8}")
+    for stage in STAGES:
+        now, base = result["timings_us"].get(stage), baseline["timings_us"].get(stage)
+        if not now or not base:
+            continue
+        change = (now["mean"] / base["mean"] - 1.0) * 100.0 if base["mean"] else 0.0
+        print(f"{stage:<10} {now['mean']:9.2f} {base['mean']:9.2f} {change:+7.0f}%")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a mission trace through the mission logic")
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="1 = real time, 10 = 10x, 0 = as fast as possible (default)")
+    parser.add_argument("--log-path", help="keep the replayed spy_logs.json here")
+    parser.add_argument("--output", help="write the result (decisions + timings) as JSON")
+    parser.add_argument("--compare", help="result JSON of an earlier replay to check against")
+    args = parser.parse_args()
+
+    result = replay(args.trace, args.speed, args.log_path)
+    counts = ", ".join(f"{n} {name}" for name, n in result["records"].items())
+    print(f"[INFO] {result['trace']}: {counts}")
+    print(f"[INFO] {result['mission_seconds']}s of mission replayed in {result['wall_seconds']}s "
+          f"({result['speedup']}x, {result['records_per_second']} records/s)")
+    print(f"[INFO] {len(result['decisions'])} decisions, dead-stop at "
+          f"{result['dead_stop'] if result['dead_stop'] is not None else 'never'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[INFO] Result written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if not compare(result, baseline):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# search_index.py
+"""
+In-memory inverted index over log and event descriptions.
+
+Built once from spy_logs.json / events.json at startup and then kept
+current one document at a time (append_log listener and POST /events),
+so /search never re-reads or re-parses the JSON files.
+Ranking is BM25 over description tokens; the last query term also
+matches as a prefix so search-as-you-type works.
+"""
+import bisect
+import math
+import re
+import threading
+
+TOKEN_RE = re.compile(r"\w+")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MAX_PAGE_SIZE = 200
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def _normalize_bound(value, end_of_day):
+    """Allow date-only bounds ('2025-04-15') against 'YYYY-MM-DD HH:MM:SS' timestamps."""
+    if not value:
+        return None
+    value = value.strip().replace("T", " ")
+    if len(value) == 10:
+        value += " 23:59:59" if end_of_day else " 00:00:00"
+    return value
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}   # token -> {doc_key: term frequency}
+        self._vocab = []      # sorted tokens, for prefix lookups
+        self._docs = {}       # doc_key -> stored fields
+        self._total_len = 0
+
+    def add(self, kind, doc):
+        """Index one log entry (kind='log') or event (kind='event')."""
+        key = f"{kind}:{doc.get('id')}"
+        tokens = tokenize(doc.get("description", ""))
+        stored = {
+            "kind": kind,
+            "id": doc.get("id"),
+            "timestamp": doc.get("timestamp", ""),
+            "description": doc.get("description", ""),
+            "type": doc.get("type"),
+            "severity": doc.get("severity", "info"),
+            "length": len(tokens),
+        }
+        with self._lock:
+            if key in self._docs:
+                self._remove_locked(key)
+            self._docs[key] = stored
+            self._total_len += len(tokens)
+            for token in tokens:
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._vocab, token)
+                postings[key] = postings.get(key, 0) + 1
+
+    def add_many(self, kind, docs):
+        for doc in docs:
+            self.add(kind, doc)
+
+    def _remove_locked(self, key):
+        old = self._docs.pop(key)
+        self._total_len -= old["length"]
+        for token in set(tokenize(old["description"])):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(key, None)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _expand_prefix(self, prefix):
+        start = bisect.bisect_left(self._vocab, prefix)
+        end = bisect.bisect_left(self._vocab, prefix + "\uffff")
+        return self._vocab[start:end]
+
+    def search(self, query="", severity=None, kind=None, date_from=None, date_to=None,
+               page=1, page_size=20):
+        """
+        Returns {"total", "page", "page_size", "hits"}. Every query term must
+        match (AND). Hits are ordered by score, then newest first.
+        """
+        page = max(1, int(page))
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        date_from = _normalize_bound(date_from, end_of_day=False)
+        date_to = _normalize_bound(date_to, end_of_day=True)
+        severities = set(severity.split(",")) if severity else None
+        terms = tokenize(query)
+
+        with self._lock:
+            n_docs = len(self._docs) or 1
+            avg_len = (self._total_len / n_docs) or 1.0
+
+            if terms:
+                scores = None
+                for i, term in enumerate(terms):
+                    # The last term is matched as a prefix as well
+                    variants = self._expand_prefix(term) if i == len(terms) - 1 else [term]
+                    term_scores = {}
+                    for variant in variants:
+                        postings = self._postings.get(variant, {})
+                        if not postings:
+                            continue
+                        idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                        for key, tf in postings.items():
+                            length = self._docs[key]["length"]
+                            norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_len))
+                            term_scores[key] = term_scores.get(key, 0.0) + idf * norm
+                    if scores is None:
+                        scores = term_scores
+                    else:
+                        scores = {k: s + term_scores[k] for k, s in scores.items() if k in term_scores}
+                    if not scores:
+                        break
+                candidates = scores or {}
+            else:
+                candidates = dict.fromkeys(self._docs, 0.0)
+
+            hits = []
+            for key, score in candidates.items():
+                doc = self._docs[key]
+                if severities and doc["severity"] not in severities:
+                    continue
+                if kind and doc["kind"] != kind:
+                    continue
+                if date_from and doc["timestamp"] < date_from:
+                    continue
+                if date_to and doc["timestamp"] > date_to:
+                    continue
+                hits.append((score, doc["timestamp"], key))
+
+            hits.sort(key=lambda h: (h[0], h[1]), reverse=True)
+            start = (page - 1) * page_size
+            results = []
+            for score, _, key in hits[start:start + page_size]:
+                doc = dict(self._docs[key])
+                del doc["length"]
+                doc["score"] = round(score, 4)
+                results.append(doc)
+        return {"total": len(hits), "page": page, "page_size": page_size, "hits": results}
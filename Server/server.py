@@ -1,23 +1,51 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import threading
 import time
-import random
 import os
 import subprocess
 from picrawler import Picrawler
-from robot_hat import Music, Ultrasonic, Pin, TTS
+from robot_hat import Music, Ultrasonic, Pin
 from os import getlogin
 import json
+import re
 
 # NEW: import our logging function
-from logger import append_log, LOG_FILE_PATH
+from logger import append_log, add_log_listener, load_logs, start_log_sink, LOG_FILE_PATH
+from frame_bus import FrameBus, FrameBusClosed, DET_FIELDS
+from photo_capture import PhotoCapture
+from mjpeg_stream import StreamHub, BOUNDARY, TIER_NAMES
+from movement_sequencer import MovementSequencer, SequenceBusy, parse_steps
+from audio_service import AudioService
+from search_index import SearchIndex
+from timeline_aggregates import TimelineAggregates, parse_timestamp
+from recording_thumbnails import FileCache, sidecar_paths
+from detection_timeline import SightingIndex, sidecar_path as detections_path
+from frame_pacing import read_stats as read_record_stats
+from mission_logic import ObstacleLogic
+from mission_trace import TraceWriter
+from detection_pool import STATS_PATH as DETECTION_STATS_PATH
+from qr_stage import QRScanner
+from color_lut import ColorDetector, COLOR_NAMES
+from follow_controller import FollowController
+from governor import Governor, SafetyLoopTimer, LEVEL_NAMES, write_quality_level
+from occupancy_map import OccupancyMap
+from recording_archiver import ARCHIVE_STATS_PATH, DEFAULT_RATE as ARCHIVE_DEFAULT_RATE
+from capture_profiles import (PROFILES, DEFAULT_PROFILE, FULL_BUS_NAME, ANALYSIS_BUS_NAME,
+                              profile_info, read_requested_profile, write_requested_profile)
 
 app = Flask(__name__)
 CORS(app)
 
-video_process = subprocess.Popen(["python3", "video_stream.py"])
+# This process owns spy_logs.json; start the sink before video_stream.py begins logging
+log_sink = start_log_sink()
+
+# Video (camera, detection, recording) runs at a lower priority than this
+# process, so obstacle_monitor keeps its timing when the CPU is saturated
+VIDEO_NICE = 5
+video_process = subprocess.Popen(["python3", "video_stream.py"],
+                                 preexec_fn=lambda: os.nice(VIDEO_NICE))
 time.sleep(30)
 
 # Create a Picrawler instance for movement control
@@ -30,13 +58,54 @@ VIDEO_PATH = f"/home/{USERNAME}/Videos/"
 AVI_PATH = os.path.join(VIDEO_PATH, "avi/")
 
 # Initialize additional modules
-tts = TTS()
 music = Music()
 ultrasonic = Ultrasonic(Pin("D2"), Pin("D3"))
 
+# All sound/TTS playback happens on the audio worker, never on the caller's thread
+audio = AudioService(music)
+audio.start()
+
 shutdown_signal = False
 RUNNING = True  # Controls background threads
 
+# Shared-memory frames published by video_stream.py (attached lazily):
+# FULL_BUS_NAME at camera resolution, ANALYSIS_BUS_NAME downscaled (see capture_profiles.py)
+frame_buses = {}
+frame_bus_lock = threading.Lock()
+
+def get_frame_bus(name=FULL_BUS_NAME):
+    """
+    Return an attached FrameBus, or None if video_stream.py has not
+    published anything yet. Re-attaches if the video process re-created it.
+    """
+    with frame_bus_lock:
+        bus = frame_buses.get(name)
+        if bus is not None and bus.closed:
+            # Other threads may still hold copy=False frames of the old handle;
+            # close() leaves the mapping to them and their calls raise FrameBusClosed
+            bus.close()
+            del frame_buses[name]
+            bus = None
+        if bus is None:
+            try:
+                bus = frame_buses[name] = FrameBus.attach(name)
+            except (FileNotFoundError, ValueError):
+                return None
+        return bus
+
+def get_analysis_bus():
+    return get_frame_bus(ANALYSIS_BUS_NAME)
+
+def read_latest_frame(copy=True, name=FULL_BUS_NAME):
+    """Latest frame_bus.Frame from the video process, or None."""
+    bus = get_frame_bus(name)
+    if bus is None:
+        return None
+    try:
+        return bus.read(copy=copy)
+    except FrameBusClosed:
+        return None
+
 def act_dead():
     """Put all legs in a raised 'dead' position."""
     print("Performing dead action: putting all legs up")
@@ -56,115 +125,174 @@ def act_dead():
     print(msg)
     return msg
 
+VALID_ACTIONS = ["forward", "backward", "turn_left", "turn_right", "look_up", "look_down", "act_dead"]
+movement_lock = threading.Lock()
+
+# Dead-reckoned pose plus ultrasonic samples (served by /map)
+occupancy_map = OccupancyMap()
+
 def execute_action(action, speed_value):
+    """One gait cycle of `action`. Returns True if it ran, False if it failed or was refused."""
     print(f"Executing action: {action} with speed {speed_value}")
-    try:
-        if action == "forward":
-            crawler.do_action('forward', 1, speed_value)
-        elif action == "backward":
-            crawler.do_action('backward', 1, speed_value)
-        elif action == "turn_left":
-            crawler.do_action('turn left', 1, speed_value)
-        elif action == "turn_right":
-            crawler.do_action('turn right', 1, speed_value)
-        elif action == "look_up":
-            crawler.do_action('look up', 1, speed_value)
-        elif action == "look_down":
-            crawler.do_action('look down', 1, speed_value)
-        elif action == "act_dead":
-            act_dead()
-        print(f"Action {action} executed successfully.")
-    except Exception as e:
-        print(f"Error executing {action} command: {e}")
-
-# ----------------------------------------------------------------------------
-# DISTANCE LOGIC:
-# We'll define 4 "categories" for the measured distance:
-# 1) <= 30 cm => "critical"
-# 2) <= 70 cm => "warning"
-# 3) <= 100 cm => "info"
-# 4) > 100 cm => "safe"
-# We only LOG after the robot remains in that category for >1s to avoid spamming.
-# ----------------------------------------------------------------------------
-
-def get_distance_category(dist):
-    if dist <= 30:
-        return "critical"
-    elif dist <= 70:
-        return "warning"
-    elif dist <= 100:
-        return "info"
-    else:
-        return "safe"
+    trace = mission_trace
+    if trace is not None:
+        trace.movement(action, speed_value)
+    # One gait cycle at a time, whether it comes from /movement or a sequence
+    with movement_lock:
+        if shutdown_signal:
+            # Queued behind the lock when the dead-stop hit
+            print(f"Robot is in dead-stop; not executing {action}.")
+            return False
+        try:
+            if action == "forward":
+                crawler.do_action('forward', 1, speed_value)
+            elif action == "backward":
+                crawler.do_action('backward', 1, speed_value)
+            elif action == "turn_left":
+                crawler.do_action('turn left', 1, speed_value)
+            elif action == "turn_right":
+                crawler.do_action('turn right', 1, speed_value)
+            elif action == "look_up":
+                crawler.do_action('look up', 1, speed_value)
+            elif action == "look_down":
+                crawler.do_action('look down', 1, speed_value)
+            elif action == "act_dead":
+                act_dead()
+            occupancy_map.move(action)
+            print(f"Action {action} executed successfully.")
+            return True
+        except Exception as e:
+            print(f"Error executing {action} command: {e}")
+            return False
+
+movement_sequencer = MovementSequencer(execute_action)
 
-# We'll track the last category/time we entered that category, and log once we pass 1s
-last_category = None
-last_category_time = 0
-category_logged = False
+# Most recent reading from obstacle_monitor (served by /telemetry without touching the sensor)
+latest_distance = None
+latest_distance_time = 0
+
+# Distance categories, category logging and the dead-stop timer (see mission_logic.py)
+obstacle_logic = ObstacleLogic()
+
+# Autonomous follow mode: detections from the frame bus straight to execute_action
+follow_controller = FollowController(
+    lambda: read_latest_frame(copy=False, name=ANALYSIS_BUS_NAME),
+    execute_action,
+    lambda: (latest_distance, latest_distance_time),
+)
+
+#######################################
+# Mission trace (replayed by replay_mission.py)
+#######################################
+TRACE_PATH = f"/home/{USERNAME}/Traces/"
+mission_trace = None
+mission_trace_lock = threading.Lock()
+
+def frame_trace_loop(trace):
+    """Record the id and detections of every analysis frame while `trace` is active."""
+    last_id = -1
+    while not trace.closed:
+        bus = get_analysis_bus()
+        if bus is None:
+            time.sleep(0.5)
+            continue
+        try:
+            latest = bus.wait_for_frame(last_id, timeout=0.5)
+            if latest is None:
+                continue
+            first = last_id + 1 if last_id >= 0 else latest
+            for frame_id in range(max(first, latest - bus.slots + 1), latest + 1):
+                frame = bus.read(frame_id, copy=False)
+                if frame is not None and not trace.closed:
+                    trace.frame(frame.frame_id, frame.detections, frame.timestamp)
+            last_id = latest
+        except FrameBusClosed:
+            last_id = -1
+
+def start_mission_trace():
+    """Start a new trace file unless one is already being written. Returns the writer."""
+    global mission_trace
+    with mission_trace_lock:
+        if mission_trace is None:
+            os.makedirs(TRACE_PATH, exist_ok=True)
+            name = time.strftime("%Y-%m-%d-%H.%M.%S", time.localtime()) + ".sptrace"
+            mission_trace = TraceWriter(os.path.join(TRACE_PATH, name))
+            threading.Thread(target=frame_trace_loop, args=(mission_trace,), daemon=True).start()
+            append_log(f"Mission trace started: {name}", log_type='auto', severity='info')
+        return mission_trace
+
+def stop_mission_trace():
+    global mission_trace
+    with mission_trace_lock:
+        trace, mission_trace = mission_trace, None
+    if trace is not None:
+        trace.close()
+        export_mission_archive(trace.path)
+    return trace
+
+EXPORT_NICE = 15  # the archive export must not compete with the safety loop
+
+def export_mission_archive(trace_path):
+    """Columnar archive (telemetry_export.py) of a finished trace, written next to it."""
+    subprocess.Popen(["python3", "telemetry_export.py", trace_path,
+                      "--logs", LOG_FILE_PATH, "--events", EVENTS_FILE],
+                     preexec_fn=lambda: os.nice(EXPORT_NICE))
+
+OBSTACLE_PERIOD = 0.1  # seconds between ultrasonic samples
+safety_timer = SafetyLoopTimer()
 
 def obstacle_monitor():
     """Continuously measure distance using the ultrasonic sensor."""
     global shutdown_signal, RUNNING
-    global last_category, last_category_time, category_logged
-
-    start_time_for_dead = None
+    global latest_distance, latest_distance_time
 
+    next_sample = time.monotonic()
     while RUNNING and not shutdown_signal:
+        safety_timer.tick()
         try:
             distance = ultrasonic.read()
-
-            # -------------- (A) Distance Logging --------------
-            current_category = get_distance_category(distance)
             current_time = time.time()
+            latest_distance = distance
+            latest_distance_time = current_time
+            trace = mission_trace
+            if trace is not None:
+                trace.distance(distance, current_time)
 
-            # If we've changed category, reset timing/log flags
-            if current_category != last_category:
-                last_category = current_category
-                last_category_time = current_time
-                category_logged = False
-
-            # If we've been in the same category for >1s and haven't logged yet, log now
-            if (current_time - last_category_time) >= 1.0 and not category_logged:
-                # Build a message and severity based on the category
-                if current_category == "critical":
-                    msg = f"Ultrasonic: CRITICAL, distance <= 30cm for 1s!"
-                    severity = "critical"
-                elif current_category == "warning":
-                    msg = f"Ultrasonic: WARNING, distance <= 70cm for 1s."
-                    severity = "warning"
-                elif current_category == "info":
-                    msg = f"Ultrasonic: distance <= 100cm (moderate range) for 1s."
-                    severity = "info"
-                else:
-                    msg = f"Ultrasonic: SAFE distance > 100cm."
-                    severity = "info"  # or "normal"
-                
+            # (A) log a category once it has held for 1s, (B) 2-second "dead" logic
+            logs, dead = obstacle_logic.update(distance, current_time)
+            for msg, severity in logs:
                 append_log(msg, log_type='auto', severity=severity)
-                category_logged = True
-
-            # -------------- (B) 2-second "dead" logic --------------
-            # If distance <= 30 for 2+ seconds => do dead action
-            if distance <= 30:
-                if start_time_for_dead is None:
-                    start_time_for_dead = time.time()
-                elif time.time() - start_time_for_dead >= 2:
-                    print("Obstacle <= 30cm for 2+ seconds. Triggering dead action and shutdown.")
-                    music.music_set_volume(100)
-                    music.music_play('/home/spyrobot/Music/death.mp3')
-                    act_dead()
-                    shutdown_signal = True
-                    # If you want to kill the video process, uncomment below
-                    # video_process.terminate()
-                    RUNNING = False
-                    time.sleep(4)
-                    break
-            else:
-                start_time_for_dead = None
+
+            if dead:
+                print("Obstacle <= 30cm for 2+ seconds. Triggering dead action and shutdown.")
+                movement_sequencer.cancel()
+                follow_controller.stop()
+                audio.play_death()
+                act_dead()
+                shutdown_signal = True
+                # If you want to kill the video process, uncomment below
+                # video_process.terminate()
+                RUNNING = False
+                time.sleep(4)
+                break
 
         except Exception as e:
             print("Ultrasonic sensor error:", e)
+        else:
+            # Readings taken mid-stride belong to no dead-reckoned pose
+            if not movement_lock.locked():
+                try:
+                    occupancy_map.observe(distance)
+                except Exception as e:
+                    print("Occupancy map error:", e)
 
-        time.sleep(0.1)
+        # Fixed rate: the sensor read time does not stretch the period
+        next_sample += OBSTACLE_PERIOD
+        delay = next_sample - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_sample = time.monotonic()
 
 #######################################
 # Flask Endpoints
@@ -179,12 +307,74 @@ def movement():
     action = data.get("action", "")
     speed_value = data.get("speed", default_speed)
     print(f"Received movement command: action={action}, speed={speed_value}")
-    valid_actions = ["forward", "backward", "turn_left", "turn_right", "look_up", "look_down", "act_dead"]
-    if action not in valid_actions:
+    if action not in VALID_ACTIONS:
         return jsonify({"error": "Invalid movement action"}), 400
+    # Manual control overrides a running patrol or follow mode
+    if movement_sequencer.cancel():
+        print("Manual movement received; cancelling running sequence.")
+    if follow_controller.stop():
+        print("Manual movement received; follow mode off.")
     threading.Thread(target=execute_action, args=(action, speed_value), daemon=True).start()
     return jsonify({"message": f"Executing {action} at speed {speed_value}."})
 
+@app.route("/movement/sequence", methods=["GET", "POST"])
+def movement_sequence():
+    """
+    POST {"steps": [{"action", "repeat", "speed", "pause"}, ...], "preempt": bool}
+    runs the whole route server-side. GET reports progress of the current/last one.
+    """
+    if request.method == "GET":
+        return jsonify(movement_sequencer.status())
+
+    data = request.get_json(silent=True) or {}
+    if shutdown_signal:
+        return jsonify({"error": "Robot is in dead-stop"}), 409
+    if follow_controller.active:
+        return jsonify({"error": "Follow mode is on; turn it off first"}), 409
+    try:
+        steps = parse_steps(data.get("steps"), VALID_ACTIONS, default_speed)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        seq_id = movement_sequencer.start(steps, preempt=bool(data.get("preempt", False)))
+    except SequenceBusy as e:
+        return jsonify({"error": f"Sequence {e} is still running; set preempt to replace it"}), 409
+    return jsonify({"message": f"Sequence {seq_id} started with {len(steps)} steps.",
+                    "id": seq_id}), 202
+
+@app.route("/movement/sequence/cancel", methods=["POST"])
+def cancel_movement_sequence():
+    if movement_sequencer.cancel():
+        return jsonify({"message": "Sequence cancelling after the current gait cycle."})
+    return jsonify({"message": "No sequence running."})
+
+@app.route("/follow", methods=["GET", "POST"])
+def follow():
+    """
+    POST {"enabled": true|false, "speed": 0-100} turns the target-follow loop
+    on or off. GET reports its state, command counts and capture-to-command latency.
+    """
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        if "enabled" not in data:
+            return jsonify({"error": "No 'enabled' provided"}), 400
+        if data["enabled"]:
+            if shutdown_signal:
+                return jsonify({"error": "Robot is in dead-stop"}), 409
+            try:
+                speed = int(data.get("speed", default_speed))
+            except (TypeError, ValueError):
+                return jsonify({"error": "speed must be a number"}), 400
+            if not 0 <= speed <= 100:
+                return jsonify({"error": "speed must be between 0 and 100"}), 400
+            if movement_sequencer.cancel():
+                print("Follow mode on; cancelling running sequence.")
+            follow_controller.start(speed)
+            append_log("Follow mode on", log_type='manual', severity='info')
+        elif follow_controller.stop():
+            append_log("Follow mode off", log_type='manual', severity='info')
+    return jsonify(follow_controller.stats())
+
 @app.route("/speed", methods=["POST"])
 def set_speed_endpoint():
     global default_speed
@@ -199,20 +389,27 @@ def set_speed_endpoint():
 
 @app.route('/play-sound', methods=['POST'])
 def play_sound():
-    """Play a random distraction sound."""
-    files = [
-        '/home/spyrobot/Music/distraction_1.mp3',
-        '/home/spyrobot/Music/distraction_2.mp3',
-        '/home/spyrobot/Music/distraction_3.mp3',
-        '/home/spyrobot/Music/distraction_4.mp3'
-    ]
-    chosen_file = random.choice(files)
-    music.music_set_volume(100)
-    music.music_play(chosen_file)
-    msg = f"Playing sound: {chosen_file}"
+    """Queue a sound: {"type": "death"} or a random distraction sound (default)."""
+    data = request.get_json(silent=True) or {}
+    if data.get("type") == "death":
+        audio.play_death()
+        msg = "Playing death sound"
+    else:
+        chosen_file = audio.play_distraction()
+        msg = f"Playing sound: {chosen_file}"
     print(msg)
     return jsonify({"message": msg})
 
+@app.route("/say", methods=["POST"])
+def say():
+    """Speak a phrase through TTS. Repeated phrases come from the on-disk cache."""
+    data = request.get_json(silent=True) or {}
+    text = str(data.get("text", "")).strip()
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+    audio.say(text)
+    return jsonify({"message": f"Saying: {text}"})
+
 @app.route("/dead", methods=["POST"])
 def dead_endpoint():
     try:
@@ -233,6 +430,201 @@ def get_distance():
 def status():
     return jsonify({"shutdown": shutdown_signal})
 
+@app.route("/telemetry", methods=["GET"])
+def telemetry():
+    """
+    One compact snapshot of the robot's state, cheap enough to poll a few
+    times per second (gateway.py polls this once per robot for all its clients).
+    """
+    now = time.time()
+    frame = read_latest_frame(copy=False, name=ANALYSIS_BUS_NAME)
+    record_stats = read_record_stats()
+    return jsonify({
+        "time": now,
+        "shutdown": shutdown_signal,
+        "distance": latest_distance,
+        "distance_age": round(now - latest_distance_time, 2) if latest_distance is not None else None,
+        "category": obstacle_logic.last_category,
+        "sequence": movement_sequencer.status(),
+        "follow": follow_controller.state,
+        "quality": governor.level.name,
+        "camera": None if frame is None else {
+            "frame_id": frame.frame_id,
+            "age": round(now - frame.timestamp, 2),
+            "faces": len(frame.detections),
+            "known": int(sum(1 for det in frame.detections if det[4])),
+        },
+        "recording": None if record_stats is None else {
+            "name": record_stats.get("recording"),
+            "active": record_stats.get("active"),
+            "capture_fps": record_stats.get("capture_fps"),
+        },
+    })
+
+@app.route("/camera/detections", methods=["GET"])
+def camera_detections():
+    """
+    Frame id, timestamp and face detections of the newest camera frame.
+    Boxes are in full-resolution coordinates; ?stream=analysis returns them
+    in the coordinates of the downscaled analysis/MJPEG frame instead.
+    """
+    stream = request.args.get("stream", "full")
+    if stream not in ("full", "analysis"):
+        return jsonify({"error": "stream must be full or analysis"}), 400
+    name = ANALYSIS_BUS_NAME if stream == "analysis" else FULL_BUS_NAME
+    frame = read_latest_frame(copy=False, name=name)
+    if frame is None:
+        return jsonify({"error": "No frames available yet"}), 503
+    return jsonify({
+        "frame_id": frame.frame_id,
+        "timestamp": frame.timestamp,
+        "width": frame.image.shape[1],
+        "height": frame.image.shape[0],
+        "detections": [dict(zip(DET_FIELDS, map(float, det))) for det in frame.detections],
+    })
+
+# One classification per analysis frame, however many clients poll /camera/colors
+color_detector = ColorDetector()
+color_cache = {"frame_id": None, "blobs": None, "ms": None}
+color_lock = threading.Lock()
+
+@app.route("/camera/colors", methods=["GET"])
+def camera_colors():
+    """
+    Blobs of all six colours in the newest analysis frame, largest first:
+    {color: [{x, y, w, h, area, cx, cy}]} in analysis-frame coordinates.
+    ?colors=red,blue limits the reply.
+    """
+    colors = request.args.get("colors")
+    if colors:
+        colors = [c.strip() for c in colors.split(",")]
+        unknown = [c for c in colors if c not in COLOR_NAMES]
+        if unknown:
+            return jsonify({"error": f"Unknown colors {unknown}; choose from {COLOR_NAMES}"}), 400
+    frame = read_latest_frame(copy=False, name=ANALYSIS_BUS_NAME)
+    if frame is None:
+        return jsonify({"error": "No frames available yet"}), 503
+    with color_lock:
+        if color_cache["frame_id"] != frame.frame_id:
+            start = time.perf_counter()
+            color_cache["blobs"] = color_detector.detect(frame.image)
+            color_cache["ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+            color_cache["frame_id"] = frame.frame_id
+        blobs, ms = color_cache["blobs"], color_cache["ms"]
+    if colors:
+        blobs = {name: blobs[name] for name in colors}
+    return jsonify({
+        "frame_id": frame.frame_id,
+        "timestamp": frame.timestamp,
+        "width": frame.image.shape[1],
+        "height": frame.image.shape[0],
+        "detect_ms": ms,
+        "colors": blobs,
+    })
+
+@app.route("/camera/detection/stats", methods=["GET"])
+def detection_stats():
+    """Detection worker pool counters from video_stream.py (frames dropped, latency, restarts)."""
+    stats = read_record_stats(DETECTION_STATS_PATH)
+    if stats is None:
+        return jsonify({"error": "Detection pool not running (inline detection)"}), 404
+    stats["age"] = round(time.time() - stats.get("updated", 0), 1)
+    return jsonify(stats)
+
+@app.route("/camera/profile", methods=["GET", "POST"])
+def camera_profile():
+    """
+    GET: requested and active capture profile plus the available ones.
+    POST {"profile": "low"|"balanced"|"high"}: ask video_stream.py to
+    restart the camera at that profile's size (applied within ~1 s).
+    """
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        name = data.get("profile")
+        if name not in PROFILES:
+            return jsonify({"error": f"profile must be one of {sorted(PROFILES)}"}), 400
+        write_requested_profile(name)
+        append_log(f"Capture profile '{name}' requested.", log_type='manual', severity='info')
+        return jsonify({"message": f"Switching to capture profile '{name}'.", "requested": name}), 202
+
+    active = {}
+    for stream, name in (("full", FULL_BUS_NAME), ("analysis", ANALYSIS_BUS_NAME)):
+        bus = get_frame_bus(name)
+        active[stream] = [bus.shape[1], bus.shape[0]] if bus is not None else None
+    return jsonify({
+        "requested": read_requested_profile() or DEFAULT_PROFILE,
+        "active": active,
+        "profiles": [profile_info(p) for p in PROFILES.values()],
+    })
+
+photo_capture = PhotoCapture(PICTURE_PATH, read_latest_frame)
+
+@app.route("/camera/photo", methods=["POST"])
+def take_photo():
+    """
+    Grab the current frame (or a burst of frames) without blocking the
+    capture loop. Body (optional): {"count": N, "interval": seconds}.
+    Encoding/writing happens in the background; ids are returned immediately.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        count = int(data.get("count", 1))
+        interval = float(data.get("interval", 0.2))
+    except (TypeError, ValueError):
+        return jsonify({"error": "count and interval must be numbers"}), 400
+
+    if count > 1:
+        ids = photo_capture.burst(count, interval)
+        return jsonify({"message": f"Burst of {len(ids)} photos started.", "ids": ids}), 202
+
+    record = photo_capture.capture()
+    if record is None:
+        return jsonify({"error": "No camera frame available"}), 503
+    return jsonify({"message": f"Photo {record['id']} captured.", "ids": [record["id"]], "photo": record}), 202
+
+@app.route("/camera/photos", methods=["GET"])
+def list_photos():
+    try:
+        limit = int(request.args.get("limit", 50))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    photos, total = photo_capture.list_photos(limit, offset)
+    return jsonify({"photos": photos, "total": total})
+
+@app.route("/camera/photos/<photo_id>", methods=["GET"])
+def get_photo(photo_id):
+    """Serve the JPEG, or the record while it is still pending/failed."""
+    record = photo_capture.get(photo_id)
+    if record is None:
+        return jsonify({"error": "Photo not found"}), 404
+    if record.get("status") != "saved":
+        return jsonify(record), 202 if record.get("status") == "pending" else 500
+    return send_from_directory(PICTURE_PATH, record["filename"], max_age=3600)
+
+# The live stream is served from the small analysis frames
+stream_hub = StreamHub(get_analysis_bus)
+
+@app.route("/stream.mjpg", methods=["GET"])
+def mjpeg_stream():
+    """
+    Live MJPEG feed. ?quality=high|medium|low pins a tier; the default
+    (auto) adapts to how fast this client drains frames.
+    """
+    quality = request.args.get("quality", "auto")
+    if quality != "auto" and quality not in TIER_NAMES:
+        return jsonify({"error": f"quality must be auto or one of {TIER_NAMES}"}), 400
+    client = stream_hub.subscribe(quality)
+    return Response(
+        stream_hub.stream(client),
+        mimetype=f"multipart/x-mixed-replace; boundary={BOUNDARY}",
+        headers={"Cache-Control": "no-cache, private", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/stream/stats", methods=["GET"])
+def mjpeg_stream_stats():
+    return jsonify(stream_hub.stats())
+
 @app.route("/latest", methods=["GET"])
 def latest_recording():
     """
@@ -246,20 +638,60 @@ def latest_recording():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/recording/stats", methods=["GET"])
+def recording_stats():
+    """
+    Recorder frame accounting from video_stream.py: frames consumed/written,
+    duplicates, skips, frames lost on the bus, capture fps and max gap.
+    """
+    stats = read_record_stats()
+    if stats is None:
+        return jsonify({"error": "No recording stats yet"}), 404
+    stats["age"] = round(time.time() - stats.get("updated", 0), 1)
+    return jsonify(stats)
+
+@app.route("/trace", methods=["GET"])
+def trace_status():
+    """Active mission trace (if any), the traces recorded so far and their archives."""
+    trace = mission_trace
+    try:
+        names = os.listdir(TRACE_PATH)
+    except FileNotFoundError:
+        names = []
+    files = sorted(f for f in names if f.endswith(".sptrace"))
+    archives = sorted(f for f in names if f.endswith(".sparchive"))
+    return jsonify({"active": trace.stats() if trace is not None else None, "traces": files,
+                    "archives": archives})
+
+@app.route("/trace/start", methods=["POST"])
+def trace_start():
+    trace = start_mission_trace()
+    return jsonify({"message": "Mission trace recording.", "trace": trace.stats()})
+
+@app.route("/trace/stop", methods=["POST"])
+def trace_stop():
+    trace = stop_mission_trace()
+    if trace is None:
+        return jsonify({"error": "No mission trace is being recorded"}), 409
+    append_log(f"Mission trace stopped: {os.path.basename(trace.path)} "
+               f"({trace.records} records).", log_type='auto', severity='info')
+    return jsonify({"message": "Mission trace stopped.", "trace": trace.stats()})
+
 @app.route("/logs", methods=["GET"])
 def get_logs():
     """
-    Return the entire spy_logs.json file as JSON.
+    Return all log entries as JSON (served from the log sink's memory).
     """
     try:
-        with open(LOG_FILE_PATH, 'r') as f:
-            logs = json.load(f)
-        return jsonify(logs)  # Logs is a Python list of log objects
-    except FileNotFoundError:
-        return jsonify([])  # Return empty list if no file
+        return jsonify(load_logs())  # Logs is a Python list of log objects
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/logs/stats", methods=["GET"])
+def get_log_stats():
+    """Log sink counters: received / written / dropped / pending records and batches."""
+    return jsonify(log_sink.get_stats())
+
 # ---------------------------------------------------
 # Serve video files directly from VIDEO_PATH
 # ---------------------------------------------------
@@ -275,10 +707,95 @@ def get_recording(filename):
     except FileNotFoundError:
         return jsonify({"error": "File not found"}), 404
 
+# ---------------------------------------------------
+# Poster frames / sprite sheets written by the recorder
+# ---------------------------------------------------
+thumbnail_cache = FileCache()
+RECORDING_NAME_RE = re.compile(r"^[\w.\-]+$")
+
+def recording_name(name):
+    """'2025-04-15-03.04.19.mp4' or '2025-04-15-03.04.19' -> base name, or None if unsafe."""
+    if name.endswith(".mp4"):
+        name = name[:-4]
+    return name if RECORDING_NAME_RE.match(name) else None
+
+def cached_file_response(path, mimetype):
+    try:
+        data, etag = thumbnail_cache.get(path)
+    except FileNotFoundError:
+        return jsonify({"error": "File not found"}), 404
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status=304, headers={"ETag": etag})
+    return Response(data, mimetype=mimetype, headers={
+        "ETag": etag,
+        "Cache-Control": "public, max-age=86400",
+    })
+
+@app.route("/recordings/<name>/poster", methods=["GET"])
+def get_recording_poster(name):
+    name = recording_name(name)
+    if name is None:
+        return jsonify({"error": "Invalid recording name"}), 400
+    return cached_file_response(sidecar_paths(VIDEO_PATH, name)["poster"], "image/jpeg")
+
+@app.route("/recordings/<name>/thumbnails", methods=["GET"])
+def get_recording_thumbnails(name):
+    """Sprite manifest: tile size, seconds per tile, sheet URLs."""
+    name = recording_name(name)
+    if name is None:
+        return jsonify({"error": "Invalid recording name"}), 400
+    try:
+        data, _ = thumbnail_cache.get(sidecar_paths(VIDEO_PATH, name)["manifest"])
+    except FileNotFoundError:
+        return jsonify({"error": "No thumbnails for this recording"}), 404
+    manifest = json.loads(data)
+    manifest["sheet_urls"] = [f"/recordings/{name}/sprite/{i}" for i in range(len(manifest["sheets"]))]
+    if manifest.get("poster"):
+        manifest["poster_url"] = f"/recordings/{name}/poster"
+    return jsonify(manifest)
+
+@app.route("/recordings/<name>/sprite/<int:index>", methods=["GET"])
+def get_recording_sprite(name, index):
+    name = recording_name(name)
+    if name is None:
+        return jsonify({"error": "Invalid recording name"}), 400
+    return cached_file_response(sidecar_paths(VIDEO_PATH, name)["sheet"].format(index), "image/jpeg")
+
+# ---------------------------------------------------
+# Face sighting sidecars written by the recorder
+# ---------------------------------------------------
+sighting_index = SightingIndex(VIDEO_PATH)
+
+@app.route("/recordings/<name>/detections", methods=["GET"])
+def get_recording_detections(name):
+    """Run-length encoded known/unknown/no-face intervals for one recording."""
+    name = recording_name(name)
+    if name is None:
+        return jsonify({"error": "Invalid recording name"}), 400
+    return cached_file_response(detections_path(VIDEO_PATH, name), "application/json")
+
+@app.route("/recordings/sightings", methods=["GET"])
+def find_sightings():
+    """
+    Recordings where a face state lasted long enough, across the whole archive.
+    /recordings/sightings?state=known&min_duration=5&gap=0.5
+    """
+    state = request.args.get("state", "known")
+    if state not in ("known", "unknown", "none"):
+        return jsonify({"error": "state must be known, unknown or none"}), 400
+    try:
+        min_duration = float(request.args.get("min_duration", 5))
+        gap = float(request.args.get("gap", 0.5))
+    except ValueError:
+        return jsonify({"error": "min_duration and gap must be numbers"}), 400
+    return jsonify(sighting_index.find(state, min_duration, gap))
+
 #######################################
 # /events endpoint
 #######################################
 EVENTS_FILE = "events.json"
+# Held around every read-modify-write of EVENTS_FILE (POST /events, QR scanner thread)
+events_lock = threading.Lock()
 
 def load_events():
     if os.path.exists(EVENTS_FILE):
@@ -290,6 +807,13 @@ def save_events(events_list):
     with open(EVENTS_FILE, "w") as f:
         json.dump(events_list, f, indent=2)
 
+def append_event(event):
+    with events_lock:
+        all_events = load_events()
+        all_events.append(event)
+        save_events(all_events)
+    search_index.add("event", event)
+
 @app.route("/events", methods=["GET", "POST", "OPTIONS"])
 def events():
     # Handle the OPTIONS request for CORS preflight
@@ -311,9 +835,7 @@ def events():
         }
 
         # Save to events.json as before
-        all_events = load_events()
-        all_events.append(event)
-        save_events(all_events)
+        append_event(event)
 
         append_log(
             description,      # the main message
@@ -325,13 +847,249 @@ def events():
         return jsonify({"message": "Event added", "event": event}), 201
 
     elif request.method == "GET":
-        all_events = load_events()
+        with events_lock:
+            all_events = load_events()
         return jsonify(all_events), 200
 
+#######################################
+# /search endpoint
+#######################################
+# Built once from the JSON files, then updated per append_log / POST /events
+search_index = SearchIndex()
+search_index.add_many("log", load_logs())
+search_index.add_many("event", load_events())
+add_log_listener(lambda entry: search_index.add("log", entry))
+print(f"Search index ready with {len(search_index)} documents")
+
+@app.route("/search", methods=["GET"])
+def search():
+    """
+    Ranked, paginated full-text search over logs and events.
+    /search?q=&severity=warning,critical&kind=log|event&from=&to=&page=&page_size=
+    from/to accept 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'.
+    """
+    args = request.args
+    try:
+        result = search_index.search(
+            query=args.get("q", ""),
+            severity=args.get("severity"),
+            kind=args.get("kind"),
+            date_from=args.get("from"),
+            date_to=args.get("to"),
+            page=int(args.get("page", 1)),
+            page_size=int(args.get("page_size", 20)),
+        )
+    except ValueError:
+        return jsonify({"error": "page and page_size must be integers"}), 400
+    return jsonify(result)
+
+#######################################
+# /timeline/buckets endpoint
+#######################################
+timeline = TimelineAggregates()
+timeline.add_many(load_logs())
+add_log_listener(timeline.add)
+
+@app.route("/timeline/buckets", methods=["GET"])
+def timeline_buckets():
+    """
+    Log counts by severity and type over time.
+    /timeline/buckets?from=&to=&max_buckets=&resolution=minute|hour
+    from/to: 'YYYY-MM-DD[ HH:MM:SS]' or epoch seconds; default is the whole mission.
+    """
+    args = request.args
+    try:
+        result = timeline.histogram(
+            start=parse_timestamp(args.get("from")),
+            end=parse_timestamp(args.get("to")),
+            max_buckets=int(args.get("max_buckets", 120)),
+            resolution=args.get("resolution"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+#######################################
+# QR codes (decoded from the frame buses, see qr_stage.py)
+#######################################
+def on_qr_payload(qr_event):
+    """Every new payload becomes an event (events.json + search) and a log line."""
+    event = {
+        "id": str(int(time.time() * 1000)),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(qr_event["timestamp"])),
+        "description": f"QR code: {qr_event['payload']}",
+        "type": "qr",
+    }
+    append_event(event)
+    append_log(event["description"], log_type='auto', severity='info')
+
+qr_scanner = QRScanner(get_analysis_bus, get_frame_bus, on_qr_payload)
+
+@app.route("/qr", methods=["GET", "POST"])
+def qr_codes():
+    """
+    GET /qr?since=<id>: decoded payloads newer than `since` plus scanner stats.
+    POST {"enabled": true|false} starts or stops the scanner.
+    """
+    if request.method == "POST":
+        data = request.get_json() or {}
+        if "enabled" not in data:
+            return jsonify({"error": "No 'enabled' provided"}), 400
+        if data["enabled"]:
+            qr_scanner.start()
+        else:
+            qr_scanner.stop()
+    try:
+        since = int(request.args.get("since", 0))
+    except ValueError:
+        return jsonify({"error": "since must be an integer"}), 400
+    return jsonify({"events": qr_scanner.events(since), "stats": qr_scanner.get_stats()})
+
+#######################################
+# Quality governor (temperature, load, pipeline lag -> quality level)
+#######################################
+def governor_inputs():
+    frame = read_latest_frame(copy=False, name=ANALYSIS_BUS_NAME)
+    pool = read_record_stats(DETECTION_STATS_PATH)
+    fresh_pool = pool is not None and time.time() - pool.get("updated", 0) < 5
+    return {
+        "frame_age": None if frame is None else time.time() - frame.timestamp,
+        "detection_p95": pool.get("latency_p95_ms") if fresh_pool else None,
+    }
+
+def apply_quality_level(level):
+    """Stream cap here; detection and recording settings go to video_stream.py."""
+    stream_hub.set_max_tier(level.stream_tier)
+    write_quality_level(level.name)
+
+governor = Governor(governor_inputs, apply_quality_level, safety_timer)
+
+@app.route("/governor", methods=["GET", "POST"])
+def governor_status():
+    """
+    GET: current quality level, the sampled signals and recent level changes.
+    POST {"level": "full"|"reduced"|"low"|"minimal"|"auto"} pins a level or
+    returns to automatic control.
+    """
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        name = data.get("level")
+        if name != "auto" and name not in LEVEL_NAMES:
+            return jsonify({"error": f"level must be auto or one of {LEVEL_NAMES}"}), 400
+        level = governor.pin(None if name == "auto" else name)
+        append_log(f"Quality level {'auto' if name == 'auto' else 'pinned to ' + level.name}",
+                   log_type='manual', severity='info')
+    return jsonify(governor.status())
+
+#######################################
+# Occupancy map (ultrasonic + dead reckoning)
+#######################################
+@app.route("/map", methods=["GET"])
+def get_map():
+    """
+    Downsampled occupancy grid. ?scale=N merges N x N cells (default 4).
+    ?since=<version> from a previous reply returns only the blocks changed
+    since then; without it (or when most blocks changed) the whole grid.
+    """
+    try:
+        since = int(request.args.get("since", 0))
+        scale = int(request.args.get("scale", 4))
+    except ValueError:
+        return jsonify({"error": "since and scale must be integers"}), 400
+    if scale not in (1, 2, 4, 5, 8, 10):
+        return jsonify({"error": "scale must be one of 1, 2, 4, 5, 8, 10"}), 400
+    result = occupancy_map.snapshot(since, scale)
+    result["stats"] = occupancy_map.get_stats()
+    return jsonify(result)
+
+@app.route("/map/reset", methods=["POST"])
+def reset_map():
+    """Forget the map and put the robot back at the centre, facing up."""
+    occupancy_map.reset()
+    append_log("Occupancy map reset", log_type='manual', severity='info')
+    return jsonify({"message": "Map reset."})
+
+#######################################
+# Recording archiver (recording_archiver.py, its own idle-priority process)
+#######################################
+archiver_process = None
+archiver_settings = {
+    "target": os.environ.get("SPYROBOT_ARCHIVE_TARGET"),
+    "rate_kbps": int(os.environ.get("SPYROBOT_ARCHIVE_RATE", ARCHIVE_DEFAULT_RATE)),
+    "keep": False,
+}
+archiver_lock = threading.Lock()
+
+def archiver_running():
+    return archiver_process is not None and archiver_process.poll() is None
+
+def start_archiver():
+    global archiver_process
+    with archiver_lock:
+        if archiver_running():
+            archiver_process.terminate()
+            archiver_process.wait()
+        cmd = ["python3", "recording_archiver.py", "--target", archiver_settings["target"],
+               "--source", VIDEO_PATH, "--rate", str(archiver_settings["rate_kbps"])]
+        if archiver_settings["keep"]:
+            cmd.append("--keep")
+        archiver_process = subprocess.Popen(cmd)
+
+def stop_archiver():
+    global archiver_process
+    with archiver_lock:
+        if not archiver_running():
+            return False
+        # Safe at any point: the next run resumes from what the target already has
+        archiver_process.terminate()
+        archiver_process.wait()
+        archiver_process = None
+        return True
+
+@app.route("/archive", methods=["GET", "POST"])
+def archive():
+    """
+    GET: archiver settings and progress (current recording, bytes sent/freed).
+    POST {"enabled": true|false, "target": dir or http://..., "rate_kbps": n,
+    "keep": bool} starts (or restarts with new settings) or stops the archiver.
+    """
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        if "enabled" not in data:
+            return jsonify({"error": "No 'enabled' provided"}), 400
+        if data["enabled"]:
+            target = data.get("target", archiver_settings["target"])
+            if not target:
+                return jsonify({"error": "No archive target configured"}), 400
+            try:
+                rate = int(data.get("rate_kbps", archiver_settings["rate_kbps"]))
+            except (TypeError, ValueError):
+                return jsonify({"error": "rate_kbps must be a number"}), 400
+            if rate < 0:
+                return jsonify({"error": "rate_kbps must be 0 (unlimited) or more"}), 400
+            archiver_settings.update(target=target, rate_kbps=rate,
+                                     keep=bool(data.get("keep", archiver_settings["keep"])))
+            start_archiver()
+            append_log(f"Recording archiver on: {target}", log_type='manual', severity='info')
+        elif stop_archiver():
+            append_log("Recording archiver off", log_type='manual', severity='info')
+    return jsonify(dict(archiver_settings, running=archiver_running(),
+                        progress=read_record_stats(ARCHIVE_STATS_PATH)))
+
 #######################################
 
 if __name__ == "__main__":
+    # SPYROBOT_TRACE=1 records the whole mission from startup
+    if os.environ.get("SPYROBOT_TRACE") == "1":
+        start_mission_trace()
+    # SPYROBOT_QR=0 leaves the QR scanner off until POST /qr
+    if os.environ.get("SPYROBOT_QR", "1") != "0":
+        qr_scanner.start()
     monitor_thread = threading.Thread(target=obstacle_monitor, daemon=True)
     monitor_thread.start()
+    governor.start()
+    # SPYROBOT_ARCHIVE_TARGET (a directory or http://host:port) starts the archiver
+    if archiver_settings["target"]:
+        start_archiver()
     print("Starting Test Server for Movement Control on port 5000")
-    app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Simulated camera, crawler and ultrasonic sensor for exercising
+follow_controller.py without the robot.
+
+SimWorld holds the target's bearing, distance and height relative to the
+robot. SimCamera publishes analysis-size frames with the target's face
+box to a real FrameBus at the camera rate, as video_stream.py does.
+SimCrawler.do_action() takes as long as a gait cycle and moves the world:
+turns change the bearing, steps change the distance, look up/down tilts
+the head. SimUltrasonic reads the target's distance while it is straight
+ahead.
+
+    python3 sim_hardware.py                        # follow for 20 s, print stats
+    python3 sim_hardware.py --bearing -35 --distance 250 --seconds 30
+"""
+import argparse
+import json
+import math
+import threading
+import time
+
+import numpy as np
+
+from frame_bus import FrameBus
+from follow_controller import FollowController
+
+FRAME_SIZE = (640, 360)      # analysis frame (width, height)
+FOV = 62.0                   # horizontal field of view, degrees
+FACE_HEIGHT = 22.0           # cm
+GAIT_TIME = 0.6              # seconds per gait cycle at speed 100
+TURN_STEP = 12.0             # degrees per turn cycle
+WALK_STEP = 8.0              # cm per forward/backward cycle
+TILT_STEP = 6.0              # degrees per look cycle
+CAMERA_FPS = 20.0
+SONAR_CONE = 15.0            # degrees either side in which the target is what the sensor sees
+OPEN_DISTANCE = 250.0        # cm reported when nothing is ahead
+
+# Same mapping as server.execute_action
+ACTIONS = {"forward": "forward", "backward": "backward", "turn_left": "turn left",
+           "turn_right": "turn right", "look_up": "look up", "look_down": "look down"}
+
+
+class SimWorld:
+    def __init__(self, bearing=25.0, distance=200.0, elevation=8.0, drift=0.0):
+        """bearing/elevation: degrees from the camera axis; drift: target walk-away, cm/s."""
+        self.lock = threading.Lock()
+        self.bearing = bearing
+        self.distance = distance
+        self.elevation = elevation
+        self.drift = drift
+        self._last = time.monotonic()
+
+    def advance(self):
+        with self.lock:
+            now = time.monotonic()
+            self.distance += self.drift * (now - self._last)
+            self._last = now
+
+    def face_box(self):
+        """(x, y, w, h, known, confidence) in the analysis frame, or None if out of view."""
+        self.advance()
+        with self.lock:
+            width, height = FRAME_SIZE
+            focal = width / 2 / math.tan(math.radians(FOV / 2))
+            size = focal * FACE_HEIGHT / max(self.distance, 1.0)
+            cx = width / 2 + focal * math.tan(math.radians(self.bearing))
+            cy = height / 2 - focal * math.tan(math.radians(self.elevation))
+        if not (0 <= cx < width and 0 <= cy < height):
+            return None
+        return (cx - size / 2, cy - size / 2, size, size, 1, 40.0)
+
+
+class SimCamera:
+    def __init__(self, world, bus_name="spyrobot_sim_frames", fps=CAMERA_FPS):
+        self.world = world
+        self.bus = FrameBus.create((FRAME_SIZE[1], FRAME_SIZE[0], 3), name=bus_name, max_dets=4)
+        self.period = 1.0 / fps
+        self._image = np.zeros((FRAME_SIZE[1], FRAME_SIZE[0], 3), np.uint8)
+        self._running = False
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._loop, daemon=True, name="sim-camera").start()
+        return self
+
+    def _loop(self):
+        while self._running:
+            box = self.world.face_box()
+            self.bus.publish(self._image, [] if box is None else [box], timestamp=time.time())
+            time.sleep(self.period)
+
+    def read(self):
+        return self.bus.read(copy=False)
+
+    def stop(self):
+        self._running = False
+        time.sleep(self.period * 2)
+        self.bus.close()
+
+
+class SimCrawler:
+    """Picrawler stand-in: do_action blocks for a gait cycle, then moves the world."""
+
+    def __init__(self, world):
+        self.world = world
+        self.log = []   # (time.time() at command start, action)
+
+    def do_action(self, action, steps=1, speed=100):
+        self.log.append((time.time(), action))
+        time.sleep(GAIT_TIME * 100.0 / max(speed, 10) * steps)
+        with self.world.lock:
+            if action == "turn left":
+                self.world.bearing += TURN_STEP * steps
+            elif action == "turn right":
+                self.world.bearing -= TURN_STEP * steps
+            elif action == "forward":
+                self.world.distance -= WALK_STEP * steps
+            elif action == "backward":
+                self.world.distance += WALK_STEP * steps
+            elif action == "look up":
+                self.world.elevation -= TILT_STEP * steps
+            elif action == "look down":
+                self.world.elevation += TILT_STEP * steps
+
+
+class SimUltrasonic:
+    def __init__(self, world):
+        self.world = world
+
+    def read(self):
+        with self.world.lock:
+            return self.world.distance if abs(self.world.bearing) <= SONAR_CONE else OPEN_DISTANCE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop follow test on simulated hardware")
+    parser.add_argument("--bearing", type=float, default=25.0, help="start bearing, degrees")
+    parser.add_argument("--distance", type=float, default=200.0, help="start distance, cm")
+    parser.add_argument("--elevation", type=float, default=8.0, help="start elevation, degrees")
+    parser.add_argument("--drift", type=float, default=0.0, help="target walks away at cm/s")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--speed", type=int, default=100)
+    args = parser.parse_args()
+
+    world = SimWorld(args.bearing, args.distance, args.elevation, args.drift)
+    camera = SimCamera(world).start()
+    crawler = SimCrawler(world)
+    sonar = SimUltrasonic(world)
+    reading = {"distance": None, "time": 0.0}
+
+    def sonar_loop():   # obstacle_monitor's 10 Hz sampling
+        while True:
+            reading["distance"], reading["time"] = sonar.read(), time.time()
+            time.sleep(0.1)
+
+    threading.Thread(target=sonar_loop, daemon=True).start()
+    controller = FollowController(camera.read, lambda action, speed: crawler.do_action(ACTIONS[action], 1, speed),
+                                  lambda: (reading["distance"], reading["time"]))
+    controller.start(args.speed)
+
+    end = time.monotonic() + args.seconds
+    while time.monotonic() < end:
+        time.sleep(1.0)
+        with world.lock:
+            print(f"[{controller.state:>9}] bearing {world.bearing:6.1f} deg  distance {world.distance:6.1f} cm  "
+                  f"elevation {world.elevation:5.1f} deg")
+    controller.stop()
+    print(json.dumps(controller.stats(), indent=2))
+    camera.stop()
+
+
+if __name__ == "__main__":
+    main()
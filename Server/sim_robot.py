@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Stand-in for server.py without any hardware, for exercising gateway.py
+on one machine. Serves the endpoints the gateway relies on (/telemetry,
+/logs, /events, /status, /distance, /movement) with an optional artificial
+delay per request that mimics a Pi on Wi-Fi.
+
+    python3 sim_robot.py --port 5101 --delay 0.02
+    python3 sim_robot.py --count 5 --port 5101     # five robots on 5101..5105
+"""
+import argparse
+import math
+import random
+import threading
+import time
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+
+def create_sim_app(robot_id, delay=0.0, log_count=500):
+    app = Flask(robot_id)
+    started = time.time()
+    lock = threading.Lock()
+    logs = [
+        {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started - (log_count - i))),
+            "description": f"{robot_id}: simulated log entry {i}",
+            "type": "auto",
+            "severity": random.choice(["info", "info", "warning", "success"]),
+        }
+        for i in range(log_count)
+    ]
+    events = []
+    state = {"action": None, "requests": 0, "paths": {}}
+
+    @app.before_request
+    def simulate_latency():
+        with lock:
+            state["requests"] += 1
+            state["paths"][request.path] = state["paths"].get(request.path, 0) + 1
+        if delay:
+            time.sleep(delay)
+
+    @app.route("/telemetry", methods=["GET"])
+    def telemetry():
+        now = time.time()
+        return jsonify({
+            "time": now,
+            "shutdown": False,
+            "distance": round(80 + 40 * math.sin(now - started), 1),
+            "distance_age": 0.05,
+            "category": "safe",
+            "sequence": {"state": "idle"},
+            "follow": "off",
+            "camera": {"frame_id": int((now - started) * 20), "age": 0.03, "faces": 0, "known": 0},
+            "recording": None,
+        })
+
+    @app.route("/status", methods=["GET"])
+    def status():
+        return jsonify({"shutdown": False})
+
+    @app.route("/distance", methods=["GET"])
+    def distance():
+        return jsonify({"distance": round(80 + 40 * math.sin(time.time() - started), 1)})
+
+    @app.route("/movement", methods=["POST"])
+    def movement():
+        data = request.get_json(silent=True) or {}
+        with lock:
+            state["action"] = data.get("action")
+        return jsonify({"message": f"Action '{data.get('action')}' executed"})
+
+    @app.route("/logs", methods=["GET"])
+    def get_logs():
+        return jsonify(logs)
+
+    @app.route("/events", methods=["GET", "POST"])
+    def get_events():
+        if request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            event = {
+                "id": str(int(time.time() * 1000)),
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+                "description": data.get("description", ""),
+                "type": "manual",
+            }
+            with lock:
+                events.append(event)
+            return jsonify({"message": "Event added", "event": event}), 201
+        with lock:
+            return jsonify(list(events))
+
+    @app.route("/sim/stats", methods=["GET"])
+    def sim_stats():
+        with lock:
+            return jsonify(dict(state, id=robot_id, paths=dict(state["paths"])))
+
+    return app
+
+
+class SimRobot:
+    """A sim app served on a background thread (port 0 picks a free port)."""
+
+    def __init__(self, robot_id, port=0, delay=0.0, host="127.0.0.1"):
+        self.id = robot_id
+        self.server = make_server(host, port, create_sim_app(robot_id, delay), threaded=True)
+        self.url = f"http://{host}:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def start_sim_robots(count, base_port=0, delay=0.0):
+    """Start `count` simulated robots; returns {robot id: SimRobot}."""
+    robots = {}
+    for i in range(count):
+        robot_id = f"sim{i + 1}"
+        port = base_port + i if base_port else 0
+        robots[robot_id] = SimRobot(robot_id, port, delay).start()
+    return robots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated robot server(s)")
+    parser.add_argument("--port", type=int, default=5101, help="port of the first robot")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--delay", type=float, default=0.0, help="artificial delay per request (s)")
+    args = parser.parse_args()
+
+    robots = start_sim_robots(args.count, args.port, args.delay)
+    for robot in robots.values():
+        print(f"{robot.id}: {robot.url}")
+    print("Gateway flags:", " ".join(f"--robot {r.id}={r.url}" for r in robots.values()))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for robot in robots.values():
+            robot.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Export a mission to a columnar archive for offline analysis.
+
+A mission trace (mission_trace.py) and the spy_logs.json / events.json
+entries from its time span become typed column tables:
+
+    distance    t f64, distance f32
+    movement    t f64, action (category), speed u16
+    frames      t f64, frame_id i64, faces u8, known u8
+    detections  t f64, frame_id i64, x y w h f32, known bool, confidence f32
+    logs        t f64, type (category), severity (category), description (string)
+    events      t f64, type (category), id (string), description (string)
+
+Category columns are u8 codes with their labels in the manifest. String
+columns are stored as one utf-8 byte array plus i64 offsets, like Arrow.
+
+Formats:
+    npy      <name>.sparchive/ with one .npy per column and manifest.json.
+             load_archive memory-maps every column, so opening a
+             multi-hour mission costs milliseconds. This is the default.
+    npz      one compressed <name>.npz for copying off the robot; columns
+             are decompressed when first accessed.
+    parquet  <name>.parquet/ with one file per table (needs pyarrow).
+
+    python3 telemetry_export.py ~/Traces/2024-05-01-14.02.11.sptrace
+    python3 telemetry_export.py mission.sptrace --format npz --logs spy_logs.json --events events.json
+    python3 telemetry_export.py --info ~/Traces/2024-05-01-14.02.11.sparchive
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from logger import LOG_FILE_PATH
+from mission_trace import DISTANCE, FRAME, MOVEMENT, read_trace, trace_header
+from timeline_aggregates import parse_timestamp
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+ARCHIVE_FORMAT = "spyrobot-archive"
+ARCHIVE_VERSION = 1
+MANIFEST = "manifest.json"
+NPZ_MANIFEST_KEY = "__manifest__"
+FORMATS = ("npy", "npz", "parquet")
+EXTENSIONS = {"npy": ".sparchive", "npz": ".npz", "parquet": ".parquet"}
+LOG_MARGIN = 2.0   # seconds around the trace span whose log entries belong to the mission
+
+SEVERITIES = ["info", "warning", "critical"]
+LOG_TYPES = ["auto", "manual"]
+
+
+# ----------------------------------------------------------------------
+# Column building
+# ----------------------------------------------------------------------
+def _categorical(values, known=()):
+    """u8 codes and labels; `known` labels keep fixed codes across archives."""
+    labels = list(known)
+    index = {label: i for i, label in enumerate(labels)}
+    codes = np.empty(len(values), dtype=np.uint8)
+    for i, value in enumerate(values):
+        value = "" if value is None else str(value)
+        if value not in index:
+            if len(labels) == 256:
+                raise ValueError(f"More than 256 categories (at '{value}')")
+            index[value] = len(labels)
+            labels.append(value)
+        codes[i] = index[value]
+    return {"kind": "category", "codes": codes, "labels": labels}
+
+
+def _strings(values):
+    """utf-8 bytes + offsets (len + 1) of a list of strings."""
+    encoded = [("" if value is None else str(value)).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return {"kind": "string", "data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "offsets": offsets}
+
+
+def trace_tables(path):
+    """distance / movement / frames / detections column dicts from a mission trace."""
+    distance_t, distance = [], []
+    movement_t, actions, speeds = [], [], []
+    frame_t, frame_ids, faces, known = [], [], [], []
+    detections = []   # (t, frame_id, x, y, w, h, known, confidence)
+
+    for record in read_trace(path):
+        if record.kind == DISTANCE:
+            distance_t.append(record.timestamp)
+            distance.append(record.data)
+        elif record.kind == MOVEMENT:
+            movement_t.append(record.timestamp)
+            actions.append(record.data[0])
+            speeds.append(record.data[1])
+        elif record.kind == FRAME:
+            frame_id, dets = record.data
+            frame_t.append(record.timestamp)
+            frame_ids.append(frame_id)
+            faces.append(len(dets))
+            known.append(sum(1 for det in dets if det[4]))
+            detections.extend((record.timestamp, frame_id) + tuple(det) for det in dets)
+
+    dets = np.array(detections, dtype=np.float64).reshape(-1, 8)
+    tables = {
+        "distance": {
+            "t": np.array(distance_t, dtype=np.float64),
+            "distance": np.array(distance, dtype=np.float32),
+        },
+        "movement": {
+            "t": np.array(movement_t, dtype=np.float64),
+            "action": _categorical(actions),
+            "speed": np.array(speeds, dtype=np.uint16),
+        },
+        "frames": {
+            "t": np.array(frame_t, dtype=np.float64),
+            "frame_id": np.array(frame_ids, dtype=np.int64),
+            "faces": np.array(faces, dtype=np.uint8),
+            "known": np.array(known, dtype=np.uint8),
+        },
+        "detections": {
+            "t": dets[:, 0].copy(),
+            "frame_id": dets[:, 1].astype(np.int64),
+            "x": dets[:, 2].astype(np.float32),
+            "y": dets[:, 3].astype(np.float32),
+            "w": dets[:, 4].astype(np.float32),
+            "h": dets[:, 5].astype(np.float32),
+            "known": dets[:, 6] > 0,
+            "confidence": dets[:, 7].astype(np.float32),
+        },
+    }
+    # Frames are traced from another thread with their capture time, so file order
+    # is only nearly chronological; Table.between() needs sorted t
+    return {name: _sort_by_time(columns) for name, columns in tables.items()}
+
+
+def _sort_by_time(columns):
+    order = np.argsort(columns["t"], kind="stable")
+    if np.all(order[1:] > order[:-1]):
+        return columns
+    return {name: column[order] if isinstance(column, np.ndarray)
+            else dict(column, codes=column["codes"][order])
+            for name, column in columns.items()}
+
+
+def _load_entries(path, start, end):
+    """Entries of a JSON list file timestamped within [start, end], oldest first."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        try:
+            entries = json.load(f)
+        except json.JSONDecodeError:
+            return []
+    selected = []
+    for entry in entries:
+        try:
+            t = parse_timestamp(entry.get("timestamp"))
+        except (ValueError, AttributeError):
+            continue
+        if t is not None and start <= t <= end:
+            selected.append((t, entry))
+    selected.sort(key=lambda item: item[0])
+    return selected
+
+
+def log_tables(logs_path, events_path, start, end):
+    logs = _load_entries(logs_path, start, end)
+    events = _load_entries(events_path, start, end)
+    return {
+        "logs": {
+            "t": np.array([t for t, _ in logs], dtype=np.float64),
+            "type": _categorical([e.get("type") for _, e in logs], LOG_TYPES),
+            "severity": _categorical([e.get("severity", "info") for _, e in logs], SEVERITIES),
+            "description": _strings([e.get("description") for _, e in logs]),
+        },
+        "events": {
+            "t": np.array([t for t, _ in events], dtype=np.float64),
+            "type": _categorical([e.get("type") for _, e in events], LOG_TYPES),
+            "id": _strings([e.get("id") for _, e in events]),
+            "description": _strings([e.get("description") for _, e in events]),
+        },
+    }
+
+
+def build_tables(trace_path, logs_path=None, events_path=None):
+    """All tables of one mission plus its (start, end) time span."""
+    tables = trace_tables(trace_path)
+    start = trace_header(trace_path)["started"]
+    end = max([start] + [float(table["t"][-1]) for table in tables.values() if len(table["t"])])
+    tables.update(log_tables(logs_path, events_path, start - LOG_MARGIN, end + LOG_MARGIN))
+    return tables, (start, end)
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+def _flatten(tables):
+    """(manifest tables, {key: array}) with keys <table>.<column>[.data|.offsets]."""
+    described, arrays = {}, {}
+    for table_name, columns in tables.items():
+        info = {"rows": len(columns["t"]), "columns": {}}
+        for name, column in columns.items():
+            key = f"{table_name}.{name}"
+            if isinstance(column, np.ndarray):
+                arrays[key] = column
+                info["columns"][name] = {"kind": "plain", "dtype": column.dtype.str}
+            elif column["kind"] == "category":
+                arrays[key] = column["codes"]
+                info["columns"][name] = {"kind": "category", "dtype": "|u1",
+                                         "labels": column["labels"]}
+            else:
+                arrays[key + ".data"] = column["data"]
+                arrays[key + ".offsets"] = column["offsets"]
+                info["columns"][name] = {"kind": "string"}
+        described[table_name] = info
+    return described, arrays
+
+
+def write_archive(tables, span, output, fmt="npy", source=None):
+    """Write `tables` to `output` in `fmt`. Returns the manifest."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+    if fmt == "parquet" and pa is None:
+        raise RuntimeError("The parquet format needs pyarrow (pip install pyarrow)")
+    described, arrays = _flatten(tables)
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "storage": fmt,
+        "created": time.time(),
+        "mission": {"start": span[0], "end": span[1]},
+        "source": source or {},
+        "tables": described,
+    }
+
+    # Written beside the target and renamed, so a reader never sees half an archive
+    tmp_path = output + ".tmp"
+    if os.path.isdir(tmp_path):
+        shutil.rmtree(tmp_path)
+    if fmt == "npz":
+        arrays[NPZ_MANIFEST_KEY] = np.frombuffer(json.dumps(manifest).encode("utf-8"), dtype=np.uint8)
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+    else:
+        os.makedirs(tmp_path)
+        if fmt == "npy":
+            for key, array in arrays.items():
+                np.save(os.path.join(tmp_path, key + ".npy"), np.ascontiguousarray(array))
+        else:
+            for table_name, columns in tables.items():
+                pq.write_table(_arrow_table(columns), os.path.join(tmp_path, table_name + ".parquet"),
+                               compression="zstd")
+        with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    os.replace(tmp_path, output)
+    return manifest
+
+
+def _arrow_table(columns):
+    arrays, names = [], []
+    for name, column in columns.items():
+        if isinstance(column, np.ndarray):
+            arrays.append(pa.array(column))
+        elif column["kind"] == "category":
+            arrays.append(pa.array(column["codes"]))   # labels live in the manifest
+        else:
+            arrays.append(pa.LargeStringArray.from_buffers(
+                len(column["offsets"]) - 1, pa.py_buffer(column["offsets"]),
+                pa.py_buffer(column["data"])))
+        names.append(name)
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def export_mission(trace_path, output=None, fmt="npy", logs_path=LOG_FILE_PATH,
+                   events_path=None):
+    """Trace (+ logs/events) -> archive next to the trace unless `output` is given."""
+    output = output or os.path.splitext(trace_path)[0] + EXTENSIONS[fmt]
+    tables, span = build_tables(trace_path, logs_path, events_path)
+    source = {"trace": os.path.abspath(trace_path), "logs": logs_path, "events": events_path}
+    write_archive(tables, span, output, fmt, source)
+    return output
+
+
+# ----------------------------------------------------------------------
+# Loading
+# ----------------------------------------------------------------------
+class StringColumn:
+    """Lazy view of a string column: indexing decodes only the rows asked for."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def contains(self, text):
+        """Boolean mask of rows containing `text`, found without decoding every row."""
+        needle = text.encode("utf-8")
+        blob = bytes(self.data)
+        mask = np.zeros(len(self), dtype=bool)
+        start = blob.find(needle)
+        while start != -1:
+            row = int(np.searchsorted(self.offsets, start, side="right")) - 1
+            if start + len(needle) <= self.offsets[row + 1]:
+                mask[row] = True
+                start = blob.find(needle, start + 1)
+            else:
+                start = blob.find(needle, int(self.offsets[row + 1]))
+        return mask
+
+
+class Table:
+    def __init__(self, name, info, get):
+        self.name = name
+        self.rows = info["rows"]
+        self._info = info["columns"]
+        self._get = get   # key -> numpy array
+        self._cache = {}
+
+    @property
+    def columns(self):
+        return list(self._info)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        """Plain and category columns as numpy arrays (codes), strings as StringColumn."""
+        if name not in self._cache:
+            kind = self._info[name]["kind"]
+            key = f"{self.name}.{name}"
+            if kind == "string":
+                self._cache[name] = StringColumn(self._get(key + ".data"), self._get(key + ".offsets"))
+            else:
+                self._cache[name] = self._get(key)
+        return self._cache[name]
+
+    def labels(self, name):
+        """Labels of a category column; labels(name)[codes] decodes it."""
+        return np.array(self._info[name]["labels"], dtype=object)
+
+    def code(self, name, label):
+        """Code of `label` in a category column, or -1 if it never occurs."""
+        labels = self._info[name]["labels"]
+        return labels.index(label) if label in labels else -1
+
+    def between(self, start, end):
+        """Row slice with start <= t < end (t is sorted)."""
+        t = self["t"]
+        return slice(int(np.searchsorted(t, start)), int(np.searchsorted(t, end)))
+
+
+class MissionArchive:
+    def __init__(self, path):
+        self.path = path
+        self._npz = None
+        self._parquet = {}
+        if os.path.isdir(path):
+            with open(os.path.join(path, MANIFEST), "r") as f:
+                self.manifest = json.load(f)
+        else:
+            self._npz = np.load(path)
+            self.manifest = json.loads(bytes(self._npz[NPZ_MANIFEST_KEY]).decode("utf-8"))
+        if self.manifest.get("format") != ARCHIVE_FORMAT:
+            raise ValueError(f"{path} is not a mission archive")
+        self.tables = {name: Table(name, info, self._column)
+                       for name, info in self.manifest["tables"].items()}
+
+    def _column(self, key):
+        storage = self.manifest["storage"]
+        if storage == "npz":
+            return self._npz[key]
+        if storage == "npy":
+            return np.load(os.path.join(self.path, key + ".npy"), mmap_mode="r")
+        return self._parquet_column(key)
+
+    def _parquet_column(self, key):
+        if pq is None:
+            raise RuntimeError("Reading a parquet archive needs pyarrow")
+        table_name, name, *part = key.split(".")
+        if table_name not in self._parquet:
+            self._parquet[table_name] = pq.read_table(
+                os.path.join(self.path, table_name + ".parquet"), memory_map=True)
+        column = self._parquet[table_name].column(name).combine_chunks()
+        if part:
+            # large_string buffers: validity, i64 offsets, utf-8 data
+            _, offsets, data = column.buffers()
+            if part == ["offsets"]:
+                return np.frombuffer(offsets, dtype=np.int64)[column.offset:column.offset + len(column) + 1]
+            return np.empty(0, np.uint8) if data is None else np.frombuffer(data, dtype=np.uint8)
+        return column.to_numpy(zero_copy_only=False)
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    @property
+    def start(self):
+        return self.manifest["mission"]["start"]
+
+    @property
+    def end(self):
+        return self.manifest["mission"]["end"]
+
+    def summary(self):
+        return {
+            "path": self.path,
+            "storage": self.manifest["storage"],
+            "duration_s": round(self.end - self.start, 1),
+            "rows": {name: table.rows for name, table in self.tables.items()},
+        }
+
+    def close(self):
+        if self._npz is not None:
+            self._npz.close()
+        self._parquet.clear()
+
+
+def load_archive(path):
+    """Open an archive written by write_archive (any format)."""
+    return MissionArchive(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a mission trace to a columnar archive")
+    parser.add_argument("path", help="mission trace (.sptrace), or an archive with --info")
+    parser.add_argument("--output", "-o", help="archive path (default: next to the trace)")
+    parser.add_argument("--format", choices=FORMATS, default="npy")
+    parser.add_argument("--logs", default=LOG_FILE_PATH, help="spy_logs.json to take log entries from")
+    parser.add_argument("--events", help="events.json to take manual events from")
+    parser.add_argument("--info", action="store_true", help="open an archive and print its summary")
+    args = parser.parse_args()
+
+    if args.info:
+        start = time.perf_counter()
+        archive = load_archive(args.path)
+        for table in archive.tables.values():
+            for name in table.columns:
+                table[name]
+        summary = archive.summary()
+        summary["open_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+        print(json.dumps(summary, indent=2))
+        return
+
+    start = time.perf_counter()
+    output = export_mission(args.path, args.output, args.format, args.logs, args.events)
+    size = (sum(os.path.getsize(os.path.join(output, f)) for f in os.listdir(output))
+            if os.path.isdir(output) else os.path.getsize(output))
+    print(f"Wrote {output} ({size / 1024:.0f} KB, trace {os.path.getsize(args.path) / 1024:.0f} KB) "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# timeline_aggregates.py
+"""
+Rolling per-minute and per-hour log counts for the Timeline view.
+
+Every new log entry bumps one minute bucket and one hour bucket (keyed
+by the bucket's start time in epoch seconds) for its severity and type.
+A histogram query walks the requested range one bucket at a time with a
+dict lookup each, so its cost depends on the number of buckets returned,
+not on how many log entries the mission produced.
+"""
+import threading
+import time
+
+MINUTE = 60
+HOUR = 3600
+RESOLUTIONS = {"minute": MINUTE, "hour": HOUR}
+
+MAX_BUCKETS = 500
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_timestamp(value):
+    """'YYYY-MM-DD HH:MM:SS' / 'YYYY-MM-DD' (local time) or epoch seconds -> epoch seconds."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip().replace("T", " ")
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    fmt = TIMESTAMP_FORMAT if len(value) > 10 else "%Y-%m-%d"
+    return time.mktime(time.strptime(value, fmt))
+
+
+class TimelineAggregates:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # resolution seconds -> {bucket_start: {"total": n, "severity": {...}, "type": {...}}}
+        self._buckets = {MINUTE: {}, HOUR: {}}
+        self.first_ts = None
+        self.last_ts = None
+
+    def add(self, entry):
+        """Count one log entry (as produced by append_log)."""
+        try:
+            ts = parse_timestamp(entry.get("timestamp"))
+        except ValueError:
+            return
+        if ts is None:
+            return
+        severity = entry.get("severity", "info")
+        log_type = entry.get("type", "auto")
+        with self._lock:
+            for resolution, buckets in self._buckets.items():
+                start = int(ts // resolution * resolution)
+                bucket = buckets.get(start)
+                if bucket is None:
+                    bucket = buckets[start] = {"total": 0, "severity": {}, "type": {}}
+                bucket["total"] += 1
+                bucket["severity"][severity] = bucket["severity"].get(severity, 0) + 1
+                bucket["type"][log_type] = bucket["type"].get(log_type, 0) + 1
+            if self.first_ts is None or ts < self.first_ts:
+                self.first_ts = ts
+            if self.last_ts is None or ts > self.last_ts:
+                self.last_ts = ts
+
+    def add_many(self, entries):
+        for entry in entries:
+            self.add(entry)
+
+    def histogram(self, start=None, end=None, max_buckets=MAX_BUCKETS, resolution=None):
+        """
+        Counts between `start` and `end` (epoch seconds, default: the whole
+        mission), at most `max_buckets` buckets. Uses minute buckets when they
+        fit, otherwise hour buckets, merging neighbours if there are still too
+        many (output width is always a multiple of the base resolution).
+        `resolution` ("minute" / "hour") picks the base; anything else raises
+        ValueError. Empty buckets are omitted from the result.
+        """
+        if resolution not in (None, "") and resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of: {', '.join(RESOLUTIONS)}")
+        with self._lock:
+            if start is None:
+                start = self.first_ts
+            if end is None:
+                end = self.last_ts
+            if start is None or end is None or end < start:
+                return {"resolution": None, "width": 0, "buckets": []}
+
+            max_buckets = max(1, min(int(max_buckets), MAX_BUCKETS))
+            span = end - start
+            # Minute buckets only while each output bucket covers at most an hour;
+            # beyond that hour buckets give the same picture with 60x fewer lookups
+            if resolution == "hour" or span / MINUTE > max_buckets * (HOUR // MINUTE):
+                base = HOUR
+            elif resolution == "minute" or span / MINUTE <= max_buckets:
+                base = MINUTE
+            else:
+                base = HOUR
+            buckets = self._buckets[base]
+
+            first = int(start // base * base)
+            last = int(end // base * base)
+            n_base = (last - first) // base + 1
+            group = max(1, -(-n_base // max_buckets))  # ceil division
+            width = base * group
+
+            # Only walk the part of the range that can hold data, so a wide
+            # from/to costs no more than the mission itself
+            lo = max(first, int(self.first_ts // base * base))
+            hi = min(last, int(self.last_ts // base * base))
+            out = []
+            for out_start in range(first + max(0, lo - first) // width * width, hi + 1, width):
+                total = 0
+                severity = {}
+                log_type = {}
+                for bucket_start in range(out_start, min(out_start + width, last + 1), base):
+                    bucket = buckets.get(bucket_start)
+                    if bucket is None:
+                        continue
+                    total += bucket["total"]
+                    for key, n in bucket["severity"].items():
+                        severity[key] = severity.get(key, 0) + n
+                    for key, n in bucket["type"].items():
+                        log_type[key] = log_type.get(key, 0) + n
+                if total:
+                    out.append({
+                        "start": out_start,
+                        "label": time.strftime(TIMESTAMP_FORMAT, time.localtime(out_start)),
+                        "total": total,
+                        "severity": severity,
+                        "type": log_type,
+                    })
+
+        return {
+            "resolution": "minute" if base == MINUTE else "hour",
+            "width": width,
+            "from": first,
+            "to": last + base,
+            "buckets": out,
+        }
@@ -1,14 +1,46 @@
 #!/usr/bin/env python3
+"""
+Train the LBPH target model from target_images.
+
+Crops are curated first (dataset_curation.py: blur / exposure pruning,
+near-duplicate removal, optional clustering), since every stored
+histogram costs predict() time on the robot. Training then reports model
+size, predict latency and accuracy for the full and the curated set,
+both trained without every --holdout-th group of crops and tested on
+those groups (plus --negatives images, which should come out UNKNOWN).
+A group is a cluster of dHash near-duplicates, merged with the other
+photos of the same burst (taken less than BURST_GAP seconds apart) when
+capture times tell the photos apart: EXIF DateTimeOriginal if Pillow is
+installed and the file has it, else the file's mtime. Near-identical
+shots therefore never end up on both sides of the split.
+
+    python3 train_lbph.py
+    python3 train_lbph.py --clusters 12 --negatives ~/negative_images
+    python3 train_lbph.py --no-curate
+"""
+import argparse
 import os
+import tempfile
+import time
+from datetime import datetime
 import cv2
 import numpy as np
 
-# Path to your Haar cascade XML
-CASCADE_PATH = os.path.expanduser("/home/spyrobot/CPSC584_spyrobot/cascades/haarcascade_frontalface_default.xml")
-face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from face_detectors import create_detector, DETECTORS
+from dataset_curation import curate, duplicate_clusters, join_groups, MIN_SHARPNESS, DEDUP_DISTANCE
+from detection_pool import KNOWN_THRESHOLD
 
 DATASET_PATH = os.path.expanduser("/home/spyrobot/CPSC584_spyrobot/target_images")
 MODEL_SAVE_PATH = os.path.expanduser("/home/spyrobot/CPSC584_spyrobot/trained_model.yml")
+BURST_GAP = 2.0  # seconds between capture times that start a new burst
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_DATETIME = 0x0132
 
 # Initialize LBPH face recognizer
 recognizer = cv2.face.LBPHFaceRecognizer_create()
@@ -19,62 +51,201 @@ labels = []
 # We'll use "1" as the label ID for this target
 TARGET_LABEL_ID = 1
 
-def detect_and_crop_face(img):
+def detect_and_crop_face(img, detector):
     """
-    Detect the largest face in the given color image using Haar cascade,
-    then return the grayscale cropped face region resized to 200x200.
+    Detect a face in the given color image using the selected detector
+    backend (same one used live in video_stream.py), then return the
+    grayscale cropped face region resized to 200x200.
     If no face is found, returns None.
     """
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(50, 50)
-    )
+    faces = detector.detect(img, gray)
     if len(faces) == 0:
         return None
 
     # Option 1: just grab the first face
     # Option 2: grab the largest face
     # Here we just pick the first face found:
-    (x, y, w, h) = faces[0]
+    (x, y, w, h, _) = faces[0]
 
     # Crop and resize
     face_roi = gray[y:y+h, x:x+w]
     face_roi = cv2.resize(face_roi, (200, 200))
     return face_roi
 
-def main():
-    # Go through each image in the dataset folder
-    files = os.listdir(DATASET_PATH)
-    image_count = 0
-    for file in files:
+def capture_time(path):
+    """EXIF capture time of a photo (seconds since the epoch), else its mtime."""
+    if Image is not None:
+        try:
+            with Image.open(path) as img:
+                exif = img.getexif()
+                stamp = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+            if stamp:
+                return datetime.strptime(str(stamp).strip(), "%Y:%m:%d %H:%M:%S").timestamp()
+        except (OSError, ValueError):
+            pass
+    return os.path.getmtime(path)
+
+def load_crops(folder, detector):
+    """
+    Face crops of every readable image in `folder`, in file name order,
+    and the capture time of each crop's photo (see capture_time).
+    """
+    crops = []
+    times = []
+    for file in sorted(os.listdir(folder)):
         if file.lower().endswith(('.jpg', '.png', '.jpeg')):
-            img_path = os.path.join(DATASET_PATH, file)
+            img_path = os.path.join(folder, file)
             img = cv2.imread(img_path)
             if img is None:
                 print(f"[WARNING] Could not read {img_path}, skipping...")
                 continue
 
-            face_crop = detect_and_crop_face(img)
+            face_crop = detect_and_crop_face(img, detector)
             if face_crop is not None:
-                training_images.append(face_crop)
-                labels.append(TARGET_LABEL_ID)
-                image_count += 1
+                crops.append(face_crop)
+                times.append(capture_time(img_path))
                 print(f"[INFO] Processed face from {file}")
             else:
                 print(f"[WARNING] No face found in {file}, skipping...")
+    return crops, times
+
+def burst_groups(times, gap=BURST_GAP):
+    """Crop indices grouped into bursts: runs of photos taken less than `gap` seconds apart."""
+    groups = []
+    last = None
+    for i in sorted(range(len(times)), key=lambda i: times[i]):
+        if last is None or times[i] - last > gap:
+            groups.append([])
+        groups[-1].append(i)
+        last = times[i]
+    return groups
+
+def holdout_groups(crops, times, dedup_distance):
+    """
+    Crop indices that must stay on the same side of the split: dHash
+    near-duplicate clusters, joined per burst if the capture times form
+    more than one burst (photos checked out or copied together share one
+    mtime, which says nothing about when they were taken).
+    """
+    clusters = duplicate_clusters(crops, dedup_distance)
+    bursts = burst_groups(times)
+    if len(bursts) < 2:
+        return clusters
+    return join_groups(len(crops), clusters + bursts)
+
+def holdout_split(crops, times, holdout, dedup_distance):
+    """
+    (train, held) crop indices: every `holdout`-th group of holdout_groups()
+    is held out. Returns None if there are fewer than two groups.
+    """
+    groups = holdout_groups(crops, times, dedup_distance)
+    if len(groups) < 2:
+        return None
+    held_groups = set(range(0, len(groups), holdout)) if len(groups) > holdout else {len(groups) // 2}
+    train = sorted(i for g, group in enumerate(groups) if g not in held_groups for i in group)
+    held = sorted(i for g, group in enumerate(groups) if g in held_groups for i in group)
+    print(f"[INFO] Holdout: {len(groups)} groups, {len(held_groups)} held out ({len(held)} crops)")
+    return train, held
+
+def evaluate(crops, crop_labels, positives, negatives):
+    """
+    Train a throwaway model on `crops` and measure it the way video_stream.py
+    uses it: a face is the target if its distance is below KNOWN_THRESHOLD.
+    """
+    model = cv2.face.LBPHFaceRecognizer_create()
+    model.train(crops, np.array(crop_labels))
+    with tempfile.NamedTemporaryFile(suffix=".yml") as f:
+        model.save(f.name)
+        size = os.path.getsize(f.name)
+
+    correct = 0
+    latencies = []
+    for face, target in [(p, True) for p in positives] + [(n, False) for n in negatives]:
+        start = time.perf_counter()
+        label, confidence = model.predict(face)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        known = label == TARGET_LABEL_ID and confidence < KNOWN_THRESHOLD
+        correct += known == target
+    tested = len(positives) + len(negatives)
+    return {
+        "histograms": len(crops),
+        "size_kb": size / 1024.0,
+        "predict_ms": float(np.mean(latencies)) if latencies else float("nan"),
+        "accuracy": correct / tested if tested else float("nan"),
+    }
+
+def report(full, curated, tested):
+    print(f"[INFO] Evaluated on {tested} held-out faces")
+    print(f"{'set':<9} {'hists':>6} {'size KB':>9} {'predict ms':>11} {'accuracy':>9}")
+    for name, r in (("full", full), ("curated", curated)):
+        print(f"{name:<9} {r['histograms']:6d} {r['size_kb']:9.1f} {r['predict_ms']:11.2f} "
+              f"{r['accuracy'] * 100:8.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the LBPH target model")
+    parser.add_argument("--detector", choices=sorted(DETECTORS),
+                        help="face detector backend (default: $SPYROBOT_DETECTOR or haar)")
+    parser.add_argument("--no-curate", action="store_true",
+                        help="train on every crop, as before")
+    parser.add_argument("--min-sharpness", type=float, default=MIN_SHARPNESS,
+                        help=f"variance-of-Laplacian floor (default {MIN_SHARPNESS})")
+    parser.add_argument("--dedup-distance", type=int, default=DEDUP_DISTANCE,
+                        help=f"dHash bits under which crops are duplicates (default {DEDUP_DISTANCE})")
+    parser.add_argument("--clusters", type=int, default=0,
+                        help="keep this many k-means representatives (default 0 = off)")
+    parser.add_argument("--holdout", type=int, default=5,
+                        help="every Nth burst is held out for the report (0 = no report)")
+    parser.add_argument("--negatives", help="folder of non-target faces for the report")
+    args = parser.parse_args()
+    detector = create_detector(args.detector)
+    print(f"[INFO] Using {detector.name} face detector")
+
+    # Go through each image in the dataset folder
+    crops, times = load_crops(DATASET_PATH, detector)
+    training_images.extend(crops)
+    labels.extend([TARGET_LABEL_ID] * len(training_images))
+    image_count = len(training_images)
 
     if image_count == 0:
         print("[ERROR] No faces were processed. Training aborted.")
         return
 
+    def select(crops, crop_labels):
+        if args.no_curate:
+            return list(range(len(crops))), None
+        return curate(crops, crop_labels, args.min_sharpness, args.dedup_distance, args.clusters)
+
+    keep, pruned = select(training_images, labels)
+    if pruned is not None:
+        print(f"[INFO] Curation: {pruned['input']} crops, {pruned['low_quality']} low quality, "
+              f"{pruned['duplicates']} duplicates, {pruned['clustered_out']} clustered out, "
+              f"{pruned['kept']} kept")
+
+    # Before/after report on a held-out split (the saved model uses every crop)
+    split = None
+    if args.holdout > 1 and image_count > args.holdout:
+        split = holdout_split(training_images, times, args.holdout, args.dedup_distance)
+        if split is None:
+            print("[WARNING] All crops are near-duplicates of one another; skipping the holdout report")
+    if split is not None:
+        train, held = split
+        train_crops = [training_images[i] for i in train]
+        train_labels = [labels[i] for i in train]
+        negatives = load_crops(args.negatives, detector)[0] if args.negatives else []
+        positives = [training_images[i] for i in held]
+        full = evaluate(train_crops, train_labels, positives, negatives)
+        split_keep, _ = select(train_crops, train_labels)
+        curated = evaluate([train_crops[i] for i in split_keep], [train_labels[i] for i in split_keep],
+                           positives, negatives)
+        report(full, curated, len(positives) + len(negatives))
+
     # Train the LBPH recognizer
-    print(f"[INFO] Training on {image_count} face images...")
-    recognizer.train(training_images, np.array(labels))
+    print(f"[INFO] Training on {len(keep)} of {image_count} face images...")
+    recognizer.train([training_images[i] for i in keep], np.array([labels[i] for i in keep]))
     recognizer.save(MODEL_SAVE_PATH)
-    print(f"[INFO] Training complete. Model saved to {MODEL_SAVE_PATH}")
+    size_kb = os.path.getsize(MODEL_SAVE_PATH) / 1024.0
+    print(f"[INFO] Training complete. Model saved to {MODEL_SAVE_PATH} ({size_kb:.0f} KB)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+import argparse
+import itertools
 import threading
 import time
 import signal
@@ -9,9 +11,22 @@ import cv2
 import numpy as np
 from vilib import Vilib
 from os import getlogin, makedirs, path
-
-# If you have a logger, import your append_log
-# from logger import append_log
+from frame_bus import FrameBus, FrameBusClosed
+from face_detectors import create_detector, DETECTORS
+from recording_thumbnails import ThumbnailRecorder
+from detection_timeline import DetectionTimeline
+from frame_pacing import FramePacer, write_stats
+from mission_logic import FacePresenceLogic
+from detection_pool import (DetectionPool, default_workers, detect_faces, load_recognizer,
+                            recognize_face, SKIPPED, STATS_PATH as DETECTION_STATS_PATH)
+from governor import LEVELS, QualityWatcher, get_level, read_quality_level
+from face_tracker import FaceTracker
+from capture_profiles import (PROFILES, DEFAULT_PROFILE, FULL_BUS_NAME, ANALYSIS_BUS_NAME,
+                              ProfileWatcher, analysis_size, get_profile,
+                              read_requested_profile, scale_detections)
+
+# append_log never blocks: records go to server.py's log sink over a unix socket
+from logger import append_log
 
 USERNAME = getlogin()
 VIDEO_PATH = f"/home/{USERNAME}/Videos/"
@@ -22,109 +37,166 @@ recording_active = False
 stop_recording = False
 vname = None
 
+RECORD_FPS = 20.0
+STATS_INTERVAL = 1.0  # seconds between recorder stats updates
+FFMPEG_NICE = 10      # transcoding runs below everything else
+
 ##############################
 # Example Face Recognition Setup
 ##############################
-try:
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
-    recognizer.read('trained_model.yml')
+recognizer = load_recognizer('trained_model.yml')
+if recognizer is not None:
     print("LBPH model loaded successfully.")
-except Exception as e:
-    print("Error loading LBPH model:", e)
-    recognizer = None
-
-# Haar cascade for face detection
-cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-face_cascade = cv2.CascadeClassifier(cascade_path)
 
-# Optional logging/time checks
-last_known_face_time = 0
-known_face_logged = False
-last_unknown_face_time = 0
-unknown_face_logged = False
-last_no_face_time = 0
-no_face_logged = False
-
-def custom_face_detect_func(frame):
+# Face detector backend: haar (default), lbp or dnn; see face_detectors.py
+face_detector = create_detector()
+print("Face detector:", face_detector.name)
+
+# Worker processes running detection (None = inline in the capture thread)
+detection_pool = None
+
+# Faces followed across frames; LBPH runs per track and the label is a vote (face_tracker.py)
+face_tracker = FaceTracker()
+
+# Quality level set by server.py's governor (detection rate/size, recording encode), see governor.py
+quality_level = LEVELS[0]
+# Detections of the last analysed frame, carried over frames the quality level skips
+last_detections = []
+# Tracking, presence logging and last_detections: the capture thread detects inline
+# and the pool's collector thread delivers results, briefly both when the pool fails
+detection_lock = threading.Lock()
+
+# Optional logging/time checks (known / unknown / no face for > 1s, see mission_logic.py)
+face_presence = FacePresenceLogic()
+
+# Capture profile (camera size + analysis size), see capture_profiles.py
+capture_profile = PROFILES[DEFAULT_PROFILE]
+
+# Shared-memory rings that server.py reads frames from (created on first frame):
+# FULL_BUS_NAME carries camera-size frames, ANALYSIS_BUS_NAME the downscaled ones
+frame_buses = {}
+frame_bus_lock = threading.Lock()
+# Frame ids keep counting across bus re-creation so readers never see them go back
+frame_ids = itertools.count()
+
+def _publish(name, image, detections, timestamp, frame_id):
+    bus = frame_buses.get(name)
+    if bus is None or bus.shape[:2] != image.shape[:2]:
+        if bus is not None:
+            bus.close()
+        bus = frame_buses[name] = FrameBus.create(image.shape, name=name)
+        print("Frame bus created:", bus.name, image.shape)
+    bus.publish(image, detections, timestamp=timestamp, frame_id=frame_id)
+
+def publish_frame(full, analysis, detections, timestamp=None):
     """
-    Example detection pipeline:
-    1) Convert to grayscale & detect faces
-    2) Optionally do LBPH recognition
-    3) Optionally log events
+    Copy both frames (before any overlay is drawn) plus their detections into
+    the shared frame buses so other processes can use them without opening the camera.
+    `detections` are in analysis-frame coordinates; the full bus gets them scaled up.
     """
-    global last_known_face_time, known_face_logged
-    global last_unknown_face_time, unknown_face_logged
-    global last_no_face_time, no_face_logged
+    with frame_bus_lock:
+        try:
+            if timestamp is None:
+                timestamp = time.time()
+            frame_id = next(frame_ids)
+            _publish(ANALYSIS_BUS_NAME, analysis, detections, timestamp, frame_id)
+            _publish(FULL_BUS_NAME, full, scale_detections(detections, analysis.shape, full.shape),
+                     timestamp, frame_id)
+        except Exception as e:
+            print("Frame bus publish error:", e)
 
-    if recognizer is None:
+def make_analysis_frame(frame):
+    """Downscaled copy of a camera frame for detection and streaming (the frame itself if already small)."""
+    size = analysis_size(frame.shape, capture_profile)
+    if size == (frame.shape[1], frame.shape[0]):
         return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(
-        gray, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50)
-    )
-
-    found_known = False
-    found_unknown = False
-
-    for (x, y, w, h) in faces:
-        face_roi = gray[y:y+h, x:x+w]
-        face_roi = cv2.resize(face_roi, (200, 200))
-        label, confidence = recognizer.predict(face_roi)
-
-        if label == 1 and confidence < 65:
+def draw_detections(frame, detections):
+    """Draw TARGET / UNKNOWN boxes for (x, y, w, h, known, confidence) detections."""
+    for det in detections:
+        x, y, w, h = (int(v) for v in det[:4])
+        if det[4]:
             # This is our "known" target
-            found_known = True
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
             cv2.putText(frame, "TARGET", (x, y - 10),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
         else:
-            found_unknown = True
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 0, 255), 2)
             cv2.putText(frame, "UNKNOWN", (x, y - 10),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
 
-    # Example: do some logging after 1s
-    current_time = time.time()
-    any_face_found = (found_known or found_unknown)
-
-    # Known face logic
-    if found_known:
-        if last_known_face_time == 0:
-            last_known_face_time = current_time
-        if (current_time - last_known_face_time) >= 1.0 and not known_face_logged:
-            # append_log("Mission success: target face confirmed > 1s!", log_type='auto', severity='success')
-            known_face_logged = True
-    else:
-        last_known_face_time = 0
-        known_face_logged = False
-
-    # Unknown face logic
-    if found_unknown:
-        if last_unknown_face_time == 0:
-            last_unknown_face_time = current_time
-        if (current_time - last_unknown_face_time) >= 1.0 and not unknown_face_logged:
-            # append_log("Warning: unknown face detected > 1s.", log_type='auto', severity='warning')
-            unknown_face_logged = True
-    else:
-        last_unknown_face_time = 0
-        unknown_face_logged = False
-
-    # No face logic
-    if not any_face_found:
-        if last_no_face_time == 0:
-            last_no_face_time = current_time
-        if (current_time - last_no_face_time) >= 1.0 and not no_face_logged:
-            # append_log("No face detected > 1s. Scene is clear.", log_type='auto', severity='info')
-            no_face_logged = True
-    else:
-        last_no_face_time = 0
-        no_face_logged = False
+def track_faces(full, analysis, faces, now):
+    """
+    Match detector boxes to face tracks; LBPH (on the full-resolution crop)
+    only runs for tracks due a refresh. Returns (x, y, w, h, known, confidence)
+    per face in analysis coordinates.
+    """
+    return face_tracker.update(
+        faces, now, lambda box: recognize_face(full, analysis.shape, box, recognizer))
+
+def publish_skipped(full, analysis, timestamp=None):
+    """A frame the quality level does not analyse: published with the last detections."""
+    publish_frame(full, analysis, last_detections, timestamp)
+    draw_detections(full, scale_detections(last_detections, analysis.shape, full.shape))
+
+def custom_face_detect_func(frame, detect):
+    """
+    Example detection pipeline, run inline by frame_capture_service (once per camera frame):
+    1) Downscale to the analysis size, convert to grayscale & detect faces
+    2) Optionally do LBPH recognition (per face track, see face_tracker.py)
+    3) Publish the clean frames + detections to the frame buses
+    4) Optionally log events
+    """
+    global last_detections
+    analysis = make_analysis_frame(frame)
+
+    if recognizer is None:
+        publish_frame(frame, analysis, [])
+        return frame
+
+    if not detect:
+        with detection_lock:
+            publish_skipped(frame, analysis)
+        return frame
+
+    # (x, y, w, h, known, confidence) per face in analysis coordinates
+    now = time.time()
+    faces = detect_faces(analysis, face_detector, quality_level.detect_scale)
+    with detection_lock:
+        detections = last_detections = track_faces(frame, analysis, faces, now)
+        publish_frame(frame, analysis, detections, now)
+        draw_detections(frame, scale_detections(detections, analysis.shape, frame.shape))
+
+        # Example: do some logging after 1s
+        for msg, severity in face_presence.update(detections, now):
+            append_log(msg, log_type='auto', severity=severity)
 
     return frame
 
-# Hook it into Vilib
-Vilib.face_detect_func = custom_face_detect_func
+def handle_pool_result(full, analysis, faces, timestamp):
+    """
+    DetectionPool callback, called in frame order: the same tracking, publish,
+    overlay and logging steps as custom_face_detect_func, stamped with the
+    capture time.
+    """
+    global last_detections
+    if recognizer is None or faces is None:
+        publish_frame(full, analysis, [], timestamp)
+        return
+    with detection_lock:
+        if faces is SKIPPED:
+            publish_skipped(full, analysis, timestamp)
+            return
+        detections = last_detections = track_faces(full, analysis, faces, timestamp)
+        publish_frame(full, analysis, detections, timestamp)
+        draw_detections(full, scale_detections(detections, analysis.shape, full.shape))
+        for msg, severity in face_presence.update(detections, timestamp):
+            append_log(msg, log_type='auto', severity=severity)
+
+# No Vilib.face_detect_func hook: Vilib would call it on its own thread for
+# every frame, detecting and publishing each one a second time. The boxes
+# drawn above onto Vilib.img are what its web display shows.
 
 def graceful_exit(signum, frame):
     """
@@ -142,11 +214,85 @@ def graceful_exit(signum, frame):
         time.sleep(0.1)
 
     print("Recording loop ended. Exiting now.")
+    if detection_pool is not None:
+        detection_pool.stop()
+    with frame_bus_lock:
+        for bus in frame_buses.values():
+            bus.close()
     sys.exit(0)
 
+def start_camera(profile):
+    """(Re)start the camera at the profile's full resolution."""
+    global capture_profile
+    capture_profile = profile
+    print(f"Starting camera with capture profile '{profile.name}' {profile.full}...")
+    Vilib.camera_start(vflip=False, hflip=False, size=profile.full)
+
+def switch_profile(profile):
+    """
+    Restart the camera at a new size. The buses are re-created by the next
+    publish; an active recording keeps its original frame size.
+    """
+    print(f"Switching capture profile: {capture_profile.name} -> {profile.name}")
+    Vilib.camera_close()
+    start_camera(profile)
+    append_log(f"Capture profile switched to '{profile.name}' "
+               f"({profile.full[0]}x{profile.full[1]}).", log_type='auto', severity='info')
+
+def frame_capture_service():
+    """
+    Run detection exactly once per new camera frame and publish it to the
+    frame bus. Everything downstream (recorder, server) reads from the bus.
+    """
+    last_frame = None
+    last_new_time = time.monotonic()
+    last_sample = None
+    frames = itertools.count()
+    while True:
+        frame = Vilib.img
+        is_new = frame is not None and frame is not last_frame
+        if not is_new and frame is not None and time.monotonic() - last_new_time > 0.1:
+            # Fallback in case the camera refills the same buffer in place
+            sample = frame[::32, ::32].tobytes()
+            is_new = sample != last_sample
+            last_sample = sample
+        if not is_new:
+            time.sleep(0.003)
+            continue
+        last_frame = frame
+        last_new_time = time.monotonic()
+        last_sample = frame[::32, ::32].tobytes()
+        level = quality_level
+        detect = next(frames) % level.detect_every == 0
+        try:
+            if detection_pool is not None and detection_pool.healthy():
+                detection_pool.submit(frame, make_analysis_frame(frame),
+                                      detect=detect, scale=level.detect_scale)
+            else:
+                custom_face_detect_func(frame, detect=detect)
+        except Exception as e:
+            print("Frame capture error:", e)
+
+def next_recorder_frames(bus, last_id, pacer):
+    """
+    Ids of the bus frames the recorder has not consumed yet. Frames that were
+    already overwritten (the recorder fell more than a ring behind) are counted as lost.
+    """
+    latest = bus.wait_for_frame(last_id, timeout=0.5)
+    if latest is None:
+        return []
+    first = last_id + 1 if last_id >= 0 else latest
+    oldest_available = latest - bus.slots + 1
+    if first < oldest_available:
+        pacer.note_lost(oldest_available - first)
+        first = oldest_available
+    return range(first, latest + 1)
+
 def video_record_service():
     """
     1) Record in 'mp4v' (which usually works with OpenCV on a Pi).
+       Every camera frame is taken from the frame bus exactly once and
+       placed on the output timeline by its capture timestamp (FramePacer).
     2) On stop, run ffmpeg to produce H.264 .mp4 for browser playback.
     """
     global recording_active, stop_recording, vname
@@ -159,45 +305,98 @@ def video_record_service():
     print("Starting OpenCV-based recording to (temporary):", raw_file)
 
     writer = None
+    thumbs = ThumbnailRecorder(VIDEO_PATH, vname)
+    sightings = DetectionTimeline(VIDEO_PATH, vname)
+    pacer = FramePacer(RECORD_FPS)
+    last_id = -1
+    last_stats = time.monotonic()
     recording_active = True
 
     try:
         while recording_active and not stop_recording:
-            frame = Vilib.img
-            if frame is not None:
-                if writer is None:
-                    height, width = frame.shape[:2]
-                    fps = 20.0
-                    # We'll use 'mp4v' as a fallback because it's usually supported by Pi's OpenCV.
-                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                    writer = cv2.VideoWriter(raw_file, fourcc, fps, (width, height))
-
-                # Optionally, run detection again here if you want bounding boxes in the recording.
-                processed_frame = custom_face_detect_func(frame)
-                writer.write(processed_frame)
-
-            time.sleep(0.03)
+            # Re-fetched every pass: a profile switch closes the old bus under us
+            with frame_bus_lock:
+                bus = frame_buses.get(FULL_BUS_NAME)
+            if bus is None or bus.closed:
+                time.sleep(0.05)
+                continue
+            try:
+                frame_ids = next_recorder_frames(bus, last_id, pacer)
+                for frame_id in frame_ids:
+                    last_id = frame_id
+                    frame = bus.read(frame_id)
+                    if frame is None:
+                        pacer.note_lost()
+                        continue
+                    repeats = pacer.offer(frame.timestamp)
+                    if repeats == 0:
+                        continue
+
+                    image = frame.image
+                    detections = frame.detections
+                    if writer is None:
+                        height, width = image.shape[:2]
+                        # We'll use 'mp4v' as a fallback because it's usually supported by Pi's OpenCV.
+                        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                        writer = cv2.VideoWriter(raw_file, fourcc, RECORD_FPS, (width, height))
+                    elif image.shape[:2] != (height, width):
+                        # Profile switched mid-recording; the file keeps its size
+                        detections = scale_detections(detections, image.shape, (height, width))
+                        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+                    # Bounding boxes come from the detections published with the frame
+                    draw_detections(image, detections)
+                    for _ in range(repeats):
+                        writer.write(image)
+                    t = frame.timestamp - pacer.t0
+                    thumbs.add(image, t)
+                    sightings.add(t, detections)
+            except FrameBusClosed:
+                # Bus re-created (profile switch); continue from the new bus's newest frame
+                last_id = -1
+
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                last_stats = time.monotonic()
+                write_stats(dict(pacer.stats(), recording=vname, active=True))
     finally:
         if writer is not None:
             writer.release()
+        duration = pacer.written / RECORD_FPS
+        stats = dict(pacer.stats(), recording=vname, active=False)
+        print("Recording stats:", stats)
+        try:
+            write_stats(stats)
+            write_stats(stats, path.join(VIDEO_PATH, f"{vname}_record_stats.json"))
+        except Exception as e:
+            print("Recording stats error:", e)
+        try:
+            thumbs.finish(duration=duration)
+        except Exception as e:
+            print("Thumbnail error:", e)
+        try:
+            sightings.finish(duration)
+        except Exception as e:
+            print("Detection sidecar error:", e)
         recording_active = False
         stop_recording = False
         print("OpenCV recording has stopped. Converting to H.264...")
 
         # --------------------------------------------------------------
         # Use ffmpeg to produce a final .mp4 with H.264 + AAC
+        # (preset/CRF from the quality level; niced so it never starves the robot)
         # --------------------------------------------------------------
         try:
+            level = quality_level
             cmd = [
                 "ffmpeg", "-y",
                 "-i", raw_file,        # input
                 "-c:v", "libx264",
-                "-preset", "fast",
-                "-crf", "23",
+                "-preset", level.record_preset,
+                "-crf", str(level.record_crf),
                 "-c:a", "aac",
                 final_file
             ]
-            subprocess.run(cmd, check=True)
+            subprocess.run(cmd, check=True, preexec_fn=lambda: os.nice(FFMPEG_NICE))
             # Remove the raw file if conversion is successful
             os.remove(raw_file)
             print(f"Conversion successful, final file at: {final_file}")
@@ -206,14 +405,49 @@ def video_record_service():
             print("The raw file is still at:", raw_file)
 
 def main():
+    global face_detector, detection_pool, quality_level
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--detector", choices=sorted(DETECTORS),
+                        help="face detector backend (default: $SPYROBOT_DETECTOR or haar)")
+    parser.add_argument("--profile", choices=sorted(PROFILES),
+                        help="capture profile (default: last one requested via the API, else balanced)")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("SPYROBOT_DETECT_WORKERS", default_workers())),
+                        help="detection worker processes, 0 = detect in the capture thread "
+                             "(default: $SPYROBOT_DETECT_WORKERS or cores - 1)")
+    args = parser.parse_args()
+    if args.detector and args.detector != face_detector.name:
+        face_detector = create_detector(args.detector)
+        print("Face detector:", face_detector.name)
+
     # Attach signal handlers
     signal.signal(signal.SIGTERM, graceful_exit)
     signal.signal(signal.SIGINT, graceful_exit)
 
+    # Detection on worker processes, results (tracked here) in frame order.
+    # Forked here, before the camera and any other thread starts.
+    if args.workers > 0 and recognizer is not None:
+        detection_pool = DetectionPool(handle_pool_result, workers=args.workers,
+                                       detector_name=face_detector.name).start()
+
+    # Profile requests from server.py (POST /camera/profile) arrive through a control file
+    watcher = ProfileWatcher()
+    watcher.changed()
+    profile = get_profile(args.profile or read_requested_profile() or DEFAULT_PROFILE)
+
+    # Quality level from server.py's governor, same control-file mechanism
+    quality_watcher = QualityWatcher()
+    quality_watcher.changed()
+    quality_level = get_level(read_quality_level() or LEVELS[0].name)
+
     print("Starting camera + web display (Vilib)...")
-    Vilib.camera_start(vflip=False, hflip=False)
+    start_camera(profile)
     Vilib.display(local=False, web=True)
 
+    # One detection pass per camera frame, published to the frame bus
+    capture_thread = threading.Thread(target=frame_capture_service, daemon=True)
+    capture_thread.start()
+
     # Record in the background
     recording_thread = threading.Thread(target=video_record_service, daemon=True)
     recording_thread.start()
@@ -222,6 +456,16 @@ def main():
     try:
         while True:
             time.sleep(1)
+            if detection_pool is not None:
+                write_stats(dict(detection_pool.get_stats(), tracker=face_tracker.get_stats()),
+                            DETECTION_STATS_PATH)
+            profile = watcher.changed()
+            if profile is not None and profile != capture_profile:
+                switch_profile(profile)
+            level = quality_watcher.changed()
+            if level is not None and level != quality_level:
+                print(f"Quality level: {level.name}")
+                quality_level = level
     except KeyboardInterrupt:
         graceful_exit(None, None)
 
@@ -4,7 +4,12 @@ import type { ApiResponse, StreamResponse, DistanceResponse } from '../types';
 
 // Use a single base URL (update this as needed).
 // const API_URL = import.meta.env.VITE_API_URL || 'http://192.168.1.101:5000'; 
-const API_URL = import.meta.env.VITE_API_URL || 'http://172.17.10.188:5000';
+// With a gateway (Server/gateway.py) every robot is reached at <gateway>/robots/<id>.
+const GATEWAY_URL = import.meta.env.VITE_GATEWAY_URL;
+const ROBOT_ID = import.meta.env.VITE_ROBOT_ID;
+const API_URL = GATEWAY_URL && ROBOT_ID
+  ? `${GATEWAY_URL}/robots/${encodeURIComponent(ROBOT_ID)}`
+  : import.meta.env.VITE_API_URL || 'http://172.17.10.188:5000';
 
 
 // Create the axios instance for the single Flask server.
@@ -49,6 +54,36 @@ export const moveRobot = async (
   return api.post<ApiResponse>('/movement', { action, speed: 90 });
 };
 
+export interface SequenceStep {
+  action: 'forward' | 'backward' | 'turn_left' | 'turn_right' | 'look_up' | 'look_down' | 'act_dead';
+  repeat?: number;
+  speed?: number;
+  pause?: number; // seconds to wait after the step
+}
+
+// Run a whole patrol route server-side in one request.
+export const runMovementSequence = async (steps: SequenceStep[], preempt = false) => {
+  return api.post<ApiResponse>('/movement/sequence', { steps, preempt });
+};
+
+export const getMovementSequence = async () => {
+  return api.get('/movement/sequence');
+};
+
+export const cancelMovementSequence = async () => {
+  return api.post<ApiResponse>('/movement/sequence/cancel');
+};
+
+// Autonomous follow mode: the robot steers itself towards the TARGET face.
+export const setFollowMode = async (enabled: boolean, speed?: number) => {
+  return api.post('/follow', speed === undefined ? { enabled } : { enabled, speed });
+};
+
+export const getFollowStatus = async () => {
+  const response = await api.get('/follow');
+  return response.data;
+};
+
 export const setSpeed = async (speed: number) => {
   return api.post<ApiResponse>('/speed', { speed });
 };
@@ -65,10 +100,19 @@ export const playSound = async (type: 'death' | 'distraction') => {
   return api.post<ApiResponse>('/play-sound', { type });
 };
 
+export const say = async (text: string) => {
+  return api.post<ApiResponse>('/say', { text });
+};
+
 export const takePhoto = async () => {
   return api.post<ApiResponse>('/camera/photo');
 };
 
+// MJPEG live feed served by the Flask server (encode-once fan-out).
+// quality: 'auto' adapts to this client's bandwidth; or pin 'high' | 'medium' | 'low'.
+export const getStreamUrl = (quality: 'auto' | 'high' | 'medium' | 'low' = 'auto') =>
+  `${API_URL}/stream.mjpg?quality=${quality}`;
+
 export const addEvent = async (description: string) => {
   return api.post<ApiResponse>('/events', { description });
 };
@@ -93,9 +137,188 @@ export const pauseVideoStream = async () => {
   return api.post<ApiResponse>('/pause');
 };
 
+// Poster + sprite-sheet manifest for scrubbing a recording without loading the MP4.
+// URLs in the response are relative to API_URL.
+export const getRecordingThumbnails = async (recording: string) => {
+  const response = await api.get(`/recordings/${encodeURIComponent(recording)}/thumbnails`);
+  return response.data;
+};
+
+export const getRecordingPosterUrl = (recording: string) =>
+  `${API_URL}/recordings/${encodeURIComponent(recording)}/poster`;
+
+// Capture profiles: camera (recording/photo) size and the smaller analysis/stream size.
+export type CaptureProfile = 'low' | 'balanced' | 'high';
+
+export const getCaptureProfile = async () => {
+  const response = await api.get('/camera/profile');
+  return response.data;
+};
+
+export const setCaptureProfile = async (profile: CaptureProfile) => {
+  return api.post<ApiResponse>('/camera/profile', { profile });
+};
+
+export type ColorName = 'red' | 'orange' | 'yellow' | 'green' | 'blue' | 'purple';
+
+export interface ColorBlob {
+  x: number;
+  y: number;
+  w: number;
+  h: number;
+  area: number;
+  cx: number;
+  cy: number;
+}
+
+// Blobs of every colour in the newest analysis frame (one request, one pass on the robot).
+export const getColorBlobs = async (colors?: ColorName[]) => {
+  const response = await api.get<{
+    frame_id: number;
+    width: number;
+    height: number;
+    colors: Partial<Record<ColorName, ColorBlob[]>>;
+  }>('/camera/colors', { params: colors ? { colors: colors.join(',') } : {} });
+  return response.data;
+};
+
+export interface QrCode {
+  id: number;
+  payload: string;
+  timestamp: number;
+  latency_ms: number;
+  frame_id: number;
+  points: [number, number][];
+}
+
+// Decoded QR payloads newer than `since` (poll with the last id seen).
+export const getQrCodes = async (since = 0) => {
+  const response = await api.get<{ events: QrCode[]; stats: Record<string, unknown> }>('/qr', {
+    params: { since },
+  });
+  return response.data;
+};
+
+export const setQrScanning = async (enabled: boolean) => {
+  return api.post('/qr', { enabled });
+};
+
+export type QualityLevel = 'full' | 'reduced' | 'low' | 'minimal';
+
+// Governor state: current quality level, temperature/load/lag signals, recent changes.
+export const getGovernor = async () => {
+  const response = await api.get('/governor');
+  return response.data;
+};
+
+export const setQualityLevel = async (level: QualityLevel | 'auto') => {
+  return api.post('/governor', { level });
+};
+
+export interface OccupancyMapReply {
+  version: number;
+  scale: number;
+  cell_cm: number;
+  width: number;
+  height: number;
+  pose: { x: number; y: number; heading: number }; // in blocks; heading in degrees
+  trail: [number, number][];
+  bounds: [number, number, number, number] | null; // row min, col min, row max, col max
+  encoding: 'full' | 'delta';
+  grid?: string; // base64 uint8, width * height, 0 free .. 127 unknown .. 254 occupied
+  indices?: string; // base64 uint32 little-endian block indices (delta)
+  values?: string; // base64 uint8 occupancy of those blocks (delta)
+}
+
+const decodeBase64 = (data: string) => Uint8Array.from(atob(data), (c) => c.charCodeAt(0));
+
+// Poll with the previous reply's version; only changed blocks come back.
+export const getMap = async (since = 0, scale = 4) => {
+  const response = await api.get<OccupancyMapReply>('/map', { params: { since, scale } });
+  return response.data;
+};
+
+// Apply a /map reply to the grid kept from earlier replies (returns a new grid for a full reply).
+export const applyMapReply = (grid: Uint8Array | null, reply: OccupancyMapReply) => {
+  if (reply.encoding === 'full' || grid === null) {
+    return decodeBase64(reply.grid ?? '');
+  }
+  const indices = new Uint32Array(decodeBase64(reply.indices ?? '').buffer);
+  const values = decodeBase64(reply.values ?? '');
+  indices.forEach((index, i) => {
+    grid[index] = values[i];
+  });
+  return grid;
+};
+
+export const resetMap = async () => {
+  return api.post<ApiResponse>('/map/reset');
+};
+
+export interface ArchiverSettings {
+  target?: string; // mounted directory on the robot, or http://host:port of archive_receiver.py
+  rate_kbps?: number; // 0 = unlimited
+  keep?: boolean; // keep local copies after the target confirmed them
+}
+
+// Archiver settings and progress (current recording, bytes sent / freed, last error).
+export const getArchiveStatus = async () => {
+  const response = await api.get('/archive');
+  return response.data;
+};
+
+export const setArchiver = async (enabled: boolean, settings: ArchiverSettings = {}) => {
+  return api.post('/archive', { enabled, ...settings });
+};
+
 export const getLogs = async () => {
   const response = await api.get<Event[]>('/logs');
   return response.data; // Return the actual array of logs
 };
 
+export interface SearchParams {
+  q?: string;
+  severity?: string; // comma-separated, e.g. 'warning,critical'
+  kind?: 'log' | 'event';
+  from?: string;     // 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'
+  to?: string;
+  page?: number;
+  page_size?: number;
+}
+
+// Server-side ranked search instead of downloading every log/event.
+export const searchLogs = async (params: SearchParams) => {
+  const response = await api.get('/search', { params });
+  return response.data;
+};
+
+// Pre-aggregated log counts per time bucket for the Timeline view.
+export const getTimelineBuckets = async (params: {
+  from?: string;
+  to?: string;
+  max_buckets?: number;
+  resolution?: 'minute' | 'hour';
+} = {}) => {
+  const response = await api.get('/timeline/buckets', { params });
+  return response.data;
+};
+
+// Gateway only: all configured robots with health and their latest telemetry.
+export const getRobots = async () => {
+  const response = await axios.get(`${GATEWAY_URL}/robots`, { timeout: 5000 });
+  return response.data;
+};
+
+// Gateway only: live telemetry for some (or all) robots over one server-sent event stream.
+// Returns a function that closes the stream.
+export const subscribeTelemetry = (
+  onUpdate: (update: Record<string, unknown>) => void,
+  robots?: string[]
+) => {
+  const query = robots && robots.length ? `?robots=${robots.map(encodeURIComponent).join(',')}` : '';
+  const source = new EventSource(`${GATEWAY_URL}/telemetry/stream${query}`);
+  source.onmessage = (event) => onUpdate(JSON.parse(event.data));
+  return () => source.close();
+};
+
 export default api;
\ No newline at end of file